@@ -1,12 +1,89 @@
+from Parse_data import decode_lap_cell
+
+
+def _read_only(name):
+    def method(self, *args, **kwargs):
+        raise TypeError(
+            f"{name}: времена пилота хранятся в таблице заезда, "
+            "круг добавляется через append или Driver.add_time"
+        )
+
+    method.__name__ = name
+    return method
+
+
+class LapTimes(list):
+    """
+    Времена кругов пилота, привязанного к LapTable: строки его колонки на
+    момент чтения. append дописывает круг в таблицу, как Driver.add_time;
+    остальные изменения запрещены, чтобы не терялись молча.
+    """
+
+    __slots__ = ("_table", "_column")
+
+    def __init__(self, table, column: int) -> None:
+        super().__init__(table.column_cells(column))
+        self._table = table
+        self._column = column
+
+    def append(self, value) -> None:
+        self._table.add_driver_time(self._column, value)
+        list.clear(self)
+        list.extend(self, self._table.column_cells(self._column))
+
+    __setitem__ = _read_only("__setitem__")
+    __delitem__ = _read_only("__delitem__")
+    __iadd__ = _read_only("__iadd__")
+    __imul__ = _read_only("__imul__")
+    extend = _read_only("extend")
+    insert = _read_only("insert")
+    pop = _read_only("pop")
+    remove = _read_only("remove")
+    clear = _read_only("clear")
+    sort = _read_only("sort")
+    reverse = _read_only("reverse")
+
+
 class Driver:
+    """
+    Пилот заезда. Внутри Heat времена кругов хранятся не в самом объекте,
+    а в общей LapTable (колонка column); отдельный Driver хранит свой список.
+    """
+
+    __slots__ = ("place", "name", "kart_id", "_table", "_column", "_times")
+
     def __init__(self, place: int, name: str, kart_id: int):
         self.place = place
         self.name = name
         self.kart_id = kart_id
-        self.times = []
+        self._table = None
+        self._column = None
+        self._times = []
+
+    def bind(self, table, column: int) -> None:
+        """Привязывает пилота к колонке общей таблицы кругов."""
+        self._table = table
+        self._column = column
+        self._times = None
+
+    @property
+    def times(self):
+        if self._table is not None:
+            return LapTimes(self._table, self._column)
+        return self._times
+
+    @times.setter
+    def times(self, values):
+        self._table = None
+        self._column = None
+        self._times = list(values)
 
-    def add_time(self, time_str: str):
-        self.times.append(time_str)
+    @property
+    def lap_seconds(self):
+        """Времена кругов в секундах (NaN — нет круга); для Heat — view колонки."""
+        if self._table is not None:
+            return self._table.times[:, self._column]
+        return [decode_lap_cell("" if t is None else str(t))[0] for t in self._times]
 
     def get_place(self):
         return self.place
@@ -27,7 +104,10 @@ class Driver:
         self.kart_id = new_id
 
     def add_time(self, time):
-        self.times.append(time)
+        if self._table is not None:
+            self._table.add_driver_time(self._column, time)
+        else:
+            self._times.append(time)
 
     def to_dict(self):
         return {
@@ -44,5 +124,5 @@ class Driver:
             name=data['name'],
             kart_id=data['kart_id']
         )
-        driver.lap_times = data['lap_times']
+        driver.times = data['lap_times']
         return driver
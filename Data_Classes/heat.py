@@ -1,17 +1,18 @@
 import os
 import json
+import time
 
-import pandas as pd
-import matplotlib.pyplot as plt
-
-from Parse_data import (
-    get_race_results,
-    get_driver_names,
-    get_kart_numbers,
-    get_time_list,
-    get_side_information,
-)
+from Parse_data import get_race_results, decode_heat_table
+from archive_index import get_archive_index
+from instrumentation import stage
 from .driver import Driver
+from .heat_binary import (
+    is_binary_heat_file,
+    read_heat_binary,
+    read_heat_header,
+    write_heat_binary,
+)
+from .lap_table import LapTable
 
 
 class Heat:
@@ -22,27 +23,42 @@ class Heat:
         session_id: str,
         track: str = "narvskaya",
         load_from_file: bool = False,
+        raw_data=None,
         **kwargs,
     ) -> None:
         """
         :param session_id: ID заезда на сайте timing.batyrshin.name
         :param track: 'narvskaya', 'premium', 'drive'
         :param load_from_file: если True — инициализация из JSON-данных
+        :param raw_data: уже загруженные строки таблицы (без повторного запроса)
         """
         self.session_id = session_id
         self.track = track  # <-- новый атрибут трека
         self.side_info = []
         self.drivers = []
-        self.df_laps = pd.DataFrame()
-
-        if not load_from_file:
+        # время загрузки с сайта (unix time); None — неизвестно
+        self.fetched_at = None
+        self.laps = LapTable.empty()
+        # df_laps строится лениво из self.laps при первом обращении
+        self._df_laps = None
+        # таблица и её версия, из которых построен _df_laps: новая LapTable
+        # (перестройка заезда) снова начинает с версии 0
+        self._df_source = None
+        self._df_version = None
+
+        if raw_data is not None:
+            self.fetched_at = kwargs.get("fetched_at", time.time())
+            self._initialize_from_raw_data(raw_data)
+        elif not load_from_file:
             # загружаем сырые данные с сайта для нужного трека
             raw_data = get_race_results(session_id, track=self.track)
+            self.fetched_at = time.time()
             self._initialize_from_raw_data(raw_data)
         else:
             # восстановление из JSON
             self.track = kwargs.get("track", self.track)
             self.side_info = kwargs.get("side_info", [])
+            self.fetched_at = kwargs.get("fetched_at")
             drivers_data = kwargs.get("drivers", [])
 
             for d in drivers_data:
@@ -51,29 +67,36 @@ class Heat:
                     name=d.get("name"),
                     kart_id=d.get("kart_id"),
                 )
-                for t in d.get("times", []):
-                    driver.add_time(t)
                 self.drivers.append(driver)
 
-            self._reconstruct_df_laps()
+            self.laps = LapTable.from_driver_times(
+                [d.name for d in self.drivers],
+                [d.kart_id for d in self.drivers],
+                [d.get("times", []) for d in drivers_data],
+            )
+            self._bind_drivers()
 
     def _initialize_from_raw_data(self, raw_data) -> None:
         """Инициализирует объект Heat из сырых данных таблицы сайта."""
         if not raw_data:
             self.side_info = []
             self.drivers = []
-            self.df_laps = pd.DataFrame()
+            self.laps = LapTable.empty()
             return
 
-        driver_row = get_driver_names(raw_data)
-        kart_row = get_kart_numbers(raw_data)
-        time_data = get_time_list(raw_data)
-        self.side_info = get_side_information(raw_data)
+        with stage("heat.build") as st:
+            self._build_from_raw_data(raw_data)
+            st.add(count=self.laps.lap_count * self.laps.driver_count)
+
+    def _build_from_raw_data(self, raw_data) -> None:
+        # один проход по таблице: пилоты, карты, круги и Best/Avg/Dev
+        self.laps = decode_heat_table(raw_data)
+        self.side_info = self.laps.side_info
 
         # создаём пилотов
         self.drivers = []
         for place, (name, kart_id) in enumerate(
-            zip(driver_row[1:], kart_row[1:]), start=1
+            zip(self.laps.driver_names, self.laps.kart_ids), start=1
         ):
             name = str(name).strip()
             kart = str(kart_id).strip()
@@ -84,41 +107,94 @@ class Heat:
             driver = Driver(place=place, name=name, kart_id=kart_val)
             self.drivers.append(driver)
 
-        # создаём DataFrame с кругами и наполняем times у пилотов
-        if time_data and len(time_data) > 1:
-            headers = time_data[0]
-            rows = time_data[1:]
-            self.df_laps = pd.DataFrame(rows, columns=headers)
-
-            # заполняем времена кругов у каждого пилота
-            # предполагаем, что порядок колонок совпадает с порядком driver_row
-            for idx, driver in enumerate(self.drivers):
-                col_idx = idx + 1  # 0 - "Lap", дальше пилоты
-                if col_idx < len(headers):
-                    col_name = headers[col_idx]
-                    if col_name in self.df_laps.columns:
-                        for t in self.df_laps[col_name].tolist():
-                            driver.add_time(t)
-        else:
-            self.df_laps = pd.DataFrame()
+        self._bind_drivers()
 
-    def _reconstruct_df_laps(self) -> None:
-        """Восстанавливает DataFrame df_laps из данных self.drivers (при загрузке из файла)."""
-        if not self.drivers:
-            self.df_laps = pd.DataFrame()
-            return
+    @classmethod
+    def from_lap_table(
+        cls, session_id, track, drivers, laps, side_info=None, fetched_at=None
+    ) -> "Heat":
+        """Собирает Heat из готовой LapTable и описаний пилотов (place, name, kart_id)."""
+        heat = cls(session_id=session_id, track=track, load_from_file=True)
+        heat.side_info = side_info if side_info is not None else laps.side_info
+        heat.fetched_at = fetched_at
+        heat.laps = laps
+        heat.drivers = [
+            Driver(place=d.get("place"), name=d.get("name"), kart_id=d.get("kart_id"))
+            for d in drivers
+        ]
+        heat._bind_drivers()
+        return heat
+
+    def _bind_drivers(self) -> None:
+        """Привязывает пилотов к колонкам общей таблицы кругов (порядок совпадает)."""
+        for idx, driver in enumerate(self.drivers):
+            driver.bind(self.laps, idx)
 
-        max_laps = max(len(driver.times) for driver in self.drivers)
-        data_dict = {}
+    @property
+    def df_laps(self):
+        """
+        Таблица кругов в виде DataFrame (Lap + колонка на пилота).
+        Строится из self.laps при первом обращении и после изменений таблицы.
+        """
+        if (
+            self._df_laps is None
+            or self._df_source is not self.laps
+            or self._df_version != self.laps.version
+        ):
+            self._df_laps = self._build_df_laps()
+            self._df_source = self.laps
+            self._df_version = self.laps.version
+        return self._df_laps
+
+    @df_laps.setter
+    def df_laps(self, value):
+        self._df_laps = value
+        self._df_source = self.laps
+        self._df_version = self.laps.version
+
+    def _build_df_laps(self):
+        # pandas нужен только здесь: загрузка, сохранение и печать обходятся без него
+        import pandas as pd
+
+        if not self.laps.lap_count:
+            return pd.DataFrame()
+        headers = ["Lap"] + [d.name for d in self.drivers]
+        headers += self.laps.driver_names[len(self.drivers):]
+        return pd.DataFrame(self.laps.to_grid(), columns=headers, copy=False)
+
+    @property
+    def lap_count(self) -> int:
+        return self.laps.lap_count
+
+    @property
+    def lap_times(self):
+        """Время кругов в секундах, массив (laps, drivers); NaN — нет круга."""
+        return self.laps.times
+
+    @property
+    def lap_positions(self):
+        """Позиции по кругам, массив int (laps, drivers); 0 — нет данных."""
+        return self.laps.positions
+
+    @property
+    def lap_gaps(self):
+        """Отставание от лидера круга в секундах, массив (laps, drivers)."""
+        return self.laps.gaps
+
+    def race_timeline(self):
+        """
+        Ход гонки по суммарному времени: (positions, gaps) формы (laps, drivers) —
+        позиция (0 — круг не проехан) и отставание от лидера после каждого круга.
+        """
+        from lap_analytics import race_timeline
 
-        # первая колонка — номер круга
-        data_dict["Lap"] = [f"{i + 1}" for i in range(max_laps)]
+        return race_timeline(self.lap_times[:, : len(self.drivers)])
 
-        for driver in self.drivers:
-            times = driver.times + [""] * (max_laps - len(driver.times))
-            data_dict[driver.name] = times
+    def lap_summary(self, **kwargs):
+        """Сводка по пилотам (lap_analytics.heat_summary): перцентили, разброс, отставание."""
+        from lap_analytics import heat_summary
 
-        self.df_laps = pd.DataFrame(data_dict)
+        return heat_summary(self, **kwargs)
 
     def get_driver_names(self):
         """Возвращает строку вида: ['Driver', 'Имя1', 'Имя2', ...]."""
@@ -130,14 +206,40 @@ class Heat:
 
     def get_time_list(self):
         """Возвращает полную таблицу кругов: заголовок + строки."""
-        if self.df_laps.empty:
+        if not self.laps.lap_count:
             return []
-        header = self.df_laps.columns.tolist()
-        rows = self.df_laps.values.tolist()
+        header = ["Lap"] + [d.name for d in self.drivers]
+        header += self.laps.driver_names[len(self.drivers):]
+        rows = [
+            [label] + cells
+            for label, cells in zip(self.laps.lap_labels, self.laps.cell_grid().tolist())
+        ]
         return [header] + rows
 
-    def save(self, filename: str) -> None:
-        """Сохраняет заезд в файл JSON."""
+    def save(self, filename: str, index=None) -> None:
+        """
+        Сохраняет заезд в JSON или, для расширения .kheat, в бинарный файл.
+        Если задан индекс архива (аргументом или set_archive_index), заезд
+        добавляется в него.
+        """
+        directory = os.path.dirname(filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        binary = is_binary_heat_file(filename)
+        with stage("heat.save", format="kheat" if binary else "json") as st:
+            if binary:
+                write_heat_binary(self, filename)
+            else:
+                self._save_json(filename)
+            st.add(bytes=os.path.getsize(filename), count=1)
+
+        if index is None:
+            index = get_archive_index()
+        if index is not None:
+            index.ingest(self, path=filename, replace=True)
+
+    def _save_json(self, filename: str) -> None:
         drivers_data = []
         for driver in self.drivers:
             drivers_data.append(
@@ -153,25 +255,44 @@ class Heat:
             "session_id": self.session_id,
             "track": self.track,
             "side_info": self.side_info,
+            "fetched_at": self.fetched_at,
             "drivers": drivers_data,
         }
 
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
         with open(filename, "w", encoding="utf-8") as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
 
     @classmethod
-    def load(cls, filename: str) -> "Heat":
-        """Загружает заезд из файла JSON."""
+    def load(cls, filename: str, mmap: bool = True) -> "Heat":
+        """
+        Загружает заезд из файла JSON или .kheat (по расширению).
+        Круги из .kheat отображаются в память, если mmap=True.
+        """
+        binary = is_binary_heat_file(filename)
+        with stage("heat.load", format="kheat" if binary else "json") as st:
+            heat = cls._load(filename, mmap=mmap)
+            st.add(bytes=os.path.getsize(filename), count=1)
+        return heat
+
+    @classmethod
+    def _load(cls, filename: str, mmap: bool = True) -> "Heat":
         if not os.path.exists(filename):
             raise FileNotFoundError(f"Файл {filename} не найден")
 
+        if is_binary_heat_file(filename):
+            return read_heat_binary(cls, filename, mmap=mmap)
+
         with open(filename, "r", encoding="utf-8") as f:
             data = json.load(f)
+        return cls.from_dict(data)
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "Heat":
+        """Восстанавливает заезд из словаря в формате JSON-файла заезда."""
         session_id = data.get("session_id", "")
         track = data.get("track", "narvskaya")
         side_info = data.get("side_info", [])
+        fetched_at = data.get("fetched_at")
         drivers = data.get("drivers", [])
 
         heat = cls(
@@ -179,10 +300,87 @@ class Heat:
             track=track,
             load_from_file=True,
             side_info=side_info,
+            fetched_at=fetched_at,
             drivers=drivers,
         )
         return heat
 
+    @classmethod
+    def load_many(cls, paths, max_workers: int = None, executor: str = "process", cache: bool = True):
+        """
+        Загружает много заездов (список путей, каталог или glob-шаблон) и
+        возвращает одну длинную таблицу кругов: track, session_id, driver,
+        kart_id, lap, time, position, gap. Файлы декодируются в пуле
+        (executor: 'process', 'thread', 'serial'), разобранные заезды
+        запоминаются по (путь, mtime) до конца процесса.
+        """
+        from .heat_bulk import load_many
+
+        return load_many(paths, max_workers=max_workers, executor=executor, cache=cache)
+
+    @staticmethod
+    def read_metadata(filename: str) -> dict:
+        """
+        Метаданные заезда (session_id, track, side_info, drivers без кругов).
+        Для .kheat читается только заголовок файла.
+        """
+        if is_binary_heat_file(filename):
+            header = read_heat_header(filename)
+        else:
+            with open(filename, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        return {
+            "session_id": header.get("session_id", ""),
+            "track": header.get("track", "narvskaya"),
+            "side_info": header.get("side_info", []),
+            "fetched_at": header.get("fetched_at"),
+            "drivers": [
+                {"place": d.get("place"), "name": d.get("name"), "kart_id": d.get("kart_id")}
+                for d in header.get("drivers", [])
+            ],
+        }
+
+    def update_from_raw_data(self, raw_data):
+        """Дописывает изменившиеся круги из свежих строк таблицы; возвращает LapEvent."""
+        from .heat_live import apply_rows
+
+        return apply_rows(self, raw_data)
+
+    def follow(self, **kwargs):
+        """
+        Следит за идущим заездом: опрашивает сайт с адаптивным интервалом
+        и отдаёт LapEvent (новый круг, личный/общий лучший, смена позиции).
+        Параметры — см. Data_Classes.heat_live.follow.
+        """
+        from .heat_live import follow
+
+        return follow(self, **kwargs)
+
+    def follow_async(self, **kwargs):
+        """Асинхронный вариант follow."""
+        from .heat_live import follow_async
+
+        return follow_async(self, **kwargs)
+
+    @classmethod
+    def fetch_many(cls, heats, max_workers: int = 8, session=None):
+        """
+        Параллельно загружает несколько заездов [(track, session_id), ...].
+        Отдаёт FetchResult по мере готовности; ошибки не прерывают пакет.
+        """
+        from .heat_fetch import fetch_many
+
+        return fetch_many(heats, max_workers=max_workers, session=session)
+
+    @classmethod
+    def fetch_many_async(cls, heats, max_concurrency: int = 8, session=None):
+        """Асинхронный вариант fetch_many: async-итератор FetchResult."""
+        from .heat_fetch import fetch_many_async
+
+        return fetch_many_async(
+            heats, max_concurrency=max_concurrency, session=session
+        )
+
     def print_results_table(self, data=None, header: bool = True) -> None:
         """Печатает красивую таблицу в консоль."""
         if data is None:
@@ -215,16 +413,11 @@ class Heat:
         for row in data[start_idx:]:
             print(format_row(row))
 
-    def print_full_results(self) -> None:
-        """Печатает полную таблицу: Driver / Kart + круги."""
-        if not self.drivers and self.df_laps.empty:
-            print("Нет данных для отображения")
-            return
-
+    def get_full_results(self):
+        """Полная таблица: строки Driver и Kart, затем заголовок и круги."""
         time_data = self.get_time_list()
         if not time_data:
-            print("Нет данных кругов для отображения")
-            return
+            return []
 
         driver_row = self.get_driver_names()
         kart_row = self.get_kart_numbers()
@@ -239,28 +432,31 @@ class Heat:
             pad(kart_row),
         ]
         full_data.extend(time_data)
+        return full_data
 
-        self.print_results_table(full_data, header=True)
-
-    def generate_results_image(self, filename=None) -> str:
-        """Генерирует PNG с таблицей результатов и возвращает путь к файлу."""
-        time_data = self.get_time_list()
-        if not time_data:
-            raise ValueError("Нет данных кругов для генерации изображения")
+    def print_full_results(self) -> None:
+        """Печатает полную таблицу: Driver / Kart + круги."""
+        if not self.drivers and not self.laps.lap_count:
+            print("Нет данных для отображения")
+            return
 
-        driver_row = self.get_driver_names()
-        kart_row = self.get_kart_numbers()
+        full_data = self.get_full_results()
+        if not full_data:
+            print("Нет данных кругов для отображения")
+            return
 
-        num_cols = len(time_data[0])
+        self.print_results_table(full_data, header=True)
 
-        def pad(row):
-            return row + [""] * (num_cols - len(row))
+    def generate_results_image(self, filename=None, backend: str = "matplotlib") -> str:
+        """
+        Генерирует PNG с таблицей результатов и возвращает путь к файлу.
+        backend: 'matplotlib' или более быстрый 'pillow' с той же раскладкой.
+        """
+        from render import render_results_image
 
-        full_data = [
-            pad(driver_row),
-            pad(kart_row),
-        ]
-        full_data.extend(time_data)
+        full_data = self.get_full_results()
+        if not full_data:
+            raise ValueError("Нет данных кругов для генерации изображения")
 
         if filename is None:
             os.makedirs("heats_result", exist_ok=True)
@@ -269,48 +465,48 @@ class Heat:
                 "heats_result", f"heat_{self.track}_{self.session_id}.png"
             )
 
-        fig, ax = plt.subplots(figsize=(num_cols * 1.2, len(full_data) * 0.4))
-        ax.axis("off")
+        with stage("render", backend=backend) as st:
+            render_results_image(full_data, filename, backend=backend)
+            st.add(bytes=os.path.getsize(filename), count=len(full_data) * len(full_data[0]))
+        return filename
 
-        table = ax.table(
-            cellText=full_data,
-            loc="center",
-            cellLoc="center",
-        )
+    def generate_lap_chart(self, filename=None, backend: str = "pillow") -> str:
+        """Рисует PNG диаграммы хода гонки (позиции по кругам) и возвращает путь к файлу."""
+        from render import render_lap_chart
 
-        # стилизация: первая строка — заголовки Driver, Kart,...
-        for j in range(len(full_data[0])):
-            cell = table[0, j]
-            cell.set_facecolor("#f1f1f1")
-            cell.set_text_props(weight="bold")
-
-        # вторая строка — Kart
-        for j in range(len(full_data[0])):
-            cell = table[1, j]
-            cell.set_facecolor("#f1f1f1")
-            cell.set_text_props(color="black", weight="bold")
-
-        # остальные строки
-        for i in range(2, len(full_data)):
-            for j in range(len(full_data[0])):
-                cell = table[i, j]
-                cell_text = "" if full_data[i][j] is None else str(full_data[i][j])
-                if j == 0:
-                    cell.set_facecolor("#e8e8e8")
-                    cell.set_text_props(weight="bold")
-                elif cell_text and " " in cell_text:
-                    cell.set_facecolor("#333333")
-                    cell.set_text_props(color="white")
-
-        plt.savefig(filename, bbox_inches="tight", dpi=200)
-        plt.close()
+        if not self.lap_count or not self.drivers:
+            raise ValueError("Нет данных кругов для диаграммы хода гонки")
+
+        if filename is None:
+            os.makedirs("heats_result", exist_ok=True)
+            filename = os.path.join(
+                "heats_result", f"heat_{self.track}_{self.session_id}_laps.png"
+            )
 
+        positions, _ = self.race_timeline()
+        with stage("render.laps", backend=backend) as st:
+            render_lap_chart(positions, self.get_driver_names()[1:], filename, backend=backend)
+            st.add(count=positions.size)
         return filename
 
+    @staticmethod
+    def generate_results_images(heats, out_dir: str = "heats_result", backend: str = "pillow", processes=None):
+        """Пакетная генерация PNG для заездов или путей к файлам в пуле процессов."""
+        from render import render_many
+
+        return render_many(heats, out_dir=out_dir, backend=backend, processes=processes)
+
+    @staticmethod
+    def generate_lap_charts(heats, out_dir: str = "heats_result", backend: str = "pillow", processes=None):
+        """Пакетная отрисовка диаграмм хода гонки в пуле процессов."""
+        from render import render_many
+
+        return render_many(heats, out_dir=out_dir, backend=backend, processes=processes, chart="laps")
+
     def __str__(self) -> str:
         return (
             f"Heat(session_id={self.session_id}, "
             f"track={self.track}, "
             f"drivers={len(self.drivers)}, "
-            f"laps={len(self.df_laps)})"
+            f"laps={self.laps.lap_count})"
         )
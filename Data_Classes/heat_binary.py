@@ -0,0 +1,154 @@
+"""
+Бинарный формат заезда (.kheat), который читается через mmap.
+
+Раскладка файла:
+    MAGIC (6 байт) | версия uint16 | длина заголовка uint32 |
+    заголовок JSON (UTF-8) | массивы times, positions, gaps
+
+Заголовок содержит метаданные заезда и смещения массивов, поэтому
+read_heat_header не трогает данные кругов. Массивы выровнены по 64 байта
+и отображаются в память как np.memmap в режиме copy-on-write.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+
+from .lap_table import LapTable
+
+BINARY_EXTENSION = ".kheat"
+MAGIC = b"KHEAT\x00"
+FORMAT_VERSION = 1
+
+_PREFIX = struct.Struct("<6sHI")
+_ALIGN = 64
+_ARRAYS = (("times", "<f8"), ("positions", "<i2"), ("gaps", "<f8"))
+
+
+def is_binary_heat_file(filename: str) -> bool:
+    return filename.lower().endswith(BINARY_EXTENSION)
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_heat_binary(heat, filename: str) -> None:
+    """Сохраняет Heat в бинарный файл .kheat."""
+    table = heat.laps
+    arrays = {
+        "times": np.ascontiguousarray(table.times, dtype="<f8"),
+        "positions": np.ascontiguousarray(table.positions, dtype="<i2"),
+        "gaps": np.ascontiguousarray(table.gaps, dtype="<f8"),
+    }
+    labels = table.lap_labels
+    header = {
+        "session_id": heat.session_id,
+        "track": heat.track,
+        "side_info": heat.side_info,
+        "fetched_at": heat.fetched_at,
+        "drivers": [
+            {"place": d.place, "name": d.name, "kart_id": d.kart_id}
+            for d in heat.drivers
+        ],
+        "columns": table.driver_names,
+        "kart_ids": table.kart_ids,
+        "lap_count": table.lap_count,
+        "driver_count": table.driver_count,
+        "lap_labels": None if labels == [str(i + 1) for i in range(len(labels))] else labels,
+        "overrides": [[lap, col, text] for (lap, col), text in table.overrides.items()],
+        "arrays": {},
+    }
+
+    # смещения зависят от длины заголовка, а заголовок — от смещений:
+    # считаем, пока длина не перестанет меняться
+    header_bytes = b""
+    while True:
+        offset = _aligned(_PREFIX.size + len(header_bytes))
+        for name, dtype in _ARRAYS:
+            header["arrays"][name] = {"dtype": dtype, "offset": offset}
+            offset = _aligned(offset + arrays[name].nbytes)
+        encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        if len(encoded) == len(header_bytes):
+            header_bytes = encoded
+            break
+        header_bytes = encoded
+
+    # массивы могут быть отображены из этого же файла: пишем во временный и
+    # подменяем, чтобы старое содержимое оставалось под ними до конца
+    tmp = filename + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, _ in _ARRAYS:
+            f.seek(header["arrays"][name]["offset"])
+            f.write(arrays[name].tobytes())
+    os.replace(tmp, filename)
+
+
+def read_heat_header(filename: str) -> dict:
+    """Читает только метаданные заезда, не загружая круги."""
+    with open(filename, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) < _PREFIX.size:
+            raise ValueError(f"Файл {filename} повреждён: нет заголовка")
+        magic, version, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise ValueError(f"Файл {filename} не является файлом {BINARY_EXTENSION}")
+        if version > FORMAT_VERSION:
+            raise ValueError(
+                f"Версия формата {version} файла {filename} не поддерживается"
+            )
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    header["version"] = version
+    return header
+
+
+def read_lap_table(filename: str, header: dict = None, mmap: bool = True) -> LapTable:
+    """Возвращает LapTable, массивы которой отображены из файла (или прочитаны)."""
+    if header is None:
+        header = read_heat_header(filename)
+
+    shape = (header["lap_count"], header["driver_count"])
+    arrays = {}
+    for name, _ in _ARRAYS:
+        spec = header["arrays"][name]
+        dtype = np.dtype(spec["dtype"])
+        if shape[0] * shape[1] == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        elif mmap:
+            arrays[name] = np.memmap(
+                filename, dtype=dtype, mode="c", offset=spec["offset"], shape=shape
+            )
+        else:
+            with open(filename, "rb") as f:
+                f.seek(spec["offset"])
+                arrays[name] = np.fromfile(f, dtype=dtype, count=shape[0] * shape[1]).reshape(shape)
+
+    overrides = {(lap, col): text for lap, col, text in header.get("overrides", [])}
+    return LapTable(
+        header.get("columns", []),
+        header.get("kart_ids", []),
+        arrays["times"],
+        arrays["positions"],
+        arrays["gaps"],
+        lap_labels=header.get("lap_labels"),
+        overrides=overrides,
+        side_info=header.get("side_info", []),
+    )
+
+
+def read_heat_binary(heat_cls, filename: str, mmap: bool = True, header: dict = None):
+    """Загружает Heat из файла .kheat (header — уже прочитанный заголовок)."""
+    if header is None:
+        header = read_heat_header(filename)
+    table = read_lap_table(filename, header, mmap=mmap)
+    return heat_cls.from_lap_table(
+        header.get("session_id", ""),
+        header.get("track", "narvskaya"),
+        header.get("drivers", []),
+        table,
+        side_info=header.get("side_info", []),
+        fetched_at=header.get("fetched_at"),
+    )
@@ -0,0 +1,184 @@
+"""
+Пакетная загрузка архива заездов в одну длинную таблицу кругов.
+
+Файлы декодируются в пуле процессов (JSON разбирается под GIL, потоки его
+не ускоряют) или потоков. Разобранные заезды запоминаются в кэше процесса
+по (путь, mtime, размер): повторная загрузка неизменившихся файлов в том
+же процессе или ноутбуке не читает диск.
+"""
+import glob
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from io_heat import iter_heat_files, select_heat_files
+from .heat import Heat
+
+FRAME_COLUMNS = ["track", "session_id", "driver", "kart_id", "lap", "time", "position", "gap"]
+DEFAULT_CACHE_SIZE = 4096
+
+
+class _LoadCache:
+    """LRU разобранных заездов: путь -> (mtime_ns, размер, Heat, колонки кругов)."""
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self.stats = {"hits": 0, "misses": 0}
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, stamp):
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None or entry[0] != stamp:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(path)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, path: str, stamp, value) -> None:
+        with self._lock:
+            self._entries[path] = (stamp, value)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache = _LoadCache()
+
+
+def load_cache_stats() -> dict:
+    return dict(_cache.stats, size=len(_cache))
+
+
+def clear_load_cache() -> None:
+    _cache.clear()
+
+
+def expand_paths(paths):
+    """
+    Список файлов из каталога, glob-шаблона или перечня путей. В каталоге и
+    по шаблону берётся один файл на заезд (io_heat.select_heat_files).
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = os.fspath(paths)
+        if os.path.isdir(paths):
+            return sorted(path for _, _, path in iter_heat_files(paths))
+        by_dir = {}
+        for path in glob.glob(paths):
+            by_dir.setdefault(os.path.dirname(path), []).append(path)
+        return sorted(path for found in by_dir.values() for path in select_heat_files(found).values())
+    return [os.fspath(p) for p in paths]
+
+
+def lap_columns(heat, columns=None):
+    """
+    Длинные колонки кругов заезда: только проеханные круги, порядок — пилот,
+    круг. columns ограничивает пилотов номерами колонок.
+    """
+    times = heat.lap_times
+    n_drivers = len(heat.drivers)
+    selected = np.arange(n_drivers) if columns is None else np.asarray(columns, dtype=np.intp)
+    sub, laps = np.nonzero(~np.isnan(times[:, selected]).T)
+    cols = selected[sub]
+
+    names = np.array([d.name for d in heat.drivers] or [""], dtype=object)
+    karts = np.array([None if d.kart_id is None else str(d.kart_id) for d in heat.drivers] or [None], dtype=object)
+    places = np.array([np.nan if d.place is None else d.place for d in heat.drivers] or [np.nan], dtype=np.float64)
+    positions = heat.lap_positions[laps, cols].astype(np.float64)
+    positions[positions == 0] = np.nan
+    return {
+        "track": heat.track,
+        "session_id": str(heat.session_id),
+        "driver": names[cols],
+        "kart_id": karts[cols],
+        "place": places[cols],
+        "lap": laps + 1,
+        "time": np.asarray(times[laps, cols], dtype=np.float64),
+        "position": positions,
+        "gap": np.asarray(heat.lap_gaps[laps, cols], dtype=np.float64),
+    }
+
+
+def _decode(path: str, mmap: bool):
+    heat = Heat.load(path, mmap=mmap)
+    return heat, lap_columns(heat)
+
+
+def _decode_copy(path: str):
+    # из процесса-исполнителя mmap не передать: массивы читаются в память
+    return _decode(path, mmap=False)
+
+
+def _stamp(path: str):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def load_decoded(paths, max_workers: int = None, executor: str = "process", cache: bool = True):
+    """
+    Декодирует файлы заездов; возвращает список (Heat, колонки кругов) в
+    порядке путей. executor: 'process', 'thread' или 'serial'. Заезды для
+    кэша читаются в память: отображение держало бы файл открытым, пока
+    запись в кэше, и отдавало бы старое содержимое после перезаписи.
+    """
+    mmap = not cache
+    paths = expand_paths(paths)
+    results = [None] * len(paths)
+    missing = []
+    for i, path in enumerate(paths):
+        stamp = _stamp(path)
+        hit = _cache.get(os.path.abspath(path), stamp) if cache else None
+        if hit is not None:
+            results[i] = hit
+        else:
+            missing.append((i, path, stamp))
+
+    if missing:
+        todo = [path for _, path, _ in missing]
+        if executor == "serial" or len(todo) == 1 or max_workers == 1:
+            decoded = [_decode(path, mmap=mmap) for path in todo]
+        elif executor == "thread":
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                decoded = list(pool.map(lambda p: _decode(p, mmap=mmap), todo))
+        elif executor == "process":
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                decoded = list(pool.map(_decode_copy, todo, chunksize=max(1, len(todo) // 64)))
+        else:
+            raise ValueError(f"Неизвестный исполнитель: {executor}")
+
+        for (i, path, stamp), value in zip(missing, decoded):
+            results[i] = value
+            if cache:
+                _cache.put(os.path.abspath(path), stamp, value)
+    return results
+
+
+def load_many(paths, max_workers: int = None, executor: str = "process", cache: bool = True):
+    """Длинная таблица кругов по файлам заездов (колонки FRAME_COLUMNS)."""
+    import pandas as pd
+
+    decoded = load_decoded(paths, max_workers=max_workers, executor=executor, cache=cache)
+    parts = [columns for _, columns in decoded if len(columns["lap"])]
+    if not parts:
+        return pd.DataFrame(columns=FRAME_COLUMNS)
+
+    lengths = [len(p["lap"]) for p in parts]
+    data = {
+        "track": np.repeat(np.array([p["track"] for p in parts], dtype=object), lengths),
+        "session_id": np.repeat(np.array([p["session_id"] for p in parts], dtype=object), lengths),
+    }
+    for column in FRAME_COLUMNS[2:]:
+        data[column] = np.concatenate([p[column] for p in parts])
+    return pd.DataFrame(data, columns=FRAME_COLUMNS)
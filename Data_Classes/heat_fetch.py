@@ -0,0 +1,85 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple, Optional
+
+from Parse_data import fetch_race_page, get_session, parse_race_page, validate_track
+from .heat import Heat
+
+
+class FetchResult(NamedTuple):
+    """Результат загрузки одного заезда: heat или error заполнен всегда один."""
+
+    track: str
+    session_id: str
+    heat: Optional[Heat]
+    error: Optional[Exception]
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def fetch_heat(track: str, session_id: str, session=None) -> Heat:
+    """Загружает и разбирает один заезд, бросая исключение при любой ошибке."""
+    validate_track(track)
+    html = fetch_race_page(session_id, track=track, session=session)
+    raw_data = parse_race_page(html)
+    if not raw_data:
+        raise ValueError(
+            f"Нет таблицы результатов для заезда {track}/{session_id}"
+        )
+    return Heat(session_id, track=track, raw_data=raw_data)
+
+
+def _safe_fetch(track: str, session_id: str, session) -> FetchResult:
+    try:
+        heat = fetch_heat(track, session_id, session=session)
+    except Exception as e:
+        return FetchResult(track, session_id, None, e)
+    return FetchResult(track, session_id, heat, None)
+
+
+def fetch_many(heats, max_workers: int = 8, session=None):
+    """
+    Загружает заезды [(track, session_id), ...] пулом из max_workers потоков
+    поверх общей keep-alive сессии и отдаёт FetchResult по мере готовности.
+    """
+    if session is None:
+        session = get_session()
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [
+            pool.submit(_safe_fetch, track, str(session_id), session)
+            for track, session_id in heats
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # генератор закрыт раньше времени: заезды из очереди не загружаем
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def fetch_many_async(heats, max_concurrency: int = 8, session=None):
+    """
+    Асинхронный вариант fetch_many: не более max_concurrency запросов
+    одновременно, результаты отдаются по мере готовности.
+    """
+    if session is None:
+        session = get_session()
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(track, session_id):
+        async with semaphore:
+            return await asyncio.to_thread(_safe_fetch, track, session_id, session)
+
+    tasks = [
+        asyncio.ensure_future(run(track, str(session_id))) for track, session_id in heats
+    ]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
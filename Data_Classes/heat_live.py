@@ -0,0 +1,201 @@
+"""
+Слежение за идущим заездом: периодический опрос страницы и дозапись
+только изменившихся строк кругов в уже существующий Heat.
+"""
+import asyncio
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from Parse_data import fetch_race_page_if_changed, parse_race_page, split_heat_table
+
+EVENT_LAP = "lap"
+EVENT_BEST = "best"  # личный лучший круг пилота
+EVENT_FASTEST = "fastest"  # лучший круг заезда
+EVENT_POSITION = "position"
+
+
+class LapEvent(NamedTuple):
+    kind: str
+    lap: int
+    driver: str
+    column: int
+    time: float
+    position: int
+    # предыдущая позиция (position) или прежний лучший круг (best/fastest)
+    previous: Optional[float] = None
+
+
+def _first_incomplete_lap(table) -> int:
+    """Первый круг, в котором есть пустые ячейки: с него строки могут меняться."""
+    if not table.lap_count:
+        return 0
+    incomplete = np.isnan(table.times).any(axis=1)
+    idx = np.flatnonzero(incomplete)
+    return int(idx[0]) if idx.size else table.lap_count
+
+
+def apply_rows(heat, data):
+    """
+    Применяет свежие строки таблицы к heat: перепроверяет только круги,
+    начиная с первого незаполненного, и дописывает новые. Возвращает
+    список LapEvent. Если состав пилотов изменился, heat пересобирается
+    целиком и событий не возвращается.
+    """
+    driver_row, kart_row, lap_rows, side = split_heat_table(data)
+    if driver_row is None or kart_row is None:
+        return []
+
+    table = heat.laps
+    same_karts = [str(k) for k in kart_row[1:]] == [str(k) for k in table.kart_ids]
+    if driver_row[1:] != table.driver_names or not same_karts:
+        heat._initialize_from_raw_data(data)
+        return []
+
+    heat.side_info = side
+    table.side_info = side
+
+    events = []
+    n_drivers = table.driver_count
+    with np.errstate(all="ignore"):
+        fastest = np.nanmin(table.times) if table.lap_count and not np.isnan(table.times).all() else np.inf
+        personal = np.array([
+            np.nanmin(table.times[:, col]) if not np.isnan(table.times[:, col]).all() else np.inf
+            for col in range(n_drivers)
+        ]) if table.lap_count else np.full(n_drivers, np.inf)
+
+    for lap in range(_first_incomplete_lap(table), len(lap_rows)):
+        row = lap_rows[lap]
+        cells = row[1:n_drivers + 1]
+        cells = cells + [""] * (n_drivers - len(cells))
+        if lap >= table.lap_count:
+            table.append_lap(row[0], [""] * n_drivers)
+
+        for col, cell in enumerate(cells):
+            current = table.cell(lap, col)
+            if cell == current:
+                continue
+            table.set_cell(lap, col, cell)
+            if current:
+                # исправление уже показанного круга — без событий
+                continue
+            lap_time = float(table.times[lap, col])
+            position = int(table.positions[lap, col])
+            name = heat.drivers[col].name if col < len(heat.drivers) else table.driver_names[col]
+            events.append(LapEvent(EVENT_LAP, lap + 1, name, col, lap_time, position))
+
+            if np.isnan(lap_time):
+                continue
+            if lap_time < personal[col]:
+                previous = None if np.isinf(personal[col]) else float(personal[col])
+                events.append(LapEvent(EVENT_BEST, lap + 1, name, col, lap_time, position, previous))
+                personal[col] = lap_time
+            if lap_time < fastest:
+                previous = None if np.isinf(fastest) else float(fastest)
+                events.append(LapEvent(EVENT_FASTEST, lap + 1, name, col, lap_time, position, previous))
+                fastest = lap_time
+            if lap and position:
+                before = int(table.positions[lap - 1, col])
+                if before and before != position:
+                    events.append(
+                        LapEvent(EVENT_POSITION, lap + 1, name, col, lap_time, position, before)
+                    )
+    return events
+
+
+class LivePoller:
+    """Один опрос страницы заезда с условным GET и применением изменений."""
+
+    def __init__(self, heat, session=None) -> None:
+        self.heat = heat
+        self.session = session
+        self.etag = None
+        self.last_modified = None
+        self._last_html = None
+
+    def poll(self):
+        """Возвращает (changed, events)."""
+        html, self.etag, self.last_modified = fetch_race_page_if_changed(
+            self.heat.session_id,
+            track=self.heat.track,
+            etag=self.etag,
+            last_modified=self.last_modified,
+            session=self.session,
+        )
+        if html is None or html == self._last_html:
+            return False, []
+        self._last_html = html
+        self.heat.fetched_at = time.time()
+        return True, apply_rows(self.heat, parse_race_page(html))
+
+
+class _Schedule:
+    """Адаптивный интервал: сброс к минимуму при изменениях, рост при простое."""
+
+    def __init__(self, min_interval, max_interval, backoff, idle_timeout, clock):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.interval = min_interval
+        self.last_change = clock()
+
+    def update(self, changed: bool) -> None:
+        if changed:
+            self.interval = self.min_interval
+            self.last_change = self.clock()
+        else:
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+    @property
+    def finished(self) -> bool:
+        return self.clock() - self.last_change >= self.idle_timeout
+
+
+def follow(
+    heat,
+    min_interval: float = 2.0,
+    max_interval: float = 20.0,
+    backoff: float = 1.5,
+    idle_timeout: float = 300.0,
+    session=None,
+    sleep=time.sleep,
+    clock=time.monotonic,
+):
+    """
+    Генератор LapEvent для идущего заезда. Завершается, когда страница не
+    меняется дольше idle_timeout секунд (заезд окончен).
+    """
+    poller = LivePoller(heat, session=session)
+    schedule = _Schedule(min_interval, max_interval, backoff, idle_timeout, clock)
+    while True:
+        changed, events = poller.poll()
+        schedule.update(changed)
+        yield from events
+        if schedule.finished:
+            return
+        sleep(schedule.interval)
+
+
+async def follow_async(
+    heat,
+    min_interval: float = 2.0,
+    max_interval: float = 20.0,
+    backoff: float = 1.5,
+    idle_timeout: float = 300.0,
+    session=None,
+    clock=time.monotonic,
+):
+    """Асинхронный вариант follow: async-итератор LapEvent."""
+    poller = LivePoller(heat, session=session)
+    schedule = _Schedule(min_interval, max_interval, backoff, idle_timeout, clock)
+    while True:
+        changed, events = await asyncio.to_thread(poller.poll)
+        schedule.update(changed)
+        for event in events:
+            yield event
+        if schedule.finished:
+            return
+        await asyncio.sleep(schedule.interval)
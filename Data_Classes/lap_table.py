@@ -0,0 +1,252 @@
+import numpy as np
+
+from Parse_data import decode_lap_cells, format_lap_cell, format_lap_cells
+
+# значение позиции для отсутствующего круга (позиции нумеруются с 1)
+MISSING_POSITION = 0
+# минимальный запас строк при дозаписи кругов
+_MIN_CAPACITY = 16
+
+
+class LapTable:
+    """
+    Колонки кругов заезда, общие для Heat и всех его Driver.
+
+    times — время круга в секундах, positions — позиция (int, 0 если нет),
+    gaps — отставание в секундах; массивы формы (laps, drivers), NaN для
+    отсутствующих кругов. Исходные строки ячеек ("28.766 P3 +0.123") не
+    хранятся: они восстанавливаются из чисел, а в overrides остаются только
+    ячейки, которые из чисел обратно не собираются.
+    """
+
+    __slots__ = (
+        "driver_names",
+        "kart_ids",
+        "side_info",
+        "overrides",
+        "version",
+        "_labels",
+        "_times",
+        "_positions",
+        "_gaps",
+        "_count",
+    )
+
+    def __init__(
+        self,
+        driver_names,
+        kart_ids,
+        times,
+        positions,
+        gaps,
+        lap_labels=None,
+        overrides=None,
+        side_info=None,
+    ) -> None:
+        self.driver_names = list(driver_names)
+        self.kart_ids = list(kart_ids)
+        self.side_info = side_info if side_info is not None else []
+        # {(lap, driver): исходная строка}
+        self.overrides = overrides if overrides is not None else {}
+        # увеличивается при каждом изменении — для ленивых представлений
+        self.version = 0
+        self._times = times
+        self._positions = positions
+        self._gaps = gaps
+        self._count = times.shape[0]
+        # None — метки кругов "1", "2", ... по порядку
+        self._labels = None
+        if lap_labels is not None:
+            labels = list(lap_labels)
+            if labels != [str(i + 1) for i in range(len(labels))]:
+                self._labels = labels
+
+    # --- размеры и массивы ---
+
+    @property
+    def lap_count(self) -> int:
+        return self._count
+
+    @property
+    def driver_count(self) -> int:
+        return self._times.shape[1]
+
+    @property
+    def times(self):
+        return self._times[: self._count]
+
+    @property
+    def positions(self):
+        return self._positions[: self._count]
+
+    @property
+    def gaps(self):
+        return self._gaps[: self._count]
+
+    @property
+    def lap_labels(self):
+        if self._labels is not None:
+            return list(self._labels)
+        return [str(i + 1) for i in range(self._count)]
+
+    @property
+    def nbytes(self) -> int:
+        return self._times.nbytes + self._positions.nbytes + self._gaps.nbytes
+
+    # --- строки ячеек ---
+
+    def cell(self, lap: int, col: int) -> str:
+        text = self.overrides.get((lap, col))
+        if text is not None:
+            return text
+        return format_lap_cell(
+            float(self._times[lap, col]), int(self._positions[lap, col]), float(self._gaps[lap, col])
+        )
+
+    def column_cells(self, col: int):
+        n = self._count
+        cells = format_lap_cells(
+            self._times[:n, col].tolist(), self._positions[:n, col].tolist(), self._gaps[:n, col].tolist()
+        )
+        for (lap, c), text in self.overrides.items():
+            if c == col:
+                cells[lap] = text
+        return cells
+
+    def row_cells(self, lap: int):
+        cells = format_lap_cells(
+            self._times[lap].tolist(), self._positions[lap].tolist(), self._gaps[lap].tolist()
+        )
+        for (row, col), text in self.overrides.items():
+            if row == lap:
+                cells[col] = text
+        return cells
+
+    def cell_grid(self):
+        """Строки ячеек, массив object (laps, drivers), собранный из колонок."""
+        grid = np.empty((self._count, self.driver_count), dtype=object)
+        grid.ravel()[:] = format_lap_cells(
+            self.times.ravel().tolist(), self.positions.ravel().tolist(), self.gaps.ravel().tolist()
+        )
+        for (lap, col), text in self.overrides.items():
+            grid[lap, col] = text
+        return grid
+
+    def to_grid(self):
+        """Строковая сетка (laps, 1 + drivers): первая колонка — номер круга."""
+        grid = np.empty((self._count, self.driver_count + 1), dtype=object)
+        grid[:, 0] = self.lap_labels
+        grid[:, 1:] = self.cell_grid()
+        return grid
+
+    # --- изменение ---
+
+    def _reserve(self, n_laps: int) -> None:
+        capacity = self._times.shape[0]
+        if n_laps <= capacity:
+            return
+        new_capacity = max(n_laps, capacity * 2, _MIN_CAPACITY)
+        times, positions, gaps = allocate_columns(new_capacity, self.driver_count)
+        times[:capacity] = self._times
+        positions[:capacity] = self._positions
+        gaps[:capacity] = self._gaps
+        self._times, self._positions, self._gaps = times, positions, gaps
+
+    def set_cell(self, lap: int, col: int, text) -> None:
+        """Записывает ячейку из строки, при необходимости добавляя круги."""
+        if lap >= self._count:
+            self._reserve(lap + 1)
+            if self._labels is not None:
+                self._labels.extend(str(i + 1) for i in range(self._count, lap + 1))
+            self._count = lap + 1
+
+        text = "" if text is None else str(text)
+        times, positions, gaps, overrides = decode_lap_cells([text])
+        self._times[lap, col], self._positions[lap, col], self._gaps[lap, col] = times[0], positions[0], gaps[0]
+        if overrides:
+            self.overrides[(lap, col)] = text
+        else:
+            self.overrides.pop((lap, col), None)
+        self.version += 1
+
+    def append_lap(self, label, cells) -> int:
+        """Добавляет строку круга и возвращает её индекс."""
+        lap = self._count
+        if self._labels is None and str(label) != str(lap + 1):
+            self._labels = self.lap_labels
+        if self._labels is not None:
+            self._labels.append(str(label))
+        self._reserve(lap + 1)
+        self._count = lap + 1
+        for col in range(self.driver_count):
+            self.set_cell(lap, col, cells[col] if col < len(cells) else "")
+        return lap
+
+    def add_driver_time(self, col: int, text) -> None:
+        """Дописывает круг пилоту col после его последнего заполненного круга."""
+        filled = np.flatnonzero(~np.isnan(self.times[:, col]))
+        lap = int(filled[-1]) + 1 if filled.size else 0
+        while (lap, col) in self.overrides and lap < self._count:
+            lap += 1
+        self.set_cell(lap, col, text)
+
+    # --- конструкторы ---
+
+    @classmethod
+    def empty(cls) -> "LapTable":
+        return cls([], [], *allocate_columns(0, 0))
+
+    @classmethod
+    def from_rows(cls, driver_names, kart_ids, lap_rows, side_info=None) -> "LapTable":
+        """Собирает таблицу из строк кругов вида ["1", "28.766 P3 +0.123", ...]."""
+        n_drivers = len(driver_names)
+        cells = []
+        for row in lap_rows:
+            row = row[1:n_drivers + 1]
+            cells.extend(row)
+            if len(row) < n_drivers:
+                cells.extend([""] * (n_drivers - len(row)))
+        shape = (len(lap_rows), n_drivers)
+        times, positions, gaps, overrides = _decode_columns(cells, shape)
+        overrides = {divmod(i, n_drivers): text for i, text in overrides.items()}
+        return cls(
+            driver_names, kart_ids, times, positions, gaps,
+            lap_labels=[row[0] for row in lap_rows], overrides=overrides, side_info=side_info,
+        )
+
+    @classmethod
+    def from_driver_times(cls, driver_names, kart_ids, lap_times) -> "LapTable":
+        """Собирает таблицу из строк времён по пилотам (формат JSON-файла)."""
+        n_laps = max((len(t) for t in lap_times), default=0)
+        cells = []
+        for driver_times in lap_times:
+            cells.extend("" if cell is None else str(cell) for cell in driver_times)
+            if len(driver_times) < n_laps:
+                cells.extend([""] * (n_laps - len(driver_times)))
+        # ячейки идут по пилотам: разбираем как (drivers, laps) и транспонируем
+        times, positions, gaps, overrides = _decode_columns(cells, (len(lap_times), n_laps))
+        overrides = {divmod(i, n_laps)[::-1]: text for i, text in overrides.items()}
+        return cls(
+            driver_names, kart_ids,
+            np.ascontiguousarray(times.T), np.ascontiguousarray(positions.T), np.ascontiguousarray(gaps.T),
+            overrides=overrides,
+        )
+
+
+def _decode_columns(cells, shape):
+    times, positions, gaps, overrides = decode_lap_cells(cells)
+    return (
+        np.array(times, dtype=np.float64).reshape(shape),
+        np.array(positions, dtype=np.int16).reshape(shape),
+        np.array(gaps, dtype=np.float64).reshape(shape),
+        overrides,
+    )
+
+
+def allocate_columns(n_laps: int, n_drivers: int):
+    """Создаёт пустые (NaN / MISSING_POSITION) массивы times, positions, gaps."""
+    shape = (n_laps, n_drivers)
+    times = np.full(shape, np.nan, dtype=np.float64)
+    positions = np.full(shape, MISSING_POSITION, dtype=np.int16)
+    gaps = np.full(shape, np.nan, dtype=np.float64)
+    return times, positions, gaps
@@ -1,42 +1,196 @@
-import requests
-from bs4 import BeautifulSoup
+import math
+import os
+import re
+import threading
+from html.parser import HTMLParser
+
+from importlib.util import find_spec
+
+from instrumentation import stage
+
+# requests, BeautifulSoup и lxml импортируются при первом использовании:
+# чтение архива и печать таблиц не должны платить за их загрузку
+HAS_LXML = find_spec("lxml") is not None
 
 VALID_TRACKS = {"narvskaya", "premium", "drive"}
 
+DEFAULT_BASE_URL = "https://timing.batyrshin.name"
+# KART_TIMING_BASE_URL подменяет адрес сайта, например на локальный стенд
+# benchmarks/timing_server.py
+BASE_URL = os.environ.get("KART_TIMING_BASE_URL", DEFAULT_BASE_URL).rstrip("/")
+REQUEST_TIMEOUT = 10
+# размер пула keep-alive соединений общей сессии
+POOL_SIZE = 16
 
-def get_race_results(session_id: str, track: str = "narvskaya"):
-    """
-    Загружает HTML заезда и возвращает список строк таблицы:
-    [
-        ["Driver", "Имя1", "Имя2", ...],
-        ["Kart", "12", "21", ...],
-        ["1", "28.766 P3 +0.123", "28.543 P1", ...],
-        ...
-        ["Best", "27.901", "28.074", ...],
-        ["Avg",  ...],
-        ["Dev",  ...]
-    ]
-    """
+_session = None
+_session_lock = threading.Lock()
+_page_cache = None
+_page_pack = None
+
+# "auto": lxml при наличии, иначе потоковый парсер на stdlib
+EXTRACTION_BACKENDS = ("auto", "lxml", "stream", "bs4")
+_extraction_backend = "auto"
+# страница подаётся потоковому парсеру кусками, чтобы остановиться после таблицы
+STREAM_CHUNK_SIZE = 16 * 1024
+
+
+def get_session():
+    """Возвращает общий requests.Session с пулом keep-alive соединений."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def set_page_cache(cache) -> None:
+    """Включает (PageCache) или отключает (None) дисковый кэш страниц по умолчанию."""
+    global _page_cache
+    _page_cache = cache
+
+
+def get_page_cache():
+    return _page_cache
+
+
+def set_page_pack(pack) -> None:
+    """Включает (page_pack.PagePack) или отключает (None) архив сырых страниц."""
+    global _page_pack
+    _page_pack = pack
+
+
+def get_page_pack():
+    return _page_pack
+
+
+def _archive_page(track: str, session_id, html: str, pack=None) -> None:
+    # в архив идут только загруженные из сети страницы с таблицей заезда
+    if pack is None:
+        pack = _page_pack
+    if pack is not None and "heat-result" in html:
+        pack.append(track, session_id, html)
+
+
+def validate_track(track: str) -> None:
     if track not in VALID_TRACKS:
         raise ValueError(
             f"Unknown track '{track}'. Must be one of: {', '.join(VALID_TRACKS)}"
         )
 
-    url = f"https://timing.batyrshin.name/tracks/{track}/heats/{session_id}"
 
-    try:
-        resp = requests.get(url, timeout=10)
+def set_base_url(url: str = None) -> None:
+    """Меняет адрес сайта хронометража; None возвращает адрес по умолчанию."""
+    global BASE_URL
+    BASE_URL = (url or DEFAULT_BASE_URL).rstrip("/")
+
+
+def get_base_url() -> str:
+    return BASE_URL
+
+
+def heat_url(session_id: str, track: str = "narvskaya", base_url: str = None) -> str:
+    base = base_url.rstrip("/") if base_url else BASE_URL
+    return f"{base}/tracks/{track}/heats/{session_id}"
+
+
+def fetch_race_page(
+    session_id: str, track: str = "narvskaya", session=None, cache=None, base_url=None, pack=None
+) -> str:
+    """
+    Загружает HTML страницы заезда через пул соединений.
+    В отличие от get_race_results не глотает ошибки сети/HTTP.
+
+    Если задан кэш (аргументом или через set_page_cache), завершённые заезды
+    читаются с диска, а остальные перепроверяются условным GET.
+    Загруженные из сети страницы дописываются в архив страниц (pack или
+    set_page_pack), чтобы их можно было разобрать заново без сети.
+    """
+    validate_track(track)
+    if session is None:
+        session = get_session()
+    if cache is None:
+        cache = _page_cache
+
+    url = heat_url(session_id, track, base_url=base_url)
+
+    if cache is None:
+        resp = session.get(url, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
-    except Exception as e:
-        print(f"Ошибка загрузки {url}: {e}")
-        return []
+        _archive_page(track, session_id, resp.text, pack)
+        return resp.text
 
-    soup = BeautifulSoup(resp.text, "html.parser")
-    table = soup.select_one("table.heat-result")
+    if cache.is_finished(track, session_id):
+        html = cache.read(track, session_id)
+        if html is not None:
+            return html
+
+    headers = cache.conditional_headers(track, session_id)
+    resp = session.get(url, timeout=REQUEST_TIMEOUT, headers=headers)
+    if resp.status_code == 304:
+        html = cache.mark_not_modified(track, session_id)
+        if html is not None:
+            return html
+        # запись пропала с диска — загружаем заново без условий
+        resp = session.get(url, timeout=REQUEST_TIMEOUT)
+
+    resp.raise_for_status()
+    cache.store(
+        track,
+        session_id,
+        resp.text,
+        etag=resp.headers.get("ETag"),
+        last_modified=resp.headers.get("Last-Modified"),
+    )
+    _archive_page(track, session_id, resp.text, pack)
+    return resp.text
+
+
+def set_extraction_backend(backend: str) -> None:
+    """Выбирает бэкенд разбора таблицы по умолчанию: auto, lxml, stream, bs4."""
+    global _extraction_backend
+    _resolve_backend(backend)
+    _extraction_backend = backend
+
+
+def available_backends():
+    backends = ["stream", "bs4"]
+    if HAS_LXML:
+        backends.insert(0, "lxml")
+    return backends
+
+
+def _resolve_backend(backend: str) -> str:
+    if backend not in EXTRACTION_BACKENDS:
+        raise ValueError(
+            f"Unknown backend '{backend}'. Must be one of: {', '.join(EXTRACTION_BACKENDS)}"
+        )
+    if backend == "auto":
+        return "lxml" if HAS_LXML else "stream"
+    if backend == "lxml" and not HAS_LXML:
+        raise ImportError("Для бэкенда 'lxml' нужен установленный пакет lxml")
+    return backend
+
+
+def _cell_text(pieces) -> str:
+    """Склеивает текстовые узлы ячейки так же, как get_text(strip=True) + split."""
+    return " ".join("".join(p.strip() for p in pieces).split())
+
+
+def _extract_rows_bs4(html: str):
+    from bs4 import BeautifulSoup
 
+    soup = BeautifulSoup(html, "html.parser")
+    table = soup.select_one("table.heat-result")
     if table is None:
-        print("Не найдена таблица .heat-result — возможно неверный session_id.")
-        return []
+        return None
 
     results = []
     for row in table.find_all("tr"):
@@ -44,10 +198,210 @@ def get_race_results(session_id: str, track: str = "narvskaya"):
         row_text = [" ".join(c.get_text(strip=True).split()) for c in cells]
         if any(row_text):
             results.append(row_text)
+    return results
+
 
+def _extract_rows_lxml(html: str):
+    import lxml.html as lxml_html
+
+    doc = lxml_html.fromstring(html)
+    tables = doc.xpath(
+        "//table[contains(concat(' ', normalize-space(@class), ' '), ' heat-result ')]"
+    )
+    if not tables:
+        return None
+
+    results = []
+    for row in tables[0].iter("tr"):
+        row_text = [_cell_text(c.xpath(".//text()")) for c in row.iter("th", "td")]
+        if any(row_text):
+            results.append(row_text)
     return results
 
 
+class _HeatTableParser(HTMLParser):
+    """Потоковый парсер: собирает строки первой table.heat-result и останавливается."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.found = False
+        self.done = False
+        self._depth = 0
+        self._row = None
+        self._cell = None
+        # HTMLParser режет текстовый узел на границе порций feed(); такие
+        # куски склеиваются обратно, как в одном узле у bs4
+        self._in_text = False
+
+    def _close_cell(self):
+        if self._cell is not None:
+            if self._row is None:
+                self._row = []
+            self._row.append(_cell_text(self._cell))
+            self._cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        if self._row is not None:
+            if any(self._row):
+                self.rows.append(self._row)
+            self._row = None
+
+    def handle_starttag(self, tag, attrs):
+        self._in_text = False
+        if self.done:
+            return
+        if tag == "table":
+            if self._depth:
+                self._depth += 1
+            else:
+                classes = (dict(attrs).get("class") or "").split()
+                if "heat-result" in classes:
+                    self._depth = 1
+                    self.found = True
+            return
+        if not self._depth:
+            return
+        if tag == "tr":
+            self._close_row()
+            self._row = []
+        elif tag in ("td", "th"):
+            self._close_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        self._in_text = False
+        if not self._depth or self.done:
+            return
+        if tag == "table":
+            self._depth -= 1
+            if not self._depth:
+                self._close_row()
+                self.done = True
+        elif tag in ("td", "th"):
+            self._close_cell()
+        elif tag == "tr":
+            self._close_row()
+
+    def handle_data(self, data):
+        if self._cell is not None and not self.done:
+            if self._in_text and self._cell:
+                self._cell[-1] += data
+            else:
+                self._cell.append(data)
+            self._in_text = True
+
+
+def _extract_rows_stream(html: str):
+    parser = _HeatTableParser()
+    for start in range(0, len(html), STREAM_CHUNK_SIZE):
+        parser.feed(html[start:start + STREAM_CHUNK_SIZE])
+        if parser.done:
+            break
+    else:
+        parser.close()
+        parser._close_row()
+
+    return parser.rows if parser.found else None
+
+
+_EXTRACTORS = {
+    "bs4": _extract_rows_bs4,
+    "lxml": _extract_rows_lxml,
+    "stream": _extract_rows_stream,
+}
+
+
+def extract_table_rows(html: str, backend: str = None):
+    """
+    Возвращает строки table.heat-result или None, если таблицы нет.
+    Если быстрый бэкенд падает на странице, используется BeautifulSoup.
+    """
+    name = _resolve_backend(backend or _extraction_backend)
+    try:
+        return _EXTRACTORS[name](html)
+    except Exception:
+        if name == "bs4":
+            raise
+        return _extract_rows_bs4(html)
+
+
+def fetch_race_page_if_changed(
+    session_id: str,
+    track: str = "narvskaya",
+    etag: str = None,
+    last_modified: str = None,
+    session=None,
+):
+    """
+    Условный GET страницы заезда. Возвращает (html, etag, last_modified);
+    html равен None, если сервер ответил 304 Not Modified.
+    """
+    validate_track(track)
+    if session is None:
+        session = get_session()
+
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    resp = session.get(heat_url(session_id, track), timeout=REQUEST_TIMEOUT, headers=headers)
+    if resp.status_code == 304:
+        return None, etag, last_modified
+    resp.raise_for_status()
+    _archive_page(track, session_id, resp.text)
+    return resp.text, resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+
+
+def parse_race_page(html: str, backend: str = None):
+    """Разбирает HTML страницы заезда в список строк таблицы .heat-result."""
+    results = extract_table_rows(html, backend=backend)
+
+    if results is None:
+        print("Не найдена таблица .heat-result — возможно неверный session_id.")
+        return []
+
+    return results
+
+
+def get_race_results(
+    session_id: str, track: str = "narvskaya", session=None, cache=None, base_url=None
+):
+    """
+    Загружает HTML заезда и возвращает список строк таблицы:
+    [
+        ["Driver", "Имя1", "Имя2", ...],
+        ["Kart", "12", "21", ...],
+        ["1", "28.766 P3 +0.123", "28.543 P1", ...],
+        ...
+        ["Best", "27.901", "28.074", ...],
+        ["Avg",  ...],
+        ["Dev",  ...]
+    ]
+
+    base_url по умолчанию берётся из set_base_url / KART_TIMING_BASE_URL.
+    """
+    validate_track(track)
+
+    try:
+        with stage("fetch", track=track) as st:
+            html = fetch_race_page(
+                session_id, track=track, session=session, cache=cache, base_url=base_url
+            )
+            st.add(bytes=len(html))
+    except Exception as e:
+        print(f"Ошибка загрузки {heat_url(session_id, track, base_url)}: {e}")
+        return []
+
+    with stage("parse") as st:
+        rows = parse_race_page(html)
+        st.add(bytes=len(html), count=len(rows))
+    return rows
+
+
 def find_subarray_index(data, word: str) -> int:
     for index, row in enumerate(data):
         if row and row[0].strip() == word:
@@ -116,3 +470,163 @@ def get_side_information(data):
         if row[0] in ("Best", "Avg", "Dev"):
             side.append(row)
     return side
+
+
+# "28.766 P3 +0.123", "1:02.345 P1", "28.148P2+1.184"
+_LAP_CELL_RE = re.compile(
+    r"^\s*(?:(\d+):)?(\d+(?:[.,]\d+)?)\s*(?:P(\d+))?\s*(?:([+-]\s*\d+(?:[.,]\d+)?))?"
+)
+SIDE_ROWS = ("Best", "Avg", "Dev")
+
+
+def decode_lap_cell(cell: str):
+    """
+    Разбирает ячейку круга в (время, позиция, отставание).
+    Время и отставание — секунды (float, NaN если нет), позиция — int (0 если нет).
+    У лидера круга без отставания отставание равно 0.0.
+    """
+    if not cell:
+        return math.nan, 0, math.nan
+    match = _LAP_CELL_RE.match(cell)
+    if match is None:
+        return math.nan, 0, math.nan
+
+    minutes, seconds, position, gap = match.groups()
+    lap_time = float(seconds.replace(",", "."))
+    if minutes:
+        lap_time += int(minutes) * 60
+
+    position = int(position) if position else 0
+    if gap:
+        gap = float(gap.replace(",", ".").replace(" ", ""))
+    elif position == 1:
+        gap = 0.0
+    else:
+        gap = math.nan
+    return lap_time, position, gap
+
+
+def format_lap_cell(lap_time, position=0, gap=math.nan) -> str:
+    """Обратное к decode_lap_cell: собирает строку ячейки в формате сайта."""
+    if math.isnan(lap_time):
+        return ""
+    text = f"{lap_time:.3f}"
+    if position:
+        text += f" P{position}"
+        if not math.isnan(gap) and not (position == 1 and gap == 0.0):
+            text += f" +{gap:.3f}"
+    return text
+
+
+# ровно то, что собирает format_lap_cell: такая ячейка восстанавливается из чисел
+_CANONICAL_CELL_RE = re.compile(
+    r"((?:0|[1-9]\d*)\.\d{3})(?: P([1-9]\d*)(?: \+((?:0|[1-9]\d*)\.\d{3}))?)?"
+)
+
+
+def decode_lap_cells(cells):
+    """
+    Разбирает список ячеек кругов. Возвращает (times, positions, gaps) —
+    списки значений как у decode_lap_cell — и {индекс: строка} для ячеек,
+    которые format_lap_cell из чисел обратно не соберёт. Канонические
+    ячейки проверяются одним регулярным выражением, без обратной сборки.
+    """
+    times, positions, gaps = [], [], []
+    add_time, add_position, add_gap = times.append, positions.append, gaps.append
+    overrides = {}
+    canonical = _CANONICAL_CELL_RE.fullmatch
+    nan = math.nan
+    for i, cell in enumerate(cells):
+        match = canonical(cell) if cell else None
+        if match is not None:
+            lap_time, position, gap = match.groups()
+            add_time(float(lap_time))
+            if not position:
+                add_position(0)
+                add_gap(nan)
+            elif gap:
+                add_position(int(position))
+                add_gap(float(gap))
+                if position == "1" and gap == "0.000":
+                    # у лидера нулевое отставание format_lap_cell не пишет
+                    overrides[i] = cell
+            else:
+                add_position(int(position))
+                add_gap(0.0 if position == "1" else nan)
+        elif cell:
+            lap_time, position, gap = decode_lap_cell(cell)
+            add_time(lap_time)
+            add_position(position)
+            add_gap(gap)
+            overrides[i] = cell
+        else:
+            add_time(nan)
+            add_position(0)
+            add_gap(nan)
+    return times, positions, gaps, overrides
+
+
+def format_lap_cells(times, positions, gaps):
+    """format_lap_cell для последовательностей одинаковой длины; список строк."""
+    cells = []
+    add = cells.append
+    for lap_time, position, gap in zip(times, positions, gaps):
+        if lap_time != lap_time:
+            add("")
+        elif not position:
+            add(f"{lap_time:.3f}")
+        elif gap != gap or (position == 1 and gap == 0.0):
+            add(f"{lap_time:.3f} P{position}")
+        else:
+            add(f"{lap_time:.3f} P{position} +{gap:.3f}")
+    return cells
+
+
+def split_heat_table(data):
+    """
+    Один проход по строкам таблицы. Возвращает (driver_row, kart_row,
+    lap_rows, side): строки Driver и Kart (или None), строки кругов между
+    Kart и Best и строки Best/Avg/Dev.
+    """
+    driver_row = None
+    kart_row = None
+    best_seen = False
+    lap_rows = []
+    side = []
+
+    for row in data:
+        if not row:
+            continue
+        first = row[0]
+        lowered = first.lower()
+        if lowered == "driver":
+            if driver_row is None:
+                driver_row = row
+        elif lowered == "kart":
+            if kart_row is None:
+                kart_row = row
+        elif first in SIDE_ROWS:
+            side.append(row)
+            if first == "Best":
+                best_seen = True
+        elif kart_row is not None and not best_seen and first.isdigit():
+            lap_rows.append(row)
+
+    return driver_row, kart_row, lap_rows, side
+
+
+def decode_heat_table(data):
+    """
+    Один проход по строкам таблицы: пилоты, карты, круги и Best/Avg/Dev.
+    Возвращает LapTable с колонками времени, позиции и отставания.
+    """
+    from Data_Classes.lap_table import LapTable
+
+    driver_row, kart_row, lap_rows, side = split_heat_table(data)
+
+    if driver_row is None or kart_row is None:
+        table = LapTable.empty()
+        table.side_info = side
+        return table
+
+    return LapTable.from_rows(driver_row[1:], kart_row[1:], lap_rows, side_info=side)
@@ -0,0 +1,20 @@
+"""Заезды для тестов, собранные из строк таблицы сайта."""
+from Data_Classes.heat import Heat
+
+
+def make_heat(session_id, names=None, karts=None, laps=None, track="premium", **kwargs):
+    """
+    names — пилоты в порядке мест (по умолчанию D0, D1, ... по числу laps),
+    karts — их карты (по умолчанию 1, 2, ...), laps — круги каждого пилота
+    в секундах (по умолчанию один круг 28 + 0.5 * номер пилота).
+    """
+    if names is None:
+        names = [f"D{i}" for i in range(len(laps))]
+    if karts is None:
+        karts = range(1, len(names) + 1)
+    if laps is None:
+        laps = [[28 + i * 0.5] for i in range(len(names))]
+    rows = [["Driver"] + list(names), ["Kart"] + [str(k) for k in karts]]
+    for lap in range(max(len(t) for t in laps)):
+        rows.append([str(lap + 1)] + [f"{t[lap]:.3f}" if lap < len(t) else "" for t in laps])
+    return Heat(str(session_id), track=track, raw_data=rows, **kwargs)
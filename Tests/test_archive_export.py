@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from archive_export import ExportFilter, export_archive
+from benchmarks.synthetic import generate_heat_rows
+from Data_Classes.heat import Heat
+
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+class TestArchiveExport(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmp.name, "heats_data")
+        os.makedirs(self.dir)
+        self.heats = []
+        for i in range(6):
+            track = "premium" if i % 2 else "drive"
+            heat = Heat(str(10 + i), track=track, raw_data=generate_heat_rows(5, 6, seed=i), fetched_at=1000.0 * i)
+            # половина заездов — в бинарном формате
+            heat.save(os.path.join(self.dir, f"heat_{track}_{10 + i}." + ("kheat" if i % 3 else "json")))
+            self.heats.append(heat)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _csv_rows(self, **kwargs):
+        out = io.StringIO()
+        stats = export_archive(self.dir, out, "csv", **kwargs)
+        out.seek(0)
+        return list(csv.DictReader(out)), stats
+
+    def test_csv_contains_every_lap(self):
+        rows, stats = self._csv_rows()
+        expected = sum(int((~np.isnan(h.lap_times)).sum()) for h in self.heats)
+        self.assertEqual(len(rows), expected)
+        self.assertEqual(stats["rows"], expected)
+        self.assertEqual(stats["exported"], len(self.heats))
+
+        heat = self.heats[0]
+        first = rows[0]
+        self.assertEqual((first["track"], first["session_id"]), ("drive", "10"))
+        self.assertEqual(first["driver"], heat.drivers[0].name)
+        self.assertEqual(int(first["place"]), heat.drivers[0].place)
+        self.assertAlmostEqual(float(first["time"]), float(heat.lap_times[0, 0]), places=3)
+
+    def test_filters(self):
+        rows, stats = self._csv_rows(flt=ExportFilter(tracks=["premium"], start=2000.0, end=5000.0))
+        self.assertEqual({r["session_id"] for r in rows}, {"13"})
+        self.assertEqual(stats["scanned"], 3)
+
+        name = self.heats[1].drivers[2].name
+        rows, _ = self._csv_rows(flt=ExportFilter(drivers=[name.upper()]))
+        self.assertTrue(rows)
+        self.assertEqual({r["driver"] for r in rows}, {name})
+
+    def test_ndjson_and_since_state(self):
+        out = os.path.join(self.tmp.name, "laps.ndjson")
+        state = os.path.join(self.tmp.name, "state.json")
+        stats = export_archive(self.dir, out, flt=None, state_path=state)
+        self.assertEqual(stats["exported"], len(self.heats))
+        with open(out, encoding="utf-8") as f:
+            record = json.loads(f.readline())
+        self.assertEqual(record["track"], "drive")
+        self.assertIsInstance(record["lap"], int)
+
+        # без изменений повторная выгрузка пуста, смена одного mtime её не меняет
+        def rerun():
+            return export_archive(self.dir, io.StringIO(), "ndjson", state_path=state)
+
+        self.assertEqual((rerun()["exported"], rerun()["unchanged"]), (0, len(self.heats)))
+        path = os.path.join(self.dir, "heat_premium_11.kheat")
+        os.utime(path, ns=(10 ** 9, 10 ** 9))
+        self.assertEqual(rerun()["exported"], 0)
+
+        # копия со старым mtime (cp -p) и пересохранённый заезд с новыми кругами выгружаются
+        Heat("20", track="drive", raw_data=generate_heat_rows(5, 6, seed=20)).save(
+            os.path.join(self.dir, "heat_drive_20.json"))
+        os.utime(os.path.join(self.dir, "heat_drive_20.json"), ns=(10 ** 9, 10 ** 9))
+        Heat("11", track="premium", raw_data=generate_heat_rows(5, 8, seed=1)).save(path)
+        stats = rerun()
+        self.assertEqual((stats["exported"], stats["unchanged"]), (2, len(self.heats) - 1))
+        self.assertEqual(rerun()["exported"], 0)
+
+    @unittest.skipUnless(HAS_PYARROW, "нужен pyarrow")
+    def test_parquet_row_groups(self):
+        import pyarrow.parquet as pq
+
+        out = os.path.join(self.tmp.name, "laps.parquet")
+        stats = export_archive(self.dir, out, chunk_rows=50)
+        table = pq.read_table(out)
+        self.assertEqual(table.num_rows, stats["rows"])
+        self.assertGreater(pq.ParquetFile(out).num_row_groups, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
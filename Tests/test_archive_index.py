@@ -0,0 +1,112 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from archive_index import ArchiveIndex
+from Data_Classes.heat import Heat
+from heat_factory import make_heat
+
+
+def laps(n):
+    """Три круга на пилота: 28.1, 28.2, 28.3 у первого, на секунду больше у следующих."""
+    return [[28 + lap * 0.1 + i for lap in range(1, 4)] for i in range(n)]
+
+
+class TestArchiveIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.index = ArchiveIndex(os.path.join(self.tmp.name, "archive.sqlite"))
+        self.heats = [
+            make_heat("1", ["Иван Пётр", "Bob"], [12, 21], laps(2), track="premium"),
+            make_heat("2", ["ИВАН  ПЁТР", "Carl"], [21, 12], laps(2), track="premium"),
+            make_heat("3", ["Bob", "Carl"], [12, 3], laps(2), track="drive"),
+        ]
+        for heat in self.heats:
+            heat.save(os.path.join(self.tmp.name, f"heat_{heat.track}_{heat.session_id}.json"))
+
+    def tearDown(self):
+        self.index.close()
+        self.tmp.cleanup()
+
+    def test_fuzzy_driver_search(self):
+        self.index.ingest_directory(self.tmp.name)
+        self.assertEqual(self.index.search_drivers("Ivan Petr")[0].entries, 2)
+        self.assertEqual(len(self.index.find_heats(driver="Ivan Petr", fuzzy=True)), 2)
+        self.assertEqual(self.index.find_heats(driver="Ivan Petr"), [])
+
+        # новый заезд попадает в уже построенный индекс имён при сохранении
+        heat = make_heat("4", ["Petr Ivan"], [7], laps(1), track="drive")
+        heat.save(os.path.join(self.tmp.name, "heat_drive_4.json"), index=self.index)
+        self.assertEqual(len(self.index.find_heats(driver="иван пётр", fuzzy=True)), 3)
+
+    def test_fuzzy_search_keeps_gendered_surnames_apart(self):
+        make_heat("5", ["Ivan Petrov", "Oleg"], [1, 2], laps(2), track="drive").save(os.path.join(self.tmp.name, "heat_drive_5.json"))
+        make_heat("6", ["Ivan Petrova", "Oleg"], [1, 2], laps(2), track="drive").save(os.path.join(self.tmp.name, "heat_drive_6.json"))
+        self.index.ingest_directory(self.tmp.name)
+        found = self.index.find_heats(driver="Ivan Petrov", fuzzy=True)
+        self.assertEqual([(t, s) for t, s, _ in found], [("drive", "5")])
+
+    def test_incremental_directory_ingest(self):
+        self.assertEqual(self.index.ingest_directory(self.tmp.name), 3)
+        self.assertEqual(self.index.ingest_directory(self.tmp.name), 0)
+        self.assertFalse(self.index.ingest(self.heats[0]))
+
+    def test_queries(self):
+        self.index.ingest_directory(self.tmp.name)
+        self.assertEqual(
+            [(t, s) for t, s, _ in self.index.find_heats(driver="иван петр", track="premium")],
+            [("premium", "1"), ("premium", "2")],
+        )
+        self.assertEqual(len(self.index.find_heats(kart_id=12)), 3)
+
+        frame = self.index.lap_frame(driver="Bob")
+        self.assertEqual(len(frame), 6)
+        self.assertEqual(sorted(frame["track"].unique()), ["drive", "premium"])
+
+        heats = self.index.load_heats(kart_id=3)
+        self.assertEqual(heats[0].get_time_list(), self.heats[2].get_time_list())
+
+    def test_save_hook_and_rebuild_without_file(self):
+        heat = self.heats[2]
+        heat.save(os.path.join(self.tmp.name, "other", "heat.json"), index=self.index)
+        os.remove(os.path.join(self.tmp.name, "other", "heat.json"))
+        rebuilt = self.index.load_heats(track="drive")[0]
+        self.assertEqual(rebuilt.get_time_list(), heat.get_time_list())
+
+    def test_rebuild_keeps_raw_cells_and_side_rows(self):
+        rows = [
+            ["Driver", "Alice", "Bob"],
+            ["Kart", "12", "21"],
+            ["1", "1:02.100 P2 +30.1", "28.543 P1"],
+            ["2", "28.100 P1", "DNF"],
+            ["Best", "28.100", "28.543"],
+        ]
+        heat = Heat("9", track="drive", raw_data=rows, fetched_at=1700000000.0)
+        path = os.path.join(self.tmp.name, "other", "heat.json")
+        heat.save(path, index=self.index)
+        os.remove(path)
+
+        rebuilt = self.index.load_heats(track="drive", driver="Alice")[0]
+        self.assertEqual(rebuilt.get_full_results(), heat.get_full_results())
+        self.assertEqual(rebuilt.side_info, heat.side_info)
+        self.assertEqual(rebuilt.fetched_at, 1700000000.0)
+
+    def test_old_index_gets_new_columns(self):
+        path = os.path.join(self.tmp.name, "old.sqlite")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE heats (id INTEGER PRIMARY KEY, track TEXT NOT NULL, session_id TEXT NOT NULL, "
+            "path TEXT, driver_count INTEGER NOT NULL, lap_count INTEGER NOT NULL, "
+            "ingested_at REAL NOT NULL, UNIQUE (track, session_id))"
+        )
+        conn.close()
+        index = ArchiveIndex(path)
+        self.assertTrue(index.ingest(self.heats[0]))
+        self.assertEqual(index.load_heats(track="premium")[0].get_time_list(), self.heats[0].get_time_list())
+        index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
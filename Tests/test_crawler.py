@@ -0,0 +1,146 @@
+import os
+import tempfile
+import unittest
+
+import requests
+
+from crawler import Checkpoint, Crawler, TokenBucket
+from Data_Classes.heat import Heat
+
+PAGE = """
+<table class="heat-result">
+<tr><th>Driver</th><th>Alice</th></tr>
+<tr><td>Kart</td><td>12</td></tr>
+{laps}
+</table>
+"""
+
+
+def make_page(laps=1):
+    if not laps:
+        return "<html><body>Заезд ещё не начался</body></html>"
+    return PAGE.format(laps="\n".join(f"<tr><td>{lap}</td><td>28.766 P1</td></tr>" for lap in range(1, laps + 1)))
+
+
+class _Response:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(str(self.status_code), response=self)
+
+
+class _Site:
+    """
+    Заезды 1..latest, кроме пропусков; первые запросы к flaky отдают 503.
+    laps — число кругов по номерам (по умолчанию 1, 0 — страница без таблицы).
+    """
+
+    def __init__(self, latest, gaps=(), flaky=()):
+        self.latest = latest
+        self.gaps = set(gaps)
+        self.flaky = {sid: 2 for sid in flaky}
+        self.laps = {}
+        self.requests = []
+
+    def get(self, url, timeout, headers=None):
+        session_id = int(url.rsplit("/", 1)[1])
+        self.requests.append(session_id)
+        if self.flaky.get(session_id):
+            self.flaky[session_id] -= 1
+            return _Response(503)
+        if 1 <= session_id <= self.latest and session_id not in self.gaps:
+            return _Response(200, make_page(self.laps.get(session_id, 1)))
+        return _Response(404)
+
+
+class TestCrawler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.checkpoint_path = os.path.join(self.tmp.name, "checkpoint.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def crawler(self, site):
+        return Crawler(
+            Checkpoint(self.checkpoint_path), rate=1e6, session=site, sleep=lambda s: None
+        )
+
+    def test_find_latest(self):
+        site = _Site(latest=137)
+        self.assertEqual(self.crawler(site).find_latest_session_id("drive"), 137)
+        self.assertLess(len(site.requests), 25)
+
+    def test_find_latest_skips_gaps_on_probe_points(self):
+        # 3, 7, 15 — точки экспоненциального шага, 135 — бинарного
+        for gaps in ({3}, {7}, {15}, {135}, {127, 128}):
+            with self.subTest(gaps=gaps):
+                site = _Site(latest=137, gaps=gaps)
+                crawler = Crawler(Checkpoint(os.path.join(self.tmp.name, f"gaps_{min(gaps)}.json")),
+                                  rate=1e6, session=site, sleep=lambda s: None)
+                self.assertEqual(crawler.find_latest_session_id("drive"), 137)
+
+    def test_probed_pages_are_not_fetched_again(self):
+        site = _Site(latest=20)
+        crawler = self.crawler(site)
+        saved = crawler.sync_track("drive", directory=self.tmp.name)
+        self.assertEqual(len(saved), 20)
+        self.assertEqual(len(site.requests), len(set(site.requests)))
+
+    def test_sync_resumes_without_refetching(self):
+        site = _Site(latest=10, gaps={4}, flaky={7})
+        crawler = self.crawler(site)
+        saved = crawler.sync_track("premium", directory=self.tmp.name, limit=5)
+        self.assertEqual(len(saved), 5)
+
+        # новый запуск с той же контрольной точкой: три самых новых
+        # перепроверяются, остальные загруженные не запрашиваются
+        site.requests.clear()
+        crawler = self.crawler(site)
+        saved = crawler.sync_track("premium", directory=self.tmp.name)
+        self.assertEqual(len(saved), 3 + 4)
+        for session_id in (6, 7):
+            self.assertNotIn(session_id, site.requests)
+        self.assertEqual(crawler.checkpoint.missing["premium"], {4})
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "heat_premium_1.json")))
+
+    def test_running_heat_is_rechecked(self):
+        site = _Site(latest=6)
+        site.laps = {6: 1, 5: 0}
+        self.crawler(site).sync_track("drive", directory=self.tmp.name)
+        checkpoint = Checkpoint(self.checkpoint_path)
+        self.assertEqual(checkpoint.done["drive"], {1, 2, 3})
+        self.assertFalse(checkpoint.missing["drive"])
+
+        # заезд 6 доехал, у 5 появилась таблица, за ними начался 7
+        site.latest = 7
+        site.laps = {6: 4, 5: 2, 7: 1}
+        crawler = self.crawler(site)
+        saved = crawler.sync_track("drive", directory=self.tmp.name)
+        self.assertEqual(len(saved), 4)
+        heat = Heat.load(os.path.join(self.tmp.name, "heat_drive_6.json"))
+        self.assertEqual(heat.lap_count, 4)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp.name, "heat_drive_5.json")))
+        self.assertEqual(crawler.checkpoint.done["drive"], {1, 2, 3, 4})
+
+    def test_token_bucket_waits(self):
+        now = [0.0]
+        waits = []
+
+        def sleep(seconds):
+            waits.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=1, clock=lambda: now[0], sleep=sleep)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertAlmostEqual(sum(waits), 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,7 @@
 import unittest
+
 from Data_Classes.driver import Driver
+from Data_Classes.lap_table import LapTable
 
 
 class TestDriver(unittest.TestCase):
@@ -11,7 +13,7 @@ class TestDriver(unittest.TestCase):
         self.assertEqual(self.driver.get_place(), 1)
         self.assertEqual(self.driver.get_name(), "Max Verstappen")
         self.assertEqual(self.driver.get_kart_id(), 33)
-        self.assertEqual(self.driver.get_lap_time(), [])
+        self.assertEqual(self.driver.get_lap_times(), [])
 
     def test_set_place(self):
         self.driver.set_place(2)
@@ -26,17 +28,17 @@ class TestDriver(unittest.TestCase):
         self.assertEqual(self.driver.get_kart_id(), 99)
 
     def test_add_time(self):
-        self.assertEqual(self.driver.get_lap_time(), [])
+        self.assertEqual(self.driver.get_lap_times(), [])
         self.driver.add_time(60.5)
-        self.assertEqual(self.driver.get_lap_time(), [60.5])
+        self.assertEqual(self.driver.get_lap_times(), [60.5])
         self.driver.add_time(59.8)
         self.driver.add_time(61.2)
-        self.assertEqual(self.driver.get_lap_time(), [60.5, 59.8, 61.2])
+        self.assertEqual(self.driver.get_lap_times(), [60.5, 59.8, 61.2])
 
     def test_get_methods(self):
         self.assertEqual(self.driver.get_name(), "Max Verstappen")
         self.assertEqual(self.driver.get_kart_id(), 33)
-        self.assertEqual(self.driver.get_lap_time(), [])
+        self.assertEqual(self.driver.get_lap_times(), [])
 
     def test_edge_cases(self):
         driver = Driver(1, "", 0)
@@ -45,4 +47,22 @@ class TestDriver(unittest.TestCase):
         self.assertIsNone(driver.get_place())
         self.assertIsNone(driver.get_name())
         driver.add_time(None)
-        self.assertEqual(driver.get_lap_time(), [None])
+        self.assertEqual(driver.get_lap_times(), [None])
+
+    def test_bound_times_write_through_table(self):
+        table = LapTable.from_rows(["A", "B"], [1, 2], [["1", "28.766 P2", "28.543 P1"]])
+        driver = Driver(1, "A", 1)
+        driver.bind(table, 0)
+        self.assertEqual(driver.times, ["28.766 P2"])
+
+        times = driver.times
+        times.append("29.001 P1")
+        self.assertEqual(times, ["28.766 P2", "29.001 P1"])
+        self.assertEqual(driver.times, ["28.766 P2", "29.001 P1"])
+        self.assertEqual(table.lap_count, 2)
+
+        with self.assertRaises(TypeError):
+            driver.times[0] = "27.000 P1"
+        with self.assertRaises(TypeError):
+            driver.times.extend(["30.000"])
+        self.assertEqual(driver.times, ["28.766 P2", "29.001 P1"])
@@ -0,0 +1,94 @@
+import unittest
+
+from driver_names import DriverNameIndex, fold_driver_name, name_trigrams
+
+
+class TestFolding(unittest.TestCase):
+
+    def test_transliteration(self):
+        self.assertEqual(fold_driver_name("Иван  Петров"), "ivan petrov")
+        self.assertEqual(fold_driver_name("IVAN PETROW"), "ivan petrov")
+        self.assertEqual(fold_driver_name("Юрий Хан"), fold_driver_name("Yuriy Khan"))
+        self.assertEqual(fold_driver_name("Пётр К."), "petr k")
+        self.assertEqual(fold_driver_name(None), "")
+
+    def test_word_order_does_not_change_trigrams(self):
+        self.assertEqual(name_trigrams("ivan petrov"), name_trigrams("petrov ivan"))
+
+
+class TestDriverNameIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = DriverNameIndex()
+        for name in ["Иван Петров", "Ivan Petrov", "ivan petrow", "Петров Иван", "Мария Смирнова", "Maria Smirnova", "Олег"]:
+            self.index.add(name)
+
+    def test_search(self):
+        matches = self.index.search("иван петров")
+        self.assertEqual(matches[0].similarity, 1.0)
+        self.assertIn(matches[0].name, {"Иван Петров", "Ivan Petrov", "ivan petrow", "Петров Иван"})
+        self.assertEqual(matches[0].entries, 4)
+        smirnova = self.index.search("Smirnova Maria", min_similarity=0.6)
+        self.assertEqual({m.name for m in smirnova}, {"Maria Smirnova", "Мария Смирнова"})
+        self.assertEqual(len({m.cluster for m in smirnova}), 1)
+        self.assertEqual(self.index.search("Zzz Qqq"), [])
+
+    def test_clusters_and_variants(self):
+        self.assertEqual(
+            self.index.variants("Ivan Petrov"),
+            sorted(["Иван Петров", "Ivan Petrov", "ivan petrow", "Петров Иван"]),
+        )
+        self.assertEqual(self.index.variants("Mariya Smirnova"), ["Maria Smirnova", "Мария Смирнова"])
+        self.assertEqual(self.index.variants("Кто-то"), [])
+        # все написания Ивана сводятся к одному ключу, у Марии два ключа в одном кластере
+        self.assertEqual(self.index.clusters(), [["Maria Smirnova", "Мария Смирнова"]])
+        self.assertNotEqual(self.index.cluster_id("Олег"), self.index.cluster_id("Ivan Petrov"))
+
+    def test_incremental_add_joins_existing_cluster(self):
+        before = self.index.cluster_id("Ivan Petrov")
+        self.index.add("Ivan Petrovv")
+        self.assertEqual(self.index.cluster_id("Ivan Petrovv"), before)
+
+        self.index.discard("ivan petrow")
+        self.assertNotIn("ivan petrow", self.index.variants("Ivan Petrov"))
+
+    def test_discard_removes_key_from_cluster_and_search(self):
+        index = DriverNameIndex()
+        for name in ["Ivan Petrov", "Ivan Petrovv", "Oleg Sidorov"]:
+            index.add(name)
+        self.assertEqual(index.clusters(), [["Ivan Petrov", "Ivan Petrovv"]])
+
+        index.discard("Ivan Petrovv")
+        self.assertEqual(index.clusters(), [])
+        self.assertIsNone(index.cluster_id("Ivan Petrovv"))
+        self.assertEqual([m.name for m in index.search("Ivan Petrovv", min_similarity=0.8)], ["Ivan Petrov"])
+        self.assertTrue(all(m.entries > 0 for m in index.search("Ivan", min_similarity=0.1)))
+
+        index.add("Ivan Petrovv")
+        self.assertEqual(index.cluster_id("Ivan Petrovv"), index.cluster_id("Ivan Petrov"))
+
+
+class TestDistinctDrivers(unittest.TestCase):
+    """Похожие имена разных людей не должны сливаться в одного пилота."""
+
+    def assertSeparate(self, *names):
+        index = DriverNameIndex()
+        for name in names:
+            index.add(name)
+        self.assertEqual(index.clusters(), [], names)
+        self.assertEqual(len({index.cluster_id(name) for name in names}), len(names))
+
+    def test_gendered_surnames(self):
+        self.assertSeparate("Ivan Petrov", "Ivan Petrova")
+        self.assertSeparate("Alexei Ivanov", "Alexey Ivanova")
+        self.assertSeparate("Саша Ковалевский", "Саша Ковалевская")
+
+    def test_no_chaining_through_intermediate_name(self):
+        index = DriverNameIndex()
+        for name in ["Ivan Petrov", "Ivan Petrovv", "Ivan Petrovvv", "Ivan Petrovvvv"]:
+            index.add(name)
+        self.assertNotEqual(index.cluster_id("Ivan Petrov"), index.cluster_id("Ivan Petrovvvv"))
+
+
+if __name__ == "__main__":
+    unittest.main()
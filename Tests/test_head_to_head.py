@@ -0,0 +1,54 @@
+import os
+import tempfile
+import unittest
+
+from head_to_head import HeadToHead
+from heat_factory import make_heat
+
+
+class TestHeadToHead(unittest.TestCase):
+
+    def setUp(self):
+        self.store = HeadToHead()
+        self.store.add_heats([
+            make_heat(1, ["Anna", "Boris", "Vera"], [7, 12, 21], [[30.0, 29.0], [30.5, 29.5], [31.0, 30.0]]),
+            make_heat(2, ["Boris", "anna"], [7, 21], [[29.0, 29.2], [29.4, 29.3]]),
+            make_heat(3, ["Anna", "Boris"], [12, 21], [[28.0], [29.0]]),
+        ])
+
+    def test_driver_pair_both_directions(self):
+        pair = self.store.driver_pair("Anna", "Boris")
+        self.assertEqual((pair["meetings"], pair["wins"], pair["losses"]), (3, 2, 1))
+        # разницы лучших кругов: -0.5, +0.3, -1.0
+        self.assertAlmostEqual(pair["median_delta"], -0.5)
+        reverse = self.store.driver_pair("boris", "ANNA")
+        self.assertEqual((reverse["wins"], reverse["losses"]), (1, 2))
+        self.assertAlmostEqual(reverse["median_delta"], 0.5)
+        self.assertIsNone(self.store.driver_pair("Anna", "Nobody"))
+
+    def test_kart_pair_and_rivals(self):
+        pair = self.store.kart_pair("premium", 7, 21)
+        self.assertEqual((pair["meetings"], pair["wins"]), (2, 2))
+        self.assertIsNone(self.store.kart_pair("drive", 7, 21))
+
+        rivals = self.store.driver_rivals("Anna")
+        self.assertEqual([r["rival"] for r in rivals], ["Boris", "Vera"])
+        self.assertEqual(rivals[0]["meetings"], 3)
+
+    def test_incremental_and_persistent(self):
+        self.assertFalse(self.store.add_heat(make_heat(3, ["Anna", "Boris"], [1, 2], [[1.0], [2.0]])))
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, "h2h.npz")
+        self.store.save(path)
+        loaded = HeadToHead.load(path)
+        self.assertEqual(loaded.driver_pair("Anna", "Boris"), self.store.driver_pair("Anna", "Boris"))
+
+        loaded.add_heat(make_heat(4, ["Boris", "Anna"], [7, 12], [[28.0], [29.0]]))
+        pair = loaded.driver_pair("Anna", "Boris")
+        self.assertEqual((pair["meetings"], pair["wins"], pair["losses"]), (4, 2, 2))
+        self.assertAlmostEqual(pair["median_delta"], (-0.5 + 0.3) / 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
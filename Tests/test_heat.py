@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from benchmarks.synthetic import generate_heat_rows
+from Data_Classes.heat import Heat
+from io_heat import convert_archive, iter_heat_files
+
+ROWS = [
+    ["Driver", "Alice", "Bob"],
+    ["Kart", "12", "21"],
+    ["1", "28.766 P2 +0.223", "28.543 P1"],
+    ["2", "1:02.100 P2 +30.1", "28.600 P1"],
+    ["3", "28.100 P1", ""],
+    ["Best", "28.100", "28.543"],
+]
+
+
+class TestHeatStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.heat = Heat("1", track="premium", raw_data=ROWS)
+
+    def test_driver_times_are_columns_of_shared_table(self):
+        alice, bob = self.heat.drivers
+        self.assertEqual(alice.times, ["28.766 P2 +0.223", "1:02.100 P2 +30.1", "28.100 P1"])
+        self.assertEqual(bob.times, ["28.543 P1", "28.600 P1", ""])
+        self.assertTrue(np.shares_memory(bob.lap_seconds, self.heat.lap_times))
+        self.assertFalse(hasattr(alice, "__dict__"))
+
+    def test_df_laps_is_lazy_and_matches_time_list(self):
+        self.assertIsNone(self.heat._df_laps)
+        self.assertEqual(len(self.heat.df_laps), 3)
+        self.assertEqual(
+            [self.heat.df_laps.columns.tolist()] + self.heat.df_laps.values.tolist(),
+            self.heat.get_time_list(),
+        )
+
+    def test_add_time_updates_table_and_frame(self):
+        self.assertEqual(len(self.heat.df_laps), 3)
+        self.heat.drivers[1].add_time("28.000 P1")
+        self.heat.drivers[1].add_time("28.050 P1")
+        self.assertEqual(self.heat.lap_count, 4)
+        self.assertEqual(len(self.heat.df_laps), 4)
+        self.assertEqual(self.heat.drivers[1].times[2:], ["28.000 P1", "28.050 P1"])
+
+    def test_json_round_trip_keeps_cell_strings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "heat.json")
+            self.heat.save(path)
+            loaded = Heat.load(path)
+        self.assertEqual(loaded.get_time_list(), self.heat.get_time_list())
+        np.testing.assert_array_equal(loaded.lap_gaps, self.heat.lap_gaps)
+
+
+class TestBinaryFormat(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.heat = Heat("7", track="drive", raw_data=ROWS)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_with_mmap(self):
+        path = os.path.join(self.tmp.name, "heat_drive_7.kheat")
+        self.heat.save(path)
+        loaded = Heat.load(path)
+        self.assertIsInstance(loaded.lap_times, np.memmap)
+        self.assertEqual(loaded.get_time_list(), self.heat.get_time_list())
+        self.assertEqual(loaded.side_info, self.heat.side_info)
+        self.assertEqual(loaded.get_kart_numbers(), self.heat.get_kart_numbers())
+
+    def test_resave_to_mapped_path(self):
+        # сохранение поверх файла, из которого отображены круги заезда
+        rows = generate_heat_rows(40, 200, seed=3)
+        path = os.path.join(self.tmp.name, "heat_drive_8.kheat")
+        Heat("8", track="drive", raw_data=rows).save(path)
+        loaded = Heat.load(path)
+        expected = loaded.get_time_list()
+        loaded.save(path)
+        self.assertEqual(loaded.get_time_list(), expected)
+        self.assertEqual(Heat.load(path).get_time_list(), expected)
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_metadata_without_laps(self):
+        path = os.path.join(self.tmp.name, "heat_drive_7.kheat")
+        self.heat.save(path)
+        meta = Heat.read_metadata(path)
+        self.assertEqual(meta["track"], "drive")
+        self.assertEqual([d["name"] for d in meta["drivers"]], ["Alice", "Bob"])
+
+    def test_convert_json_archive(self):
+        self.heat.save(os.path.join(self.tmp.name, "heat_drive_7.json"))
+        converted = convert_archive(self.tmp.name)
+        self.assertEqual(len(converted), 1)
+        self.assertEqual(Heat.load(converted[0]).get_time_list(), self.heat.get_time_list())
+        self.assertEqual(convert_archive(self.tmp.name), [])
+
+    def test_iter_heat_files_prefers_fresh_binary(self):
+        json_path = os.path.join(self.tmp.name, "heat_drive_7.json")
+        self.heat.save(json_path)
+        self.heat.save(os.path.join(self.tmp.name, "heat_drive_10.json"))
+        self.heat.save(os.path.join(self.tmp.name, "heat_premium_2.json"))
+        convert_archive(self.tmp.name)
+        files = list(iter_heat_files(self.tmp.name))
+        self.assertEqual([(t, s) for t, s, _ in files], [("drive", "7"), ("drive", "10"), ("premium", "2")])
+        self.assertTrue(all(path.endswith(".kheat") for _, _, path in files))
+
+        # .json новее своей .kheat: бинарная копия устарела
+        stamp = os.stat(json_path).st_mtime_ns + 10 ** 9
+        os.utime(json_path, ns=(stamp, stamp))
+        files = dict(((t, s), p) for t, s, p in iter_heat_files(self.tmp.name, tracks={"drive"}))
+        self.assertEqual(files[("drive", "7")], json_path)
+        self.assertNotIn(("premium", "2"), files)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from archive_index import ArchiveIndex
+from benchmarks.synthetic import generate_heat_rows
+from Data_Classes import heat_bulk
+from Data_Classes.heat import Heat
+
+
+class TestLoadMany(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+        self.paths = []
+        for i in range(4):
+            heat = Heat(str(100 + i), track="premium", raw_data=generate_heat_rows(6, 8 + i, seed=i))
+            path = os.path.join(self.dir, f"heat_premium_{100 + i}.json")
+            heat.save(path)
+            self.paths.append(path)
+        heat_bulk.clear_load_cache()
+
+    def tearDown(self):
+        heat_bulk.clear_load_cache()
+        self.tmp.cleanup()
+
+    def test_frame_matches_archive_index(self):
+        frame = Heat.load_many(self.paths, executor="thread")
+
+        index = ArchiveIndex(os.path.join(self.dir, "index.sqlite"))
+        for path in self.paths:
+            index.ingest(Heat.load(path), path)
+        expected = index.lap_frame()
+        index.close()
+
+        self.assertEqual(list(frame.columns), list(expected.columns))
+        self.assertEqual(len(frame), len(expected))
+        for column in ("track", "session_id", "driver", "kart_id", "lap"):
+            self.assertEqual(frame[column].tolist(), expected[column].tolist(), column)
+        for column in ("time", "position", "gap"):
+            np.testing.assert_allclose(frame[column].to_numpy(float), expected[column].to_numpy(float))
+
+    def test_memoized_by_mtime(self):
+        first = Heat.load_many(self.dir, executor="serial")
+        self.assertEqual(heat_bulk.load_cache_stats()["hits"], 0)
+        second = Heat.load_many(self.dir, executor="serial")
+        self.assertEqual(heat_bulk.load_cache_stats()["hits"], len(self.paths))
+        self.assertTrue(first.equals(second))
+
+        # изменённый файл перечитывается
+        heat = Heat.load(self.paths[0])
+        heat.drivers[0].name = "Новое Имя"
+        heat.save(self.paths[0])
+        os.utime(self.paths[0], ns=(0, os.stat(self.paths[0]).st_mtime_ns + 10 ** 9))
+        third = Heat.load_many(self.dir, executor="serial")
+        self.assertIn("Новое Имя", set(third["driver"]))
+
+    def test_cached_heats_are_not_mapped(self):
+        path = self.paths[0].replace(".json", ".kheat")
+        Heat.load(self.paths[0]).save(path)
+        (heat, _), = heat_bulk.load_decoded([path], executor="serial")
+        self.assertNotIsInstance(heat.lap_times, np.memmap)
+        self.assertNotIsInstance(heat.lap_times.base, np.memmap)
+        (heat, _), = heat_bulk.load_decoded([path], executor="serial", cache=False)
+        self.assertIsInstance(heat.lap_times, np.memmap)
+
+    def test_glob_prefers_binary(self):
+        Heat.load(self.paths[0]).save(self.paths[0].replace(".json", ".kheat"))
+        files = heat_bulk.expand_paths(os.path.join(self.dir, "heat_premium_*"))
+        self.assertEqual(len(files), len(self.paths))
+        self.assertTrue(files[0].endswith(".kheat"))
+
+
+if __name__ == "__main__":
+    unittest.main()
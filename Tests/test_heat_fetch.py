@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from Data_Classes.heat import Heat
+
+PAGE = """
+<table class="heat-result">
+<tr><th>Driver</th><th>Alice</th><th>Bob</th></tr>
+<tr><td>Kart</td><td>12</td><td>21</td></tr>
+<tr><td>1</td><td>28.766 P2 +0.223</td><td>28.543 P1</td></tr>
+<tr><td>Best</td><td>28.766</td><td>28.543</td></tr>
+</table>
+"""
+
+
+class _Response:
+    text = PAGE
+
+    def raise_for_status(self):
+        pass
+
+
+class _Session:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout, headers=None):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if url.endswith("/404"):
+            raise RuntimeError("HTTP 404")
+        return _Response()
+
+
+class TestFetchMany(unittest.TestCase):
+
+    def test_failures_do_not_abort_batch(self):
+        results = list(
+            Heat.fetch_many([("premium", "1"), ("drive", "404")], session=_Session())
+        )
+        by_id = {r.session_id: r for r in results}
+        self.assertTrue(by_id["1"].ok)
+        self.assertEqual(len(by_id["1"].heat.drivers), 2)
+        self.assertIsNone(by_id["404"].heat)
+        self.assertIsInstance(by_id["404"].error, RuntimeError)
+
+    def test_closing_early_skips_queued_heats(self):
+        session = _Session(delay=0.05)
+        results = Heat.fetch_many([("premium", str(i)) for i in range(1, 41)], max_workers=2, session=session)
+        self.assertTrue(next(results).ok)
+        results.close()
+        time.sleep(0.2)
+        self.assertLess(session.calls, 10)
+
+    def test_async_variant(self):
+        async def collect():
+            return [
+                r async for r in Heat.fetch_many_async(
+                    [("narvskaya", "1"), ("narvskaya", "2")], session=_Session()
+                )
+            ]
+
+        results = asyncio.run(collect())
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(r.ok for r in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+from Data_Classes.heat import Heat
+from Data_Classes.heat_live import EVENT_BEST, EVENT_FASTEST, EVENT_LAP, EVENT_POSITION
+
+HEADER = [["Driver", "Alice", "Bob"], ["Kart", "12", "21"]]
+
+
+def page(*lap_rows):
+    rows = "".join(
+        "<tr>" + "".join(f"<td>{c}</td>" for c in row) + "</tr>" for row in HEADER + list(lap_rows)
+    )
+    return f"<table class='heat-result'>{rows}</table>"
+
+
+class _Response:
+    def __init__(self, status_code, text="", etag=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {"ETag": etag} if etag else {}
+
+    def raise_for_status(self):
+        pass
+
+
+class _LiveSession:
+    """Отдаёт заранее заданные версии страницы; 304, если версия не менялась."""
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.calls = 0
+
+    def get(self, url, timeout, headers=None):
+        version = min(self.calls, len(self.pages) - 1)
+        self.calls += 1
+        etag = f'"{version}"'
+        if headers and headers.get("If-None-Match") == etag:
+            return _Response(304)
+        return _Response(200, self.pages[version], etag)
+
+
+class TestLiveHeat(unittest.TestCase):
+
+    def test_incremental_update_events(self):
+        heat = Heat("5", track="drive", raw_data=HEADER + [["1", "30.000 P1", ""]])
+        events = heat.update_from_raw_data(
+            HEADER + [["1", "30.000 P1", "30.500 P2 +0.500"], ["2", "29.000 P2 +0.100", "28.000 P1"]]
+        )
+        kinds = [(e.kind, e.driver, e.lap) for e in events]
+        self.assertIn((EVENT_LAP, "Bob", 1), kinds)
+        self.assertIn((EVENT_BEST, "Alice", 2), kinds)
+        self.assertIn((EVENT_FASTEST, "Bob", 2), kinds)
+        self.assertIn((EVENT_POSITION, "Alice", 2), kinds)
+        self.assertNotIn((EVENT_LAP, "Alice", 1), kinds)
+        self.assertEqual(heat.lap_count, 2)
+        self.assertEqual(heat.drivers[1].times, ["30.500 P2 +0.500", "28.000 P1"])
+
+    def test_df_laps_rebuilt_after_driver_change(self):
+        heat = Heat("6", track="drive", raw_data=HEADER + [["1", "30.000 P1", "30.500 P2 +0.500"]])
+        self.assertEqual(heat.df_laps.columns.tolist(), ["Lap", "Alice", "Bob"])
+        heat.update_from_raw_data([
+            ["Driver", "Alice", "Bob", "Cid"], ["Kart", "12", "21", "5"],
+            ["1", "30.000 P1", "30.500 P2 +0.500", "31.000 P3 +1.000"],
+            ["2", "29.000 P1", "29.500 P2 +1.000", "30.000 P3 +2.000"],
+        ])
+        self.assertEqual(heat.lap_count, 2)
+        self.assertEqual(heat.df_laps.columns.tolist(), ["Lap", "Alice", "Bob", "Cid"])
+        self.assertEqual(len(heat.df_laps), 2)
+
+    def test_follow_polls_until_idle(self):
+        session = _LiveSession([
+            page(["1", "30.000 P1", ""]),
+            page(["1", "30.000 P1", "30.200 P2 +0.200"]),
+            page(["1", "30.000 P1", "30.200 P2 +0.200"], ["2", "29.900 P1", ""]),
+        ])
+        heat = Heat("5", track="drive", raw_data=[])
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        events = list(
+            heat.follow(
+                session=session, min_interval=1, max_interval=4, idle_timeout=10,
+                sleep=sleep, clock=lambda: now[0],
+            )
+        )
+        laps = [(e.driver, e.lap) for e in events if e.kind == EVENT_LAP]
+        self.assertEqual(laps, [("Bob", 1), ("Alice", 2)])
+        self.assertEqual(heat.lap_count, 2)
+        self.assertEqual(sleeps[:3], [1, 1, 1])
+        self.assertEqual(max(sleeps), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+from Data_Classes.heat import Heat
+from benchmarks.synthetic import generate_heat_rows
+from heat_service import HeatService
+
+
+class CountingLoader:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, track, session_id):
+        with self._lock:
+            self.calls.append((track, session_id))
+        time.sleep(self.delay)
+        if session_id == "404":
+            raise ValueError("Нет таблицы результатов")
+        return Heat(session_id, track=track, raw_data=generate_heat_rows(4, 5, seed=int(session_id)))
+
+
+async def http_get(port, path):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, body = raw.partition(b"\r\n\r\n")
+    status = int(head.split()[1])
+    return status, body
+
+
+class TestHeatService(unittest.TestCase):
+
+    def run_with_service(self, scenario, **kwargs):
+        async def main():
+            service = HeatService(**kwargs)
+            await service.start(port=0)
+            try:
+                return await scenario(service)
+            finally:
+                await service.close()
+
+        return asyncio.run(main())
+
+    def test_concurrent_requests_are_coalesced(self):
+        loader = CountingLoader()
+
+        async def scenario(service):
+            results = await asyncio.gather(*(http_get(service.port, "/heats/premium/7") for _ in range(10)))
+            return service, results
+
+        service, results = self.run_with_service(scenario, loader=loader)
+        self.assertEqual(loader.calls, [("premium", "7")])
+        for status, body in results:
+            self.assertEqual(status, 200)
+            data = json.loads(body)
+            self.assertEqual(len(data["drivers"]), 4)
+        self.assertEqual(service.stats["coalesced"], 9)
+
+    def test_lru_eviction_and_routes(self):
+        loader = CountingLoader(delay=0)
+
+        async def scenario(service):
+            laps = await http_get(service.port, "/heats/drive/1/laps")
+            png = await http_get(service.port, "/heats/drive/1.png")
+            await http_get(service.port, "/heats/drive/2")
+            await http_get(service.port, "/heats/drive/3")
+            await http_get(service.port, "/heats/drive/1")
+            missing = await http_get(service.port, "/heats/drive/404")
+            bad_track = await http_get(service.port, "/heats/moon/1")
+            stats = await http_get(service.port, "/stats")
+            return laps, png, missing, bad_track, stats
+
+        laps, png, missing, bad_track, stats = self.run_with_service(scenario, loader=loader, max_heats=2)
+        self.assertEqual(laps[0], 200)
+        data = json.loads(laps[1])
+        self.assertEqual(len(data["times"]), 5)
+        self.assertEqual(len(data["times"][0]), 4)
+        self.assertEqual(png[0], 200)
+        self.assertTrue(png[1].startswith(b"\x89PNG"))
+        self.assertEqual(missing[0], 404)
+        self.assertEqual(bad_track[0], 400)
+
+        cache = json.loads(stats[1])["cache"]
+        self.assertEqual(cache["size"], 2)
+        self.assertGreaterEqual(cache["evictions"], 1)
+        # drive/1 вытеснен заездами 2 и 3 и загружен повторно
+        self.assertEqual(loader.calls.count(("drive", "1")), 2)
+        routes = {row["labels"]["route"] for row in json.loads(stats[1])["requests"]}
+        self.assertTrue({"heat", "laps", "png"} <= routes)
+
+    def test_cancelled_request_does_not_strand_waiters(self):
+        loader = CountingLoader(delay=0.1)
+
+        async def scenario(service):
+            first = asyncio.ensure_future(service.get_heat("drive", "5"))
+            await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(service.get_heat("drive", "5"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            entry = await asyncio.wait_for(second, timeout=2)
+            return service, entry
+
+        service, entry = self.run_with_service(scenario, loader=loader)
+        self.assertEqual(entry.heat.session_id, "5")
+        self.assertEqual(loader.calls, [("drive", "5")])
+        self.assertEqual(service.cache_stats()["inflight"], 0)
+
+    def test_failed_render_is_retried(self):
+        calls = []
+
+        def flaky_render(heat):
+            calls.append(heat.session_id)
+            if len(calls) == 1:
+                raise OSError("нет шрифта")
+            return b"\x89PNG"
+
+        async def scenario(service):
+            service._render = flaky_render
+            failed = await http_get(service.port, "/heats/drive/1.png")
+            retried = await http_get(service.port, "/heats/drive/1.png")
+            return failed, retried
+
+        failed, retried = self.run_with_service(scenario, loader=CountingLoader(delay=0))
+        self.assertEqual(failed[0], 500)
+        self.assertIn("OSError", json.loads(failed[1])["error"])
+        self.assertEqual(retried, (200, b"\x89PNG"))
+        self.assertEqual(calls, ["1", "1"])
+
+    def test_oversized_request_line(self):
+        async def scenario(service):
+            reader, writer = await asyncio.open_connection("127.0.0.1", service.port)
+            writer.write(b"GET /" + b"x" * 100_000 + b" HTTP/1.1\r\n\r\n")
+            await writer.drain()
+            raw = await asyncio.wait_for(reader.read(), timeout=2)
+            writer.close()
+            return raw
+
+        raw = self.run_with_service(scenario, loader=CountingLoader(delay=0))
+        self.assertTrue(raw.startswith(b"HTTP/1.1 400"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# бюджет на `import main` в свежем процессе, секунды; проверяется, только если
+# задан явно — время импорта зависит от машины и её загрузки
+IMPORT_TIME_BUDGET = os.environ.get("KART_IMPORT_TIME_BUDGET")
+HEAVY_MODULES = ("pandas", "matplotlib", "bs4", "requests")
+IMPORT_MAIN = """
+    import json, sys, time
+    start = time.perf_counter()
+    import main
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"elapsed": elapsed, "modules": sorted(sys.modules)}))
+"""
+
+
+def run_snippet(code: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", textwrap.dedent(code)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_cli_import_skips_heavy_modules(self):
+        modules = run_snippet(IMPORT_MAIN)["modules"]
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, modules)
+
+    @unittest.skipUnless(IMPORT_TIME_BUDGET, "задайте KART_IMPORT_TIME_BUDGET, секунды")
+    def test_cli_import_budget(self):
+        # лучший из трёх запусков: отсекаем шум холодного диска
+        best = min(run_snippet(IMPORT_MAIN)["elapsed"] for _ in range(3))
+        self.assertLess(best, float(IMPORT_TIME_BUDGET))
+
+    def test_heat_round_trip_without_pandas(self):
+        code = """
+            import json, os, sys, tempfile
+            from Data_Classes.heat import Heat
+            rows = [["Driver", "Alice"], ["Kart", "12"], ["1", "28.766 P1"], ["Best", "28.766"]]
+            heat = Heat("1", track="drive", raw_data=rows)
+            with tempfile.TemporaryDirectory() as tmp:
+                for ext in (".json", ".kheat"):
+                    path = os.path.join(tmp, "heat" + ext)
+                    heat.save(path)
+                    Heat.load(path).print_full_results()
+            print(json.dumps({"pandas": "pandas" in sys.modules, "mpl": "matplotlib" in sys.modules}))
+        """
+        result = run_snippet(code)
+        self.assertFalse(result["pandas"])
+        self.assertFalse(result["mpl"])
+
+
+if __name__ == "__main__":
+    unittest.main()
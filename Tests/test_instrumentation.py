@@ -0,0 +1,93 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import instrumentation
+from Data_Classes.heat import Heat
+from instrumentation import HistogramSink, JsonLinesSink, MultiSink, PrometheusTextfileSink, set_sink, stage
+
+ROWS = [["Driver", "Alice", "Bob"], ["Kart", "12", "21"], ["1", "28.766 P2 +0.1", "28.543 P1"]]
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        set_sink(None)
+        self.tmp.cleanup()
+
+    def test_disabled_is_shared_noop(self):
+        set_sink(None)
+        self.assertIs(stage("fetch"), instrumentation._NULL_STAGE)
+
+    def test_heat_stages_reach_all_sinks(self):
+        histograms = HistogramSink()
+        jsonl_path = os.path.join(self.tmp.name, "stages.jsonl")
+        prom_path = os.path.join(self.tmp.name, "kart.prom")
+        jsonl = JsonLinesSink(jsonl_path)
+        prom = PrometheusTextfileSink(prom_path, interval=3600)
+        set_sink(MultiSink(histograms, jsonl, prom))
+
+        heat = Heat("1", track="drive", raw_data=ROWS)
+        path = os.path.join(self.tmp.name, "heat.kheat")
+        heat.save(path)
+        Heat.load(path)
+        with self.assertRaises(FileNotFoundError):
+            Heat.load(os.path.join(self.tmp.name, "missing.json"))
+        jsonl.close()
+        prom.write()
+
+        summary = {(row["stage"], row["labels"].get("format")): row for row in histograms.summary()}
+        self.assertEqual(summary[("heat.build", None)]["items"], 2)
+        self.assertEqual(summary[("heat.save", "kheat")]["bytes"], os.path.getsize(path))
+        self.assertEqual(summary[("heat.load", "json")]["errors"], 1)
+
+        with open(jsonl_path, encoding="utf-8") as f:
+            stages = [json.loads(line)["stage"] for line in f]
+        self.assertEqual(stages[:2], ["heat.build", "heat.save"])
+
+        with open(prom_path, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn('kart_stage_duration_seconds_count{stage="heat.save",format="kheat"} 1', text)
+        self.assertIn('kart_stage_errors_total{stage="heat.load",format="json"} 1', text)
+
+    def test_prometheus_writes_from_many_threads(self):
+        path = os.path.join(self.tmp.name, "kart.prom")
+        set_sink(PrometheusTextfileSink(path, interval=0))
+        errors = []
+
+        def work():
+            try:
+                for _ in range(50):
+                    with stage("fetch"):
+                        pass
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.tmp.name), ["kart.prom"])
+
+    def test_sink_failure_does_not_reach_caller(self):
+        class Broken:
+            def record(self, *args, **kwargs):
+                raise OSError("диск заполнен")
+
+        set_sink(Broken())
+        with stage("parse") as st:
+            st.add(count=1)
+        with self.assertRaises(ValueError):
+            with stage("parse"):
+                raise ValueError("ошибка разбора")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import random
+import unittest
+
+from Data_Classes.heat import Heat
+from kart_stats import DAY, KartRanking
+
+
+def synthetic_season(n_heats, kart_speed, seed=1):
+    rnd = random.Random(seed)
+    skills = {d: rnd.uniform(-1, 1) for d in range(20)}
+    for h in range(n_heats):
+        karts = rnd.sample(sorted(kart_speed), 4)
+        drivers = rnd.sample(sorted(skills), 4)
+        rows = [["Driver"] + [f"d{d}" for d in drivers], ["Kart"] + [str(k) for k in karts]]
+        for lap in range(1, 16):
+            rows.append(
+                [str(lap)]
+                + [
+                    f"{30 + kart_speed[k] + skills[d] + rnd.gauss(0, 0.1):.3f}"
+                    for k, d in zip(karts, drivers)
+                ]
+            )
+        yield Heat(str(h), track="premium", raw_data=rows, fetched_at=1e9 + h * 3600)
+
+
+class TestKartRanking(unittest.TestCase):
+
+    def test_ranking_corrects_for_driver_skill(self):
+        kart_speed = {1: -0.6, 2: -0.2, 3: 0.2, 4: 0.6, 5: 0.0}
+        ranking = KartRanking()
+        ranking.add_heats(synthetic_season(150, kart_speed))
+        table = ranking.ranking("premium")
+        self.assertEqual(table["kart_id"].tolist()[:2], [1, 2])
+        self.assertEqual(table["kart_id"].tolist()[-1], 4)
+        self.assertTrue((table["p10"] <= table["p50"]).all())
+
+    def test_old_laps_decay(self):
+        kart_speed = {1: 0.0, 2: 0.0, 3: 0.0, 4: 0.0}
+        ranking = KartRanking(half_life_days=1)
+        heats = list(synthetic_season(4, kart_speed))
+        ranking.add_heat(heats[0], when=0)
+        before = ranking.ranking("premium", min_laps=0)["laps"].sum()
+        ranking.add_heat(heats[1], when=2 * DAY)
+        after = ranking.ranking("premium", min_laps=0)["laps"].sum()
+        self.assertAlmostEqual(after, before / 4 + 60, delta=1e-6)
+
+    def test_decay_by_session_order(self):
+        # одинаковое время загрузки, как у архива, скачанного разом
+        kart_speed = {1: 0.0, 2: 0.0, 3: 0.0, 4: 0.0}
+        ranking = KartRanking(half_life_heats=2)
+        heats = list(synthetic_season(5, kart_speed))
+        for heat in heats:
+            heat.fetched_at = 1e9
+        ranking.add_heat(heats[0])
+        before = ranking.ranking("premium", min_laps=0)["laps"].sum()
+        ranking.add_heat(heats[4])
+        after = ranking.ranking("premium", min_laps=0)["laps"].sum()
+        self.assertAlmostEqual(after, before / 4 + 60, delta=1e-6)
+
+    def test_heat_counted_once(self):
+        kart_speed = {1: 0.0, 2: 0.0, 3: 0.0, 4: 0.0}
+        ranking = KartRanking()
+        heat = next(synthetic_season(1, kart_speed))
+        self.assertEqual(ranking.add_heat(heat), 60)
+        self.assertEqual(ranking.add_heat(heat), 0)
+        self.assertEqual(ranking.ranking("premium", min_laps=0)["laps"].sum(), 60)
+
+    def test_heats_decay_best_is_lifetime(self):
+        kart_speed = {k: 0.0 for k in range(1, 9)}
+        ranking = KartRanking(half_life_heats=1)
+        first, _, second = synthetic_season(3, kart_speed)
+        ranking.add_heat(first)
+        best = ranking.ranking("premium", min_laps=0).set_index("kart_id")["best"]
+        ranking.add_heat(second)
+        table = ranking.ranking("premium", min_laps=0).set_index("kart_id")
+        # карты только первого заезда: за два номера вес заезда упал вчетверо
+        idle = {d.kart_id for d in first.drivers} - {d.kart_id for d in second.drivers}
+        self.assertTrue(idle)
+        for kart in idle:
+            self.assertAlmostEqual(table.loc[kart, "heats"], 0.25)
+            self.assertEqual(table.loc[kart, "best"], best[kart])
+
+
+if __name__ == "__main__":
+    unittest.main()
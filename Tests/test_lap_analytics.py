@@ -0,0 +1,90 @@
+import math
+import unittest
+
+import numpy as np
+
+import lap_analytics
+from Data_Classes.heat import Heat
+from benchmarks.synthetic import generate_heat_rows
+from heat_factory import make_heat
+
+
+class TestLapAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        # второй пилот проехал на круг меньше и один раз развернулся
+        self.heat = make_heat(1, laps=[[30.0, 29.0, 29.5, 29.2], [31.0, 40.0, 30.0]])
+
+    def test_outliers_and_stdev(self):
+        mask = lap_analytics.clean_lap_mask(self.heat.lap_times)
+        self.assertTrue(mask[:, 0].all())
+        self.assertEqual(mask[:3, 1].tolist(), [True, False, True])
+        stdev = lap_analytics.clean_stdev(self.heat.lap_times)
+        self.assertAlmostEqual(stdev[1], np.std([31.0, 30.0]))
+
+    def test_gap_and_theoretical_best(self):
+        gap = lap_analytics.gap_to_leader(self.heat.lap_times)
+        self.assertEqual(gap[0].tolist(), [0.0, 1.0])
+        self.assertAlmostEqual(gap[1, 1], 12.0)
+        self.assertTrue(math.isnan(gap[3, 1]))
+
+        best, theoretical, lost = lap_analytics.theoretical_best(self.heat.lap_times)
+        self.assertEqual(best.tolist(), [29.0, 30.0])
+        self.assertAlmostEqual(lost[1], 101.0 - 90.0)
+
+    def test_rolling_best(self):
+        result = lap_analytics.rolling_best(self.heat.lap_times, 2)
+        self.assertAlmostEqual(result[0], 29.25)
+        self.assertAlmostEqual(result[1], 35.0)
+        self.assertTrue(np.isnan(lap_analytics.rolling_best(self.heat.lap_times, 5)).all())
+
+    def test_race_positions_with_lapped_driver(self):
+        # третий пилот обгоняет второго на третьем круге и сходит после него
+        heat = make_heat(2, laps=[[30.0, 30.0, 30.0, 30.0], [31.0, 31.0, 33.0, 31.0], [32.0, 30.5, 30.0]])
+        positions, gaps = heat.race_timeline()
+        self.assertEqual(positions.tolist(), [[1, 2, 3], [1, 2, 3], [1, 3, 2], [1, 2, 0]])
+        self.assertEqual(gaps[2].tolist(), [0.0, 5.0, 2.5])
+        self.assertTrue(math.isnan(gaps[3, 2]))
+
+    def test_race_positions_match_site_annotations(self):
+        heats = [Heat(str(i), track="drive", raw_data=generate_heat_rows(10, 30, seed=i)) for i in range(3)]
+        times, _, _ = lap_analytics.stack_lap_times(heats)
+        positions, gaps = lap_analytics.race_timeline(times)
+        cumulative = lap_analytics.cumulative_times(times)
+        for i, heat in enumerate(heats):
+            lap_count, n = heat.lap_count, len(heat.drivers)
+            computed = positions[i, :lap_count, :n]
+            # расхождения допустимы только при равном суммарном времени (округление)
+            for lap, col in np.argwhere(computed != heat.lap_positions):
+                self.assertGreater(np.isclose(cumulative[i, lap, :n], cumulative[i, lap, col]).sum(), 1)
+            done = computed > 0
+            np.testing.assert_allclose(gaps[i, :lap_count, :n][done], heat.lap_gaps[done], atol=0.01)
+        self.assertTrue((positions[times.shape[0] - 1, heats[-1].lap_count:] == 0).all())
+
+    def test_batch_matches_single_heats(self):
+        heats = [
+            Heat(str(i), track="drive", raw_data=generate_heat_rows(4 + i, 8 + 5 * i, seed=i)) for i in range(4)
+        ]
+        batch = lap_analytics.heat_summary(heats)
+        single = [h.lap_summary() for h in heats]
+        self.assertEqual(len(batch), sum(len(s) for s in single))
+        offset = 0
+        for frame in single:
+            part = batch.iloc[offset:offset + len(frame)].reset_index(drop=True)
+            np.testing.assert_allclose(
+                part.select_dtypes("number").to_numpy(dtype=float),
+                frame.select_dtypes("number").to_numpy(dtype=float),
+            )
+            offset += len(frame)
+
+        first = single[0].iloc[0]
+        self.assertEqual(first["gap"], 0.0)
+        self.assertEqual(first["laps"], heats[0].lap_count)
+
+    def test_empty(self):
+        self.assertTrue(lap_analytics.heat_summary([]).empty)
+        self.assertTrue(lap_analytics.heat_summary(Heat("0", track="drive", raw_data=[])).empty)
+
+
+if __name__ == "__main__":
+    unittest.main()
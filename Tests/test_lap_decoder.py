@@ -0,0 +1,86 @@
+import math
+import os
+import unittest
+
+import numpy as np
+
+from Data_Classes.heat import Heat
+from Parse_data import (
+    decode_heat_table,
+    decode_lap_cell,
+    decode_lap_cells,
+    format_lap_cell,
+    format_lap_cells,
+    parse_race_page,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+class TestDecodeLapCell(unittest.TestCase):
+
+    def test_full_cell(self):
+        self.assertEqual(decode_lap_cell("28.766 P3 +0.123"), (28.766, 3, 0.123))
+
+    def test_leader_has_zero_gap(self):
+        self.assertEqual(decode_lap_cell("28.543 P1"), (28.543, 1, 0.0))
+
+    def test_minutes(self):
+        lap_time, position, gap = decode_lap_cell("1:02.500 P2 +1.5")
+        self.assertAlmostEqual(lap_time, 62.5)
+        self.assertEqual((position, gap), (2, 1.5))
+
+    def test_missing(self):
+        lap_time, position, gap = decode_lap_cell("")
+        self.assertTrue(math.isnan(lap_time))
+        self.assertEqual(position, 0)
+        self.assertTrue(math.isnan(gap))
+
+    def test_batch_matches_single_cells(self):
+        cells = [
+            "28.766 P3 +0.123", "28.543 P1", "28.543 P1 +0.000", "28.543 P1 +0.200", "1:02.500 P2 +1.5",
+            "28.148P2+1.184", "28.7 P2", "028.766", "28.766", "28.766 +0.1", "28.766 P2 -0.100", "", "DNF",
+        ]
+        times, positions, gaps, overrides = decode_lap_cells(cells)
+        for i, cell in enumerate(cells):
+            expected = decode_lap_cell(cell)
+            np.testing.assert_equal((times[i], positions[i], gaps[i]), expected, cell)
+            # в overrides — ровно те ячейки, что не собираются из чисел
+            self.assertEqual(i in overrides, format_lap_cell(*expected) != cell, cell)
+        expected = [format_lap_cell(*values) for values in zip(times, positions, gaps)]
+        self.assertEqual(format_lap_cells(times, positions, gaps), expected)
+
+
+class TestDecodeHeatTable(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(DATA_DIR, "heat_premium_4821.html"), encoding="utf-8") as f:
+            self.rows = parse_race_page(f.read())
+
+    def test_columns(self):
+        table = decode_heat_table(self.rows)
+        self.assertEqual(table.times.shape, (15, 6))
+        self.assertEqual(table.positions.dtype, np.int16)
+        self.assertEqual(len(table.side_info), 3)
+        # у пятого пилота нет последних трёх кругов
+        self.assertTrue(np.isnan(table.times[12:, 4]).all())
+        self.assertTrue((table.positions[12:, 4] == 0).all())
+
+    def test_heat_exposes_same_columns_after_reload(self):
+        heat = Heat("4821", track="premium", raw_data=self.rows)
+        reloaded = Heat(
+            "4821",
+            track="premium",
+            load_from_file=True,
+            drivers=[
+                {"place": d.place, "name": d.name, "kart_id": d.kart_id, "times": d.times}
+                for d in heat.drivers
+            ],
+        )
+        np.testing.assert_array_equal(heat.lap_times, reloaded.lap_times)
+        np.testing.assert_array_equal(heat.lap_positions, reloaded.lap_positions)
+        np.testing.assert_array_equal(heat.lap_gaps, reloaded.lap_gaps)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from page_cache import PageCache
+from Parse_data import fetch_race_page
+
+
+class _Response:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class _Session:
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, timeout, headers=None):
+        self.calls.append(headers or {})
+        if headers and headers.get("If-None-Match") == '"v1"':
+            return _Response(304)
+        return _Response(200, "<html>heat</html>", {"ETag": '"v1"'})
+
+
+class TestPageCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_live_heat_is_revalidated(self):
+        cache = PageCache(self.dir, finished_after=3600)
+        session = _Session()
+        first = fetch_race_page("1", "premium", session=session, cache=cache)
+        second = fetch_race_page("1", "premium", session=session, cache=cache)
+        self.assertEqual(first, second)
+        self.assertEqual(session.calls[1], {"If-None-Match": '"v1"'})
+        self.assertEqual(cache.stats["misses"], 1)
+        self.assertEqual(cache.stats["revalidated"], 1)
+
+    def test_finished_heat_served_from_disk(self):
+        cache = PageCache(self.dir, finished_after=0)
+        session = _Session()
+        fetch_race_page("1", "premium", session=session, cache=cache)
+        # новый экземпляр читает индекс с диска
+        cache = PageCache(self.dir, finished_after=0)
+        fetch_race_page("1", "premium", session=session, cache=cache)
+        self.assertEqual(len(session.calls), 1)
+        self.assertEqual(cache.stats["hits"], 1)
+
+    def test_lru_eviction_under_byte_budget(self):
+        cache = PageCache(self.dir, max_bytes=25)
+        cache.store("drive", "1", "a" * 10)
+        cache.store("drive", "2", "b" * 10)
+        cache.read("drive", "1")
+        cache.store("drive", "3", "c" * 10)
+        self.assertIsNotNone(cache.lookup("drive", "1"))
+        self.assertIsNone(cache.lookup("drive", "2"))
+        self.assertEqual(cache.stats["evictions"], 1)
+        self.assertLessEqual(cache.total_bytes, 25)
+        self.assertFalse(os.path.exists(os.path.join(self.dir, "drive_2.html")))
+
+
+if __name__ == "__main__":
+    unittest.main()
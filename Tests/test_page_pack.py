@@ -0,0 +1,121 @@
+import os
+import tempfile
+import unittest
+
+from Data_Classes.heat import Heat
+from Parse_data import fetch_race_page, parse_race_page
+from page_pack import INDEX_FILE, PACK_FILE, PagePack, reparse_all
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+class _Response:
+    def __init__(self, text):
+        self.status_code = 200
+        self.text = text
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+class _Session:
+    def __init__(self, text):
+        self.text = text
+
+    def get(self, url, timeout, headers=None):
+        return _Response(self.text)
+
+
+class TestPagePack(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmp.name, "pack")
+        with open(os.path.join(DATA_DIR, "heat_premium_4821.html"), encoding="utf-8") as f:
+            self.html = f.read()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_append_dedupe_and_versions(self):
+        with PagePack(self.dir) as pack:
+            self.assertTrue(pack.append("premium", "1", self.html, fetched_at=100.0))
+            self.assertFalse(pack.append("premium", "1", self.html))
+            self.assertTrue(pack.append("drive", "2", "<p>v1</p>"))
+            self.assertTrue(pack.append("drive", "2", "<p>v2</p>"))
+            self.assertEqual(pack.read("drive", "2"), "<p>v2</p>")
+            self.assertIsNone(pack.read("drive", "3"))
+
+        # новый экземпляр находит последние версии через индекс на диске
+        with PagePack(self.dir) as pack:
+            self.assertEqual(len(pack), 2)
+            self.assertEqual(pack.keys(), [("drive", "2"), ("premium", "1")])
+            self.assertEqual(pack.read("premium", "1"), self.html)
+            self.assertEqual(pack.read("drive", "2"), "<p>v2</p>")
+            self.assertEqual(pack.lookup("premium", "1")["fetched_at"], 100.0)
+            self.assertFalse(pack.append("drive", "2", "<p>v2</p>"))
+
+    def test_rebuild_index_after_torn_write(self):
+        with PagePack(self.dir) as pack:
+            pack.append("premium", "1", self.html)
+            pack.append("premium", "2", "<p>second</p>")
+        # обрыв: недописанный член в pack, индекс потерян
+        with open(os.path.join(self.dir, PACK_FILE), "ab") as f:
+            f.write(b"\x1f\x8b\x08\x08garbage")
+        os.remove(os.path.join(self.dir, INDEX_FILE))
+
+        with PagePack(self.dir) as pack:
+            self.assertEqual(len(pack), 0)
+            self.assertEqual(pack.rebuild_index(), 2)
+            self.assertEqual(pack.read("premium", "1"), self.html)
+            self.assertEqual(pack.read("premium", "2"), "<p>second</p>")
+
+    def test_append_after_torn_index_record(self):
+        with PagePack(self.dir) as pack:
+            pack.append("narvskaya", "1", "<p>one</p>")
+        with open(os.path.join(self.dir, INDEX_FILE), "ab") as f:
+            f.write(b"x" * 20)
+
+        with PagePack(self.dir) as pack:
+            self.assertTrue(pack.append("narvskaya", "2", "<p>two</p>"))
+        with PagePack(self.dir) as pack:
+            self.assertEqual(pack.keys(), [("narvskaya", "1"), ("narvskaya", "2")])
+            self.assertEqual(pack.read("narvskaya", "2"), "<p>two</p>")
+
+    def test_rebuild_index_skips_torn_member(self):
+        with PagePack(self.dir) as pack:
+            pack.append("premium", "1", self.html)
+        # недописанный член посреди pack, после него — новые страницы
+        with open(os.path.join(self.dir, PACK_FILE), "ab") as f:
+            f.write(b"\x1f\x8b\x08\x08\x00\x00\x00\x00\x00\xffpremium/9\x00garbage")
+        with PagePack(self.dir) as pack:
+            pack.append("premium", "2", "<p>second</p>")
+            pack.append("premium", "3", self.html.replace("heat-result", "heat-result "))
+        os.remove(os.path.join(self.dir, INDEX_FILE))
+
+        with PagePack(self.dir) as pack:
+            self.assertEqual(pack.rebuild_index(), 3)
+            self.assertEqual(pack.keys(), [("premium", "1"), ("premium", "2"), ("premium", "3")])
+            self.assertEqual(pack.read("premium", "2"), "<p>second</p>")
+
+    def test_fetch_hook_and_reparse(self):
+        pack = PagePack(self.dir)
+        fetch_race_page("4821", "premium", session=_Session(self.html), pack=pack)
+        fetch_race_page("404", "premium", session=_Session("<html>нет заезда</html>"), pack=pack)
+        self.assertEqual(pack.keys(), [("premium", "4821")])
+        pack.close()
+
+        out = os.path.join(self.tmp.name, "heats_data")
+        written, errors = reparse_all(self.dir, out, ".kheat", processes=1)
+        self.assertEqual(errors, [])
+        self.assertEqual(written, [os.path.join(out, "heat_premium_4821.kheat")])
+
+        expected = Heat("4821", track="premium", raw_data=parse_race_page(self.html))
+        heat = Heat.load(written[0])
+        self.assertEqual(heat.get_time_list(), expected.get_time_list())
+        self.assertEqual(heat.get_driver_names(), expected.get_driver_names())
+
+
+if __name__ == "__main__":
+    unittest.main()
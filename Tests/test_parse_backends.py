@@ -0,0 +1,51 @@
+import glob
+import os
+import unittest
+from unittest import mock
+
+import Parse_data
+from Parse_data import available_backends, extract_table_rows
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+class TestExtractionBackends(unittest.TestCase):
+
+    def setUp(self):
+        self.pages = sorted(glob.glob(os.path.join(DATA_DIR, "heat_*.html")))
+        self.assertTrue(self.pages, "нет сохранённых страниц в Tests/data")
+
+    def test_backends_produce_identical_rows(self):
+        for path in self.pages:
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+            expected = extract_table_rows(html, backend="bs4")
+            self.assertTrue(expected)
+            for backend in available_backends():
+                with self.subTest(page=os.path.basename(path), backend=backend):
+                    self.assertEqual(extract_table_rows(html, backend=backend), expected)
+
+    def test_stream_chunk_boundaries(self):
+        # текст ячейки, разрезанный между порциями feed(), не должен терять пробелы
+        for path in self.pages:
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+            expected = extract_table_rows(html, backend="bs4")
+            for chunk_size in (7, 64, 1000):
+                with self.subTest(page=os.path.basename(path), chunk_size=chunk_size):
+                    with mock.patch.object(Parse_data, "STREAM_CHUNK_SIZE", chunk_size):
+                        self.assertEqual(extract_table_rows(html, backend="stream"), expected)
+
+    def test_missing_table(self):
+        html = "<html><body><table class='menu'><tr><td>x</td></tr></table></body></html>"
+        for backend in available_backends():
+            with self.subTest(backend=backend):
+                self.assertIsNone(extract_table_rows(html, backend=backend))
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            extract_table_rows("<table></table>", backend="regex")
+
+
+if __name__ == "__main__":
+    unittest.main()
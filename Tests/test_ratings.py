@@ -0,0 +1,51 @@
+import os
+import tempfile
+import unittest
+
+from heat_factory import make_heat
+from ratings import RatingEngine
+
+
+class TestRatingEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.heats = [
+            make_heat("1", ["Ann", "Ben", "Cid"], track="narvskaya"),
+            make_heat("2", ["Ann", "Cid", "Ben"], track="narvskaya"),
+            make_heat("3", ["ann", "Dan"], track="narvskaya"),
+            make_heat("4", ["Ben", "Ann"], track="drive"),
+        ]
+
+    def test_ratings_and_leaderboard(self):
+        engine = RatingEngine.replay(self.heats)
+        top = engine.top("narvskaya", n=2)
+        self.assertEqual(top[0]["name"], "Ann")
+        self.assertEqual(top[0]["wins"], 3)
+        self.assertEqual(top[0]["heats"], 3)
+        self.assertAlmostEqual(top[0]["best_lap"], 28.0)
+        self.assertGreater(engine.rating("drive", "Ben"), engine.rating("drive", "Ann"))
+        self.assertFalse(engine.add_heat(self.heats[0]))
+
+    def test_same_name_twice_in_heat(self):
+        doubled = RatingEngine()
+        doubled.add_heat(make_heat("1", ["Ann", "ANN", "Ben"], track="narvskaya"))
+        single = RatingEngine()
+        single.add_heat(make_heat("1", ["Ann", "Ben"], track="narvskaya"))
+        self.assertEqual(doubled.rating("narvskaya", "Ann"), single.rating("narvskaya", "Ann"))
+        self.assertEqual(doubled.rating("narvskaya", "Ben"), single.rating("narvskaya", "Ben"))
+        self.assertEqual(doubled.stats("narvskaya", "Ann")["heats"], 1)
+
+    def test_snapshot_round_trip(self):
+        engine = RatingEngine.replay(self.heats)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "ratings.npz")
+            engine.save(path)
+            loaded = RatingEngine.load(path)
+        self.assertEqual(loaded.top("narvskaya"), engine.top("narvskaya"))
+        self.assertEqual(loaded.processed, engine.processed)
+        loaded.add_heat(make_heat("5", ["Dan", "Ann"], track="narvskaya"))
+        self.assertEqual(loaded.stats("narvskaya", "Dan")["wins"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
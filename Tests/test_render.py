@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from PIL import Image
+
+from Data_Classes.heat import Heat
+from Parse_data import parse_race_page
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+class TestRender(unittest.TestCase):
+
+    def setUp(self):
+        with open(os.path.join(DATA_DIR, "heat_premium_4821.html"), encoding="utf-8") as f:
+            self.heat = Heat("4821", track="premium", raw_data=parse_race_page(f.read()))
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _render(self, backend):
+        path = os.path.join(self.tmp.name, f"{backend}.png")
+        return self.heat.generate_results_image(filename=path, backend=backend)
+
+    def test_pillow_highlights_cells_with_spaces(self):
+        path = self._render("pillow")
+        image = Image.open(path).convert("RGB")
+        colors = {color for _, color in image.getcolors(maxcolors=1 << 16)}
+        self.assertIn((0x33, 0x33, 0x33), colors)
+        self.assertIn((0xF1, 0xF1, 0xF1), colors)
+
+    def test_batch_render(self):
+        paths = []
+        for i in range(3):
+            path = os.path.join(self.tmp.name, f"heat_premium_{i}.kheat")
+            self.heat.session_id = str(i)
+            self.heat.save(path)
+            paths.append(path)
+        out_dir = os.path.join(self.tmp.name, "png")
+        result = Heat.generate_results_images(paths, out_dir=out_dir, processes=2)
+        self.assertEqual(
+            sorted(os.path.basename(p) for p in result),
+            [f"heat_premium_{i}.png" for i in range(3)],
+        )
+
+    def test_lap_chart(self):
+        path = self.heat.generate_lap_chart(os.path.join(self.tmp.name, "laps.png"))
+        image = Image.open(path).convert("RGB")
+        colors = {color for _, color in image.getcolors(maxcolors=1 << 16)}
+        self.assertIn((0x1F, 0x77, 0xB4), colors)
+
+        out_dir = os.path.join(self.tmp.name, "charts")
+        result = Heat.generate_lap_charts([self.heat], out_dir=out_dir)
+        self.assertEqual([os.path.basename(p) for p in result], ["heat_premium_4821_laps.png"])
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            self.heat.generate_results_image(os.path.join(self.tmp.name, "x.png"), backend="svg")
+        with self.assertRaises(ValueError):
+            Heat.generate_results_images([self.heat], out_dir=self.tmp.name, backend="typo", processes=1)
+
+    def test_batch_skips_heat_without_laps(self):
+        empty = Heat("1", track="premium", raw_data=[])
+        result = Heat.generate_results_images([empty, self.heat], out_dir=self.tmp.name, processes=1)
+        self.assertIsNone(result[0])
+        self.assertTrue(result[1].endswith("heat_premium_4821.png"))
+
+
+if __name__ == "__main__":
+    unittest.main()
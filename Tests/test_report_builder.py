@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+from Data_Classes.heat import Heat
+from Parse_data import parse_race_page
+from report_builder import ReportBuilder
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+class TestReportBuilder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self.tmp.name, "heats_data")
+        self.out = os.path.join(self.tmp.name, "report")
+        os.makedirs(self.src)
+        with open(os.path.join(DATA_DIR, "heat_premium_4821.html"), encoding="utf-8") as f:
+            raw = parse_race_page(f.read())
+        for session_id in ("4821", "4822"):
+            Heat(session_id, track="premium", raw_data=raw).save(self._path(session_id))
+        self.builder = ReportBuilder(self.src, self.out, processes=1)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _path(self, session_id):
+        return os.path.join(self.src, f"heat_premium_{session_id}.json")
+
+    def test_incremental_rebuild(self):
+        first = self.builder.build()
+        self.assertEqual((first["rendered"], first["skipped"], first["errors"]), (2, 0, []))
+        for name in ("heat_premium_4821.html", "heat_premium_4821.png", "heat_premium_4822.png"):
+            self.assertTrue(os.path.exists(os.path.join(self.out, "heats", name)))
+        with open(os.path.join(self.out, "tracks", "premium.html"), encoding="utf-8") as f:
+            self.assertIn("heat_premium_4822.html", f.read())
+        drivers = os.listdir(os.path.join(self.out, "drivers"))
+        self.assertIn("index.html", drivers)
+        self.assertGreater(len(drivers), 1)
+
+        # без изменений ничего не перерисовывается и не переписывается
+        second = self.builder.build()
+        self.assertEqual((second["rendered"], second["skipped"], second["pages"]), (0, 2, 0))
+
+        # тот же контент с новым mtime — только перечитывание хэша
+        os.utime(self._path("4821"), ns=(0, 10 ** 18))
+        self.assertEqual(self.builder.build()["rendered"], 0)
+
+        # изменённый заезд перерисовывается, удалённый убирается из отчёта
+        heat = Heat.load(self._path("4821"))
+        heat.drivers[0].name = "Новое Имя"
+        heat.save(self._path("4821"))
+        os.remove(self._path("4822"))
+        third = self.builder.build()
+        self.assertEqual((third["rendered"], third["skipped"]), (1, 0))
+        self.assertGreater(third["removed"], 0)
+        self.assertFalse(os.path.exists(os.path.join(self.out, "heats", "heat_premium_4822.html")))
+        with open(os.path.join(self.out, "heats", "heat_premium_4821.html"), encoding="utf-8") as f:
+            self.assertIn("Новое Имя", f.read())
+
+    def test_stale_index_pages_removed(self):
+        self.builder.build()
+        heat = Heat.load(self._path("4822"))
+        heat.track = "drive"
+        heat.drivers[0].name = "Единственный Пилот"
+        os.remove(self._path("4822"))
+        heat.save(os.path.join(self.src, "heat_drive_4822.json"))
+        self.builder.build()
+        self.assertTrue(os.path.exists(os.path.join(self.out, "drivers", "edinstvennii-pilot.html")))
+
+        # заезд пропал: его трек и единственный пилот уходят из отчёта даже при force
+        os.remove(os.path.join(self.src, "heat_drive_4822.json"))
+        result = self.builder.build(force=True)
+        self.assertEqual(result["rendered"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.out, "tracks", "drive.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.out, "drivers", "edinstvennii-pilot.html")))
+        self.assertFalse(os.path.exists(os.path.join(self.out, "heats", "heat_drive_4822.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.out, "tracks", "premium.html")))
+
+    def test_broken_file_reported(self):
+        with open(os.path.join(self.src, "heat_premium_9999.json"), "w") as f:
+            f.write("{")
+        result = self.builder.build()
+        self.assertEqual(result["rendered"], 2)
+        self.assertEqual([key for key, _ in result["errors"]], ["premium/9999"])
+
+
+if __name__ == "__main__":
+    unittest.main()
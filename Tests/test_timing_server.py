@@ -0,0 +1,76 @@
+import unittest
+
+import requests
+
+import Parse_data
+from Parse_data import decode_heat_table, fetch_race_page_if_changed, get_race_results
+from benchmarks.timing_server import TimingServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTimingServer(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.server = TimingServer(
+            drivers=6, laps=10, max_session_id=100, live_from=50, lap_interval=30, clock=self.clock
+        ).start()
+        self.session = requests.Session()
+        Parse_data.set_base_url(self.server.url)
+
+    def tearDown(self):
+        Parse_data.set_base_url(None)
+        self.session.close()
+        self.server.stop()
+
+    def test_base_url_is_configurable(self):
+        self.assertTrue(Parse_data.heat_url("7", "drive").startswith(self.server.url))
+        Parse_data.set_base_url(None)
+        self.assertEqual(Parse_data.get_base_url(), Parse_data.DEFAULT_BASE_URL)
+        self.assertEqual(
+            Parse_data.heat_url("7", "drive", base_url="http://x/"), "http://x/tracks/drive/heats/7"
+        )
+
+    def test_finished_heat_and_etag(self):
+        rows = get_race_results("7", "premium", session=self.session, cache=None)
+        table = decode_heat_table(rows)
+        self.assertEqual(table.driver_count, 6)
+        self.assertEqual(table.lap_count, 10)
+
+        html, etag, last_modified = fetch_race_page_if_changed("7", "premium", session=self.session)
+        self.assertIsNotNone(html)
+        again, _, _ = fetch_race_page_if_changed("7", "premium", etag=etag, session=self.session)
+        self.assertIsNone(again)
+        self.assertEqual(self.server.stats[304], 1)
+
+    def test_live_heat_grows(self):
+        html, etag, _ = fetch_race_page_if_changed("60", "drive", session=self.session)
+        self.assertEqual(decode_heat_table(Parse_data.parse_race_page(html)).lap_count, 0)
+
+        self.clock.now += 65
+        html, etag, _ = fetch_race_page_if_changed("60", "drive", etag=etag, session=self.session)
+        self.assertEqual(decode_heat_table(Parse_data.parse_race_page(html)).lap_count, 2)
+
+        # пока новый круг не появился — 304
+        unchanged, _, _ = fetch_race_page_if_changed("60", "drive", etag=etag, session=self.session)
+        self.assertIsNone(unchanged)
+
+    def test_missing_heat_and_errors(self):
+        resp = self.session.get(Parse_data.heat_url("101", "narvskaya"))
+        self.assertEqual(resp.status_code, 404)
+
+        self.server.error_rate = 1.0
+        resp = self.session.get(Parse_data.heat_url("5", "narvskaya"))
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(get_race_results("5", "narvskaya", session=self.session, cache=None), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,347 @@
+"""
+Потоковая выгрузка архива заездов: одна строка на круг в CSV, NDJSON или
+Parquet (частями по chunk_rows строк, нужен pyarrow).
+
+Заезды читаются по одному цепочкой генераторов, поэтому пиковая память
+не зависит от размера архива. Фильтры применяются как можно раньше:
+трек — по имени файла, даты загрузки и пилоты — по заголовку (для .kheat
+круги при этом вообще не читаются). Даты — это fetched_at, время загрузки
+страницы, а не заезда: у архива, скачанного разом, они почти совпадают.
+
+Режим --since выгружает только новые и изменившиеся заезды: в файле
+состояния для каждого выгруженного заезда хранятся размер, mtime и хэш
+содержимого файла. Файл с другим mtime, но тем же содержимым (копия с
+сохранением времени, повторное сохранение) повторно не выгружается.
+
+    python archive_export.py heats_data --out laps.csv --track premium --fetched-from 2024-05-01
+    python archive_export.py heats_data --out laps.parquet --since export_state.json
+"""
+import argparse
+import csv
+import hashlib
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from Data_Classes.heat import Heat
+from Data_Classes.heat_binary import is_binary_heat_file, read_heat_binary, read_heat_header
+from Data_Classes.heat_bulk import lap_columns
+from driver_names import normalize_driver_name
+from io_heat import HEAT_FILE_RE, iter_heat_files
+
+EXPORT_COLUMNS = [
+    "track", "session_id", "fetched_at", "driver", "kart_id", "place", "lap", "time", "position", "gap",
+]
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+DEFAULT_CHUNK_ROWS = 100_000
+STATE_VERSION = 2
+
+
+class ExportFilter:
+    """
+    Фильтр выгрузки: треки, интервал fetched_at [start, end) — времени
+    загрузки страницы, не заезда — и пилоты (нормализованные имена; из
+    заезда выгружаются только их круги).
+    """
+
+    def __init__(self, tracks=None, start: float = None, end: float = None, drivers=None) -> None:
+        self.tracks = set(tracks) if tracks else None
+        self.start = start
+        self.end = end
+        self.drivers = {normalize_driver_name(d) for d in drivers} if drivers else None
+
+    def match_track(self, track: str) -> bool:
+        return self.tracks is None or track in self.tracks
+
+    def match_header(self, header: dict):
+        """
+        По метаданным заезда: None — заезд не подходит, иначе номера колонок
+        пилотов для выгрузки (None внутри кортежа — все пилоты).
+        """
+        if not self.match_track(header.get("track", "")):
+            return None
+        if self.start is not None or self.end is not None:
+            fetched_at = header.get("fetched_at")
+            if fetched_at is None:
+                return None
+            if self.start is not None and fetched_at < self.start:
+                return None
+            if self.end is not None and fetched_at >= self.end:
+                return None
+        if self.drivers is None:
+            return (None,)
+        columns = [
+            col for col, d in enumerate(header.get("drivers", []))
+            if normalize_driver_name(d.get("name")) in self.drivers
+        ]
+        return (columns,) if columns else None
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_state(path: str, state: dict):
+    """
+    (ключ, запись, не изменился ли файл) по состоянию прошлых выгрузок.
+    Хэш считается, только если изменились размер или mtime.
+    """
+    match = HEAT_FILE_RE.match(os.path.basename(path))
+    key = f"{match.group(1)}/{match.group(2)}" if match else os.path.abspath(path)
+    stat = os.stat(path)
+    entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    old = state.get(key)
+    if old and old["size"] == entry["size"] and old["mtime_ns"] == entry["mtime_ns"]:
+        return key, old, True
+    entry["hash"] = _file_hash(path)
+    if old and old["hash"] == entry["hash"]:
+        # то же содержимое с новым mtime: запоминаем mtime, чтобы не хэшировать снова
+        state[key] = entry
+        return key, entry, True
+    return key, entry, False
+
+
+def read_filtered(path: str, flt: ExportFilter):
+    """(Heat, колонки) или None, если заезд не проходит фильтр; круги читаются только у подходящих."""
+    if is_binary_heat_file(path):
+        header = read_heat_header(path)
+        match = flt.match_header(header)
+        return None if match is None else (read_heat_binary(Heat, path, header=header), match[0])
+
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    match = flt.match_header(data)
+    return None if match is None else (Heat.from_dict(data), match[0])
+
+
+def iter_lap_records(source, flt: ExportFilter = None, state: dict = None, stats: dict = None):
+    """
+    Колонки кругов по заезду (словари массивов EXPORT_COLUMNS). source —
+    каталог архива или итерируемое из путей и объектов Heat. state —
+    состояние прошлых выгрузок ("track/session_id" -> размер, mtime, хэш):
+    неизменившиеся файлы пропускаются, выгруженные в него записываются.
+    """
+    flt = flt or ExportFilter()
+    stats = stats if stats is not None else {}
+    for key in ("scanned", "unchanged", "skipped", "exported", "rows"):
+        stats.setdefault(key, 0)
+
+    if isinstance(source, (str, os.PathLike)):
+        source = (path for _, _, path in iter_heat_files(os.fspath(source), flt.tracks))
+
+    for item in source:
+        stats["scanned"] += 1
+        state_key = None
+        if not isinstance(item, Heat) and state is not None:
+            state_key, entry, unchanged = _file_state(os.fspath(item), state)
+            if unchanged:
+                stats["unchanged"] += 1
+                continue
+        if isinstance(item, Heat):
+            header = {"track": item.track, "fetched_at": item.fetched_at,
+                      "drivers": [{"name": d.name} for d in item.drivers]}
+            match = flt.match_header(header)
+            found = None if match is None else (item, match[0])
+        else:
+            found = read_filtered(os.fspath(item), flt)
+        if found is None:
+            stats["skipped"] += 1
+            continue
+
+        heat, columns = found
+        record = lap_columns(heat, columns)
+        rows = len(record["lap"])
+        if not rows:
+            stats["skipped"] += 1
+            continue
+        record["fetched_at"] = heat.fetched_at
+        if state_key is not None:
+            state[state_key] = entry
+        stats["exported"] += 1
+        stats["rows"] += rows
+        yield record
+
+
+_INT_COLUMNS = ("place", "position")
+
+
+def _iter_rows(record):
+    """Строки одного заезда; NaN становятся None, места и позиции — целыми."""
+    fixed = (record["track"], record["session_id"], record["fetched_at"])
+    columns = []
+    for name in EXPORT_COLUMNS[3:]:
+        values = record[name].tolist()
+        if name in _INT_COLUMNS:
+            values = [None if math.isnan(v) else int(v) for v in values]
+        elif record[name].dtype.kind == "f":
+            values = [None if math.isnan(v) else v for v in values]
+        columns.append(values)
+    return (fixed + values for values in zip(*columns))
+
+
+def _write_csv(records, out) -> None:
+    writer = csv.writer(out)
+    writer.writerow(EXPORT_COLUMNS)
+    for record in records:
+        writer.writerows(_iter_rows(record))
+
+
+def _write_ndjson(records, out) -> None:
+    for record in records:
+        for row in _iter_rows(record):
+            out.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False))
+            out.write("\n")
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("track", pa.string()), ("session_id", pa.string()), ("fetched_at", pa.float64()),
+        ("driver", pa.string()), ("kart_id", pa.string()), ("place", pa.float64()),
+        ("lap", pa.int32()), ("time", pa.float64()), ("position", pa.float64()), ("gap", pa.float64()),
+    ])
+
+
+def _write_parquet(records, path: str, chunk_rows: int) -> None:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Для выгрузки в Parquet нужен pyarrow: pip install pyarrow") from None
+
+    schema = _parquet_schema(pa)
+    pending, pending_rows = [], 0
+
+    def flush(writer):
+        columns = {}
+        for name in EXPORT_COLUMNS:
+            if name in ("track", "session_id", "fetched_at"):
+                columns[name] = np.concatenate([
+                    np.full(len(r["lap"]), r[name], dtype=object) for r in pending
+                ])
+            else:
+                columns[name] = np.concatenate([r[name] for r in pending])
+        fetched = columns["fetched_at"]
+        columns["fetched_at"] = np.array([np.nan if v is None else v for v in fetched], dtype=np.float64)
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+        pending.clear()
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for record in records:
+            pending.append(record)
+            pending_rows += len(record["lap"])
+            if pending_rows >= chunk_rows:
+                flush(writer)
+                pending_rows = 0
+        if pending:
+            flush(writer)
+
+
+def infer_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower()
+    return {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".parquet": "parquet"}.get(ext, "csv")
+
+
+def load_state(path: str) -> dict:
+    """Выгруженные заезды из файла состояния; пустой словарь, если его нет."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != STATE_VERSION:
+        return {}
+    return data.get("heats", {})
+
+
+def _save_state(path: str, state: dict) -> None:
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def export_archive(
+    source,
+    out,
+    fmt: str = None,
+    flt: ExportFilter = None,
+    state_path: str = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+):
+    """
+    Выгружает круги архива в out (путь, '-' — stdout; Parquet — только путь).
+    С state_path выгружаются только заезды, которых нет среди выгруженных
+    с этим файлом состояния или чьё содержимое изменилось. Возвращает
+    статистику: scanned, unchanged, skipped, exported, rows.
+    """
+    fmt = fmt or (infer_format(out) if isinstance(out, str) else "csv")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{fmt}'. Must be one of: {', '.join(EXPORT_FORMATS)}")
+
+    state = load_state(state_path) if state_path is not None else None
+    stats = {}
+    records = iter_lap_records(source, flt, state=state, stats=stats)
+    if fmt == "parquet":
+        if not isinstance(out, str) or out == "-":
+            raise ValueError("Parquet выгружается только в файл")
+        _write_parquet(records, out, chunk_rows)
+    else:
+        writer = _write_csv if fmt == "csv" else _write_ndjson
+        if out == "-":
+            writer(records, sys.stdout)
+        elif isinstance(out, str):
+            with open(out, "w", encoding="utf-8", newline="") as f:
+                writer(records, f)
+        else:
+            writer(records, out)
+
+    if state_path is not None:
+        _save_state(state_path, {"version": STATE_VERSION, "exported_at": time.time(), "heats": state})
+    return stats
+
+
+def _parse_date(value: str):
+    return None if not value else datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("src", nargs="?", default="heats_data")
+    parser.add_argument("--out", default="-", help="файл выгрузки; '-' — stdout")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default=None, help="по умолчанию — по расширению --out")
+    parser.add_argument("--track", action="append", help="трек (можно несколько раз)")
+    parser.add_argument(
+        "--fetched-from", dest="start",
+        help="с даты загрузки страницы (fetched_at, не дата заезда), ISO: 2024-05-01",
+    )
+    parser.add_argument("--fetched-to", dest="end", help="до даты загрузки страницы, не включая")
+    parser.add_argument("--driver", action="append", help="имя пилота (можно несколько раз)")
+    parser.add_argument("--since", metavar="STATE", help="файл состояния: только новые и изменившиеся заезды")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="строк в части Parquet")
+    args = parser.parse_args()
+
+    flt = ExportFilter(args.track, _parse_date(args.start), _parse_date(args.end), args.driver)
+    started = time.perf_counter()
+    stats = export_archive(args.src, args.out, args.format, flt, state_path=args.since, chunk_rows=args.chunk_rows)
+    print(
+        f"Выгружено заездов: {stats['exported']} ({stats['rows']} кругов), "
+        f"без изменений: {stats['unchanged']}, "
+        f"пропущено: {stats['skipped']} из {stats['scanned']} за {time.perf_counter() - started:.1f} s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
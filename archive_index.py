@@ -0,0 +1,359 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from driver_names import DriverNameIndex, normalize_driver_name
+from io_heat import iter_heat_files
+
+DEFAULT_INDEX_PATH = os.path.join("heats_data", "archive.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS heats (
+    id INTEGER PRIMARY KEY,
+    track TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    path TEXT,
+    driver_count INTEGER NOT NULL,
+    lap_count INTEGER NOT NULL,
+    ingested_at REAL NOT NULL,
+    fetched_at REAL,
+    side_info TEXT,
+    lap_labels TEXT,
+    overrides TEXT,
+    UNIQUE (track, session_id)
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    heat_id INTEGER NOT NULL REFERENCES heats (id) ON DELETE CASCADE,
+    col INTEGER NOT NULL,
+    place INTEGER,
+    name TEXT,
+    name_norm TEXT NOT NULL,
+    kart_id TEXT,
+    best_lap REAL,
+    lap_count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS laps (
+    entry_id INTEGER NOT NULL REFERENCES entries (id) ON DELETE CASCADE,
+    lap INTEGER NOT NULL,
+    time REAL NOT NULL,
+    position INTEGER,
+    gap REAL,
+    PRIMARY KEY (entry_id, lap)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS heats_track ON heats (track);
+CREATE INDEX IF NOT EXISTS entries_heat ON entries (heat_id);
+CREATE INDEX IF NOT EXISTS entries_name ON entries (name_norm);
+CREATE INDEX IF NOT EXISTS entries_kart ON entries (kart_id);
+"""
+
+# колонки heats, добавленные после первой версии схемы: (имя, тип)
+_HEAT_COLUMNS_ADDED = (
+    ("fetched_at", "REAL"),
+    ("side_info", "TEXT"),
+    ("lap_labels", "TEXT"),
+    ("overrides", "TEXT"),
+)
+
+_default_index = None
+
+
+def set_archive_index(index) -> None:
+    """Задаёт индекс, в который Heat.save добавляет заезды (None — отключить)."""
+    global _default_index
+    _default_index = index
+
+
+def get_archive_index():
+    return _default_index
+
+
+class ArchiveIndex:
+    """
+    Локальный SQLite-индекс архива: заезды, участия пилотов и круги.
+    Ключи поиска — трек, session_id, нормализованное имя пилота и номер карта.
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        # нечёткий индекс имён строится при первом обращении и дальше
+        # обновляется в ingest
+        self._name_index = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _migrate(self) -> None:
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(heats)")}
+        with self._conn:
+            for name, kind in _HEAT_COLUMNS_ADDED:
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE heats ADD COLUMN {name} {kind}")
+
+    # --- наполнение ---
+
+    def has_heat(self, track: str, session_id) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM heats WHERE track = ? AND session_id = ?",
+                (track, str(session_id)),
+            ).fetchone()
+        return row is not None
+
+    def ingest(self, heat, path: str = None, replace: bool = False) -> bool:
+        """
+        Добавляет заезд в индекс. Уже проиндексированный заезд пропускается,
+        если не задан replace. Возвращает True, если данные записаны.
+        """
+        times = heat.lap_times
+        positions = heat.lap_positions
+        gaps = heat.lap_gaps
+        # то, что не восстанавливается из кругов: исходные строки ячеек,
+        # нестандартные номера кругов, Best/Avg/Dev и время загрузки
+        labels = heat.laps.lap_labels
+        if labels == [str(i + 1) for i in range(len(labels))]:
+            labels = None
+        overrides = [[lap, col, text] for (lap, col), text in sorted(heat.laps.overrides.items())]
+
+        with self._lock, self._conn:
+            existing = self._conn.execute(
+                "SELECT id FROM heats WHERE track = ? AND session_id = ?",
+                (heat.track, str(heat.session_id)),
+            ).fetchone()
+            if existing is not None:
+                if not replace:
+                    return False
+                if self._name_index is not None:
+                    for (name,) in self._conn.execute(
+                        "SELECT name FROM entries WHERE heat_id = ?", existing
+                    ):
+                        self._name_index.discard(name)
+                self._conn.execute("DELETE FROM heats WHERE id = ?", existing)
+
+            heat_id = self._conn.execute(
+                "INSERT INTO heats (track, session_id, path, driver_count, lap_count, ingested_at, "
+                "fetched_at, side_info, lap_labels, overrides) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    heat.track,
+                    str(heat.session_id),
+                    path,
+                    len(heat.drivers),
+                    heat.lap_count,
+                    time.time(),
+                    heat.fetched_at,
+                    json.dumps(heat.side_info, ensure_ascii=False),
+                    None if labels is None else json.dumps(labels, ensure_ascii=False),
+                    json.dumps(overrides, ensure_ascii=False) if overrides else None,
+                ),
+            ).lastrowid
+
+            for col, driver in enumerate(heat.drivers):
+                column = times[:, col]
+                done = np.flatnonzero(~np.isnan(column))
+                best = float(column[done].min()) if done.size else None
+                entry_id = self._conn.execute(
+                    "INSERT INTO entries (heat_id, col, place, name, name_norm, kart_id, best_lap, lap_count) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        heat_id,
+                        col,
+                        driver.place,
+                        driver.name,
+                        normalize_driver_name(driver.name),
+                        None if driver.kart_id is None else str(driver.kart_id),
+                        best,
+                        int(done.size),
+                    ),
+                ).lastrowid
+                self._conn.executemany(
+                    "INSERT INTO laps (entry_id, lap, time, position, gap) VALUES (?, ?, ?, ?, ?)",
+                    (
+                        (
+                            entry_id,
+                            int(lap) + 1,
+                            float(column[lap]),
+                            int(positions[lap, col]) or None,
+                            None if np.isnan(gaps[lap, col]) else float(gaps[lap, col]),
+                        )
+                        for lap in done
+                    ),
+                )
+            if self._name_index is not None:
+                self._name_index.add_heat(heat)
+        return True
+
+    def ingest_directory(self, directory: str = "heats_data") -> int:
+        """
+        Инкрементально индексирует файлы heat_*.json / heat_*.kheat.
+        Заезды, уже присутствующие в индексе, не открываются повторно.
+        Возвращает число добавленных заездов.
+        """
+        from Data_Classes.heat import Heat
+
+        with self._lock:
+            known = set(self._conn.execute("SELECT track, session_id FROM heats"))
+
+        added = 0
+        for track, session_id, path in iter_heat_files(directory):
+            key = (track, session_id)
+            if key in known:
+                continue
+            heat = Heat.load(path)
+            if self.ingest(heat, path=path):
+                added += 1
+            known.add(key)
+            known.add((heat.track, str(heat.session_id)))
+        return added
+
+    # --- имена ---
+
+    @property
+    def name_index(self) -> DriverNameIndex:
+        """Триграммный индекс имён пилотов архива (строится при первом обращении)."""
+        with self._lock:
+            if self._name_index is None:
+                index = DriverNameIndex()
+                for name, count in self._conn.execute(
+                    "SELECT name, COUNT(*) FROM entries WHERE name IS NOT NULL GROUP BY name"
+                ):
+                    index.add(name, count)
+                self._name_index = index
+            return self._name_index
+
+    def search_drivers(self, query: str, limit: int = 10, min_similarity: float = 0.4):
+        """Нечёткий поиск пилота по имени: список driver_names.NameMatch."""
+        return self.name_index.search(query, limit=limit, min_similarity=min_similarity)
+
+    # --- запросы ---
+
+    def _filters(self, driver=None, kart_id=None, track=None, fuzzy: bool = False):
+        clauses, params = [], []
+        if driver is not None and fuzzy:
+            # все написания этого пилота из нечёткого индекса
+            names = sorted({normalize_driver_name(n) for n in self.name_index.variants(driver)})
+            names = names or [normalize_driver_name(driver)]
+            clauses.append(f"e.name_norm IN ({', '.join('?' * len(names))})")
+            params.extend(names)
+        elif driver is not None:
+            clauses.append("e.name_norm = ?")
+            params.append(normalize_driver_name(driver))
+        if kart_id is not None:
+            clauses.append("e.kart_id = ?")
+            params.append(str(kart_id))
+        if track is not None:
+            clauses.append("h.track = ?")
+            params.append(track)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def find_heats(self, driver=None, kart_id=None, track=None, fuzzy: bool = False):
+        """
+        Список (track, session_id, path) заездов, подходящих под фильтры.
+        fuzzy=True ищет пилота по всем написаниям его имени в архиве.
+        """
+        where, params = self._filters(driver, kart_id, track, fuzzy)
+        sql = (
+            "SELECT DISTINCT h.track, h.session_id, h.path FROM heats h "
+            "JOIN entries e ON e.heat_id = h.id" + where + " ORDER BY h.track, h.id"
+        )
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def find_entries(self, driver=None, kart_id=None, track=None, fuzzy: bool = False):
+        """Участия пилотов: (track, session_id, place, name, kart_id, best_lap, lap_count)."""
+        where, params = self._filters(driver, kart_id, track, fuzzy)
+        sql = (
+            "SELECT h.track, h.session_id, e.place, e.name, e.kart_id, e.best_lap, e.lap_count "
+            "FROM entries e JOIN heats h ON e.heat_id = h.id" + where + " ORDER BY h.id, e.col"
+        )
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def load_heats(self, driver=None, kart_id=None, track=None, fuzzy: bool = False):
+        """Объекты Heat для найденных заездов (из файла, а если его нет — из индекса)."""
+        from Data_Classes.heat import Heat
+
+        heats = []
+        for heat_track, session_id, path in self.find_heats(driver, kart_id, track, fuzzy):
+            if path and os.path.exists(path):
+                heats.append(Heat.load(path))
+            else:
+                heats.append(self._rebuild_heat(Heat, heat_track, session_id))
+        return heats
+
+    def _rebuild_heat(self, heat_cls, track: str, session_id: str):
+        """
+        Заезд из данных индекса. Заезды, проиндексированные до появления
+        колонок fetched_at, side_info, lap_labels и overrides, теряют
+        нестандартные строки ячеек и Best/Avg/Dev.
+        """
+        from Data_Classes.lap_table import LapTable, allocate_columns
+
+        with self._lock:
+            heat_id, lap_count, fetched_at, side_info, labels, overrides = self._conn.execute(
+                "SELECT id, lap_count, fetched_at, side_info, lap_labels, overrides FROM heats "
+                "WHERE track = ? AND session_id = ?",
+                (track, session_id),
+            ).fetchone()
+            entries = self._conn.execute(
+                "SELECT id, col, place, name, kart_id FROM entries WHERE heat_id = ? ORDER BY col",
+                (heat_id,),
+            ).fetchall()
+            laps = self._conn.execute(
+                "SELECT e.col, l.lap, l.time, l.position, l.gap FROM laps l "
+                "JOIN entries e ON l.entry_id = e.id WHERE e.heat_id = ?",
+                (heat_id,),
+            ).fetchall()
+
+        times, positions, gaps = allocate_columns(lap_count, len(entries))
+        for col, lap, lap_time, position, gap in laps:
+            times[lap - 1, col] = lap_time
+            positions[lap - 1, col] = position or 0
+            gaps[lap - 1, col] = np.nan if gap is None else gap
+
+        drivers = [
+            {
+                "place": place,
+                "name": name,
+                "kart_id": int(kart) if kart is not None and kart.isdigit() else kart,
+            }
+            for _, _, place, name, kart in entries
+        ]
+        table = LapTable(
+            [d["name"] for d in drivers],
+            [d["kart_id"] for d in drivers],
+            times,
+            positions,
+            gaps,
+            lap_labels=json.loads(labels) if labels else None,
+            overrides={(lap, col): text for lap, col, text in json.loads(overrides or "[]")},
+            side_info=json.loads(side_info) if side_info else [],
+        )
+        return heat_cls.from_lap_table(session_id, track, drivers, table, fetched_at=fetched_at)
+
+    def lap_frame(self, driver=None, kart_id=None, track=None, fuzzy: bool = False):
+        """Длинная таблица кругов (track, session_id, driver, kart_id, lap, time, position, gap)."""
+        import pandas as pd
+
+        where, params = self._filters(driver, kart_id, track, fuzzy)
+        sql = (
+            "SELECT h.track, h.session_id, e.name AS driver, e.kart_id, l.lap, l.time, "
+            "l.position, l.gap FROM laps l JOIN entries e ON l.entry_id = e.id "
+            "JOIN heats h ON e.heat_id = h.id" + where + " ORDER BY h.id, e.col, l.lap"
+        )
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
@@ -0,0 +1,52 @@
+"""
+Время загрузки архива заездов: JSON против .kheat (mmap и полное чтение),
+а также чтение одних метаданных.
+
+    python -m benchmarks.bench_load --heats 500 --drivers 20 --laps 40
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from Data_Classes.heat import Heat
+from benchmarks.synthetic import generate_heat_rows
+
+
+def timed(label, func, paths):
+    start = time.perf_counter()
+    for path in paths:
+        func(path)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<22} {elapsed:8.3f} s  {elapsed / len(paths) * 1e3:8.3f} ms/heat")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--heats", type=int, default=500)
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--laps", type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_paths, binary_paths = [], []
+        for i in range(args.heats):
+            heat = Heat(str(i), track="premium", raw_data=generate_heat_rows(args.drivers, args.laps, seed=i))
+            json_path = os.path.join(tmp, f"heat_premium_{i}.json")
+            heat.save(json_path)
+            json_paths.append(json_path)
+            binary_path = os.path.join(tmp, f"heat_premium_{i}.kheat")
+            heat.save(binary_path)
+            binary_paths.append(binary_path)
+
+        print(f"heats={args.heats} drivers={args.drivers} laps={args.laps}")
+        timed("json load", Heat.load, json_paths)
+        timed("kheat load (mmap)", Heat.load, binary_paths)
+        timed("kheat load (read)", lambda p: Heat.load(p, mmap=False), binary_paths)
+        timed("json metadata", Heat.read_metadata, json_paths)
+        timed("kheat metadata", Heat.read_metadata, binary_paths)
+
+
+if __name__ == "__main__":
+    main()
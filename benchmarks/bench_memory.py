@@ -0,0 +1,57 @@
+"""
+Сравнение памяти: старая раскладка заезда (списки строк у каждого Driver
+плюс object-DataFrame df_laps) против общей LapTable.
+
+    python -m benchmarks.bench_memory --heats 2000 --drivers 20 --laps 40
+"""
+import argparse
+import gc
+import tracemalloc
+
+import pandas as pd
+
+from Data_Classes.heat import Heat
+from benchmarks.synthetic import generate_heat_rows
+
+
+class LegacyHeat:
+    """Раскладка данных Heat до перехода на LapTable."""
+
+    def __init__(self, rows):
+        names = rows[0][1:]
+        self.drivers = [{"name": n, "kart_id": k, "times": []} for n, k in zip(names, rows[1][1:])]
+        self.df_laps = pd.DataFrame(rows[2:], columns=["Lap"] + names)
+        for idx, driver in enumerate(self.drivers):
+            for t in self.df_laps[names[idx]].tolist():
+                driver["times"].append(t)
+
+
+def measure(factory, archive):
+    gc.collect()
+    tracemalloc.start()
+    heats = [factory(rows) for rows in archive]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del heats
+    return current
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--heats", type=int, default=1000)
+    parser.add_argument("--drivers", type=int, default=20)
+    parser.add_argument("--laps", type=int, default=40)
+    args = parser.parse_args()
+
+    archive = [generate_heat_rows(args.drivers, args.laps, seed=i) for i in range(args.heats)]
+
+    legacy = measure(LegacyHeat, archive)
+    compact = measure(lambda rows: Heat(str(id(rows)), track="premium", raw_data=rows), archive)
+
+    print(f"heats={args.heats} drivers={args.drivers} laps={args.laps}")
+    print(f"legacy  : {legacy / 2**20:8.1f} MiB")
+    print(f"compact : {compact / 2**20:8.1f} MiB  ({compact / legacy:.0%})")
+
+
+if __name__ == "__main__":
+    main()
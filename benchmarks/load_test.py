@@ -0,0 +1,111 @@
+"""
+Нагрузочный тест всего конвейера Heat (загрузка, разбор, сборка) против
+локального стенда benchmarks.timing_server или любого адреса --url.
+Печатает пропускную способность и перцентили задержки по проходам;
+повторные проходы с --cache показывают эффект дискового кэша страниц.
+
+    python -m benchmarks.load_test --heats 500 --workers 16 --latency 0.03
+    python -m benchmarks.load_test --passes 3 --cache /tmp/heats_cache --live-from 400
+    python -m benchmarks.load_test --url http://127.0.0.1:8765 --heats 200
+"""
+import argparse
+import itertools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import Parse_data
+from Data_Classes.heat_fetch import fetch_heat
+from benchmarks.timing_server import add_server_arguments, server_from_args
+
+PERCENTILES = (50, 90, 99)
+
+
+def _timed_fetch(track, session_id, session):
+    start = time.perf_counter()
+    try:
+        fetch_heat(track, str(session_id), session=session)
+    except Exception as e:
+        return time.perf_counter() - start, e
+    return time.perf_counter() - start, None
+
+
+def run_pass(heats, workers: int, session=None):
+    """
+    Прогоняет заезды [(track, session_id), ...] через fetch_heat пулом потоков.
+    Возвращает словарь: heats, errors, elapsed, throughput, latency (перцентили, с).
+    """
+    if session is None:
+        session = Parse_data.get_session()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda h: _timed_fetch(h[0], h[1], session), heats))
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([latency for latency, _ in results])
+    errors = [error for _, error in results if error is not None]
+    report = {
+        "heats": len(heats),
+        "errors": len(errors),
+        "elapsed": elapsed,
+        "throughput": len(heats) / elapsed if elapsed else float("inf"),
+        "latency": {},
+    }
+    if len(latencies):
+        values = np.percentile(latencies, PERCENTILES)
+        report["latency"] = {f"p{p}": float(v) for p, v in zip(PERCENTILES, values)}
+        report["latency"]["max"] = float(latencies.max())
+    return report
+
+
+def format_report(label: str, report) -> str:
+    latency = "  ".join(f"{k}={v * 1e3:.1f}ms" for k, v in report["latency"].items())
+    return (
+        f"{label}: {report['heats']} заездов за {report['elapsed']:.2f} s, "
+        f"{report['throughput']:.1f} заездов/s, ошибок {report['errors']}  {latency}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="адрес уже запущенного сервера; иначе стенд поднимается локально")
+    parser.add_argument("--heats", type=int, default=200, help="заездов на трек")
+    parser.add_argument("--tracks", default="premium", help="треки через запятую")
+    parser.add_argument("--workers", type=int, default=Parse_data.POOL_SIZE)
+    parser.add_argument("--passes", type=int, default=1)
+    parser.add_argument("--cache", help="каталог PageCache (проверка кэша и условных запросов)")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url
+    else:
+        server = server_from_args(args).start()
+        base_url = server.url
+
+    if args.cache:
+        from page_cache import PageCache
+
+        Parse_data.set_page_cache(PageCache(args.cache))
+
+    Parse_data.set_base_url(base_url)
+    tracks = [t for t in args.tracks.split(",") if t]
+    heats = list(itertools.product(tracks, range(1, args.heats + 1)))
+    print(f"{base_url}: {len(heats)} заездов, {args.workers} потоков")
+
+    try:
+        for i in range(args.passes):
+            report = run_pass(heats, args.workers)
+            print(format_report(f"проход {i + 1}", report))
+    finally:
+        if server is not None:
+            server.stop()
+            print(f"Ответы стенда: {dict(server.stats)}")
+        Parse_data.set_base_url(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Набор бенчмарков всего конвейера: загрузка (с подменённой сессией), разбор
+HTML каждым бэкендом, пост-обработка get_time_list, сборка Heat,
+сохранение/загрузка (JSON и .kheat) и отрисовка картинки результатов.
+
+Заезды генерируются benchmarks.synthetic, сохранённые страницы берутся
+из Tests/data. Результаты пишутся в benchmarks/results/<commit>.json,
+чтобы сравнивать коммиты между собой:
+
+    python -m benchmarks.run                       # полный прогон
+    python -m benchmarks.run --quick --only parse  # быстрый прогон части
+    python -m benchmarks.run --compare benchmarks/results/abc1234.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import Parse_data
+from Data_Classes.heat import Heat
+from benchmarks.synthetic import generate_heat_html
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+FIXTURES_DIR = os.path.join(ROOT, "Tests", "data")
+
+# (пилоты, круги): обычный заезд, длинный и предельный размер таблицы
+SIZES = ((12, 20), (20, 60), (40, 200))
+QUICK_SIZES = ((12, 20),)
+
+
+class _StubResponse:
+    status_code = 200
+
+    def __init__(self, text):
+        self.text = text
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+
+class StubSession:
+    """Сессия без сети: на любой GET отдаёт заранее заданную страницу."""
+
+    def __init__(self, html):
+        self.html = html
+
+    def get(self, url, timeout=None, headers=None):
+        return _StubResponse(self.html)
+
+
+def measure(func, repeat=5, min_time=0.05):
+    """
+    Время одного вызова func в секундах: (минимум, медиана) по repeat
+    замерам. Число вызовов на замер подбирается так, чтобы замер длился
+    не меньше min_time.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1 << 16:
+            break
+        number *= 2 if elapsed * 4 >= min_time else 8
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    return min(samples), statistics.median(samples)
+
+
+def _page_cases(label, html, tmp, render):
+    """Сценарии для одной страницы заезда: имя -> функция без аргументов."""
+    rows = Parse_data.parse_race_page(html)
+    heat = Heat("1", track="premium", raw_data=rows)
+    session = StubSession(html)
+
+    cases = {
+        f"fetch/{label}": lambda: Parse_data.get_race_results("1", "premium", session=session, cache=None),
+    }
+    for backend in Parse_data.available_backends():
+        cases[f"parse.{backend}/{label}"] = lambda b=backend: Parse_data.extract_table_rows(html, backend=b)
+    cases[f"time_list.rows/{label}"] = lambda: Parse_data.get_time_list(rows)
+    cases[f"heat.build/{label}"] = lambda: Heat("1", track="premium", raw_data=rows)
+    cases[f"time_list.heat/{label}"] = heat.get_time_list
+
+    for ext in (".json", ".kheat"):
+        path = os.path.join(tmp, f"heat_premium_{label}{ext}")
+        heat.save(path, index=_NoIndex)
+        name = ext.lstrip(".")
+        cases[f"save.{name}/{label}"] = lambda p=path: heat.save(p, index=_NoIndex)
+        cases[f"load.{name}/{label}"] = lambda p=path: Heat.load(p)
+
+    if render:
+        image = os.path.join(tmp, f"heat_premium_{label}.png")
+        for backend in render:
+            cases[f"render.{backend}/{label}"] = (
+                lambda b=backend: heat.generate_results_image(filename=image, backend=b)
+            )
+    return cases
+
+
+class _NoIndex:
+    """Заглушка индекса архива: бенчмарк сохранения не пишет в SQLite."""
+
+    @staticmethod
+    def ingest(heat, path=None, replace=False):
+        pass
+
+
+def collect_cases(sizes, tmp, render, fixtures=True):
+    cases = {}
+    for n_drivers, n_laps in sizes:
+        html = generate_heat_html(n_drivers, n_laps, seed=n_drivers * 1000 + n_laps)
+        cases.update(_page_cases(f"{n_drivers}x{n_laps}", html, tmp, render))
+    if fixtures:
+        for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "heat_*.html"))):
+            with open(path, "r", encoding="utf-8") as f:
+                html = f.read()
+            label = os.path.splitext(os.path.basename(path))[0]
+            cases.update(_page_cases(label, html, tmp, render))
+    return cases
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{commit}-dirty" if dirty else commit
+
+
+def run(cases, repeat, min_time, only=None):
+    results = {}
+    for name, func in cases.items():
+        if only and not any(part in name for part in only):
+            continue
+        best, median = measure(func, repeat=repeat, min_time=min_time)
+        results[name] = {"min": best, "median": median}
+        print(f"{name:<44} {best * 1e3:10.3f} ms  (медиана {median * 1e3:.3f} ms)")
+    return results
+
+
+def compare_backends(results) -> None:
+    """Печатает, во сколько раз pillow быстрее matplotlib на тех же заездах."""
+    lines = []
+    for name in sorted(results):
+        if not name.startswith("render.pillow/"):
+            continue
+        label = name.split("/", 1)[1]
+        other = results.get(f"render.matplotlib/{label}")
+        if other:
+            ratio = other["min"] / results[name]["min"]
+            lines.append(f"{label:<44} pillow быстрее matplotlib в {ratio:5.1f} раз")
+    if lines:
+        print("\n" + "\n".join(lines))
+
+
+def compare(base, current, threshold):
+    """Печатает сравнение по общим сценариям; возвращает число регрессий."""
+    regressions = 0
+    print(f"\n{base['commit']} -> {current['commit']}")
+    for name in sorted(set(base["results"]) & set(current["results"])):
+        before = base["results"][name]["min"]
+        after = current["results"][name]["min"]
+        ratio = after / before if before else float("inf")
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  РЕГРЕССИЯ"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            mark = "  быстрее"
+        print(f"{name:<44} {before * 1e3:10.3f} -> {after * 1e3:10.3f} ms  x{ratio:5.2f}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="только маленький заезд, без matplotlib")
+    parser.add_argument("--only", action="append", help="запускать сценарии, содержащие подстроку")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05)
+    parser.add_argument("--render", default="pillow,matplotlib", help="бэкенды отрисовки через запятую или пусто")
+    parser.add_argument("--output", help="файл результатов (по умолчанию benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", metavar="BASE", help="сравнить с сохранёнными результатами")
+    parser.add_argument("--threshold", type=float, default=0.10, help="порог регрессии, доля (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    sizes = QUICK_SIZES if args.quick else SIZES
+    render = tuple(b for b in args.render.split(",") if b)
+    if args.quick:
+        render = tuple(b for b in render if b != "matplotlib")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cases = collect_cases(sizes, tmp, render)
+        results = run(cases, args.repeat, args.min_time, only=args.only)
+    compare_backends(results)
+
+    report = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "backends": Parse_data.available_backends(),
+        "results": results,
+    }
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if compare(base, report, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
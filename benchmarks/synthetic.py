@@ -0,0 +1,131 @@
+"""
+Генератор правдоподобных страниц заездов (table.heat-result) заданного
+размера: до 40 пилотов и 200 кругов. Гонка моделируется по суммарному
+времени, поэтому позиции, отставания и число кругов у отстающих
+согласованы между собой, как на сайте.
+"""
+import random
+
+FIRST_NAMES = ("Иван", "Алексей", "Мария", "Дмитрий", "Ольга", "Sam", "Alex", "Nikita", "Анна", "Oleg")
+LAST_NAMES = ("Петров", "Smirnov", "Козлова", "Ivanov", "Волков", "K.", "Lee", "Соколов", "Orlova", "Popov")
+
+
+def simulate_heat(n_drivers: int = 12, n_laps: int = 20, seed: int = 0):
+    """
+    Возвращает (names, karts, laps): laps[d] — список (время, позиция, отставание)
+    по кругам пилота d; пилоты упорядочены по итоговому месту.
+    """
+    if not 1 <= n_drivers <= 40 or not 1 <= n_laps <= 200:
+        raise ValueError("Поддерживается до 40 пилотов и до 200 кругов")
+    rnd = random.Random(seed)
+
+    names = [f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)} {i + 1}" for i in range(n_drivers)]
+    karts = rnd.sample(range(1, 61), n_drivers)
+    pace = [rnd.uniform(27.5, 30.5) for _ in range(n_drivers)]
+
+    times = []
+    for d in range(n_drivers):
+        driver_times = []
+        for lap in range(n_laps):
+            t = pace[d] + rnd.gauss(0, 0.25)
+            if lap == 0:
+                t += rnd.uniform(1.0, 3.0)
+            if rnd.random() < 0.03:
+                t += rnd.uniform(2.0, 6.0)  # трафик или разворот
+            driver_times.append(round(t, 3))
+        times.append(driver_times)
+
+    cumulative = []
+    for driver_times in times:
+        total, sums = 0.0, []
+        for t in driver_times:
+            total += t
+            sums.append(total)
+        cumulative.append(sums)
+
+    # заезд кончается, когда лидер проходит n_laps; отстающие — меньше кругов
+    finish = min(c[-1] for c in cumulative)
+    lap_counts = [
+        max(1, sum(1 for s in sums if s <= finish) + (1 if sums[0] <= finish else 0))
+        for sums in cumulative
+    ]
+    lap_counts = [min(n, n_laps) for n in lap_counts]
+
+    order = sorted(range(n_drivers), key=lambda d: (-lap_counts[d], cumulative[d][lap_counts[d] - 1]))
+
+    laps = {d: [] for d in range(n_drivers)}
+    for lap in range(n_laps):
+        running = [d for d in range(n_drivers) if lap < lap_counts[d]]
+        running.sort(key=lambda d: cumulative[d][lap])
+        leader = cumulative[running[0]][lap] if running else 0.0
+        for position, d in enumerate(running, start=1):
+            laps[d].append((times[d][lap], position, round(cumulative[d][lap] - leader, 3)))
+
+    return (
+        [names[d] for d in order],
+        [karts[d] for d in order],
+        [laps[d] for d in order],
+    )
+
+
+def _cell(lap):
+    lap_time, position, gap = lap
+    if position == 1:
+        return f"{lap_time:.3f} P1"
+    return f"{lap_time:.3f} P{position} +{gap:.3f}"
+
+
+def generate_heat_rows(n_drivers: int = 12, n_laps: int = 20, seed: int = 0, visible_laps: int = None):
+    """
+    Строки таблицы в формате get_race_results. visible_laps обрезает
+    таблицу до первых кругов — так выглядит ещё идущий заезд.
+    """
+    names, karts, laps = simulate_heat(n_drivers, n_laps, seed)
+    if visible_laps is not None:
+        laps = [driver_laps[:visible_laps] for driver_laps in laps]
+    rows = [["Driver"] + names, ["Kart"] + [str(k) for k in karts]]
+    total_laps = max(len(driver_laps) for driver_laps in laps)
+    for lap in range(total_laps):
+        rows.append(
+            [str(lap + 1)]
+            + [_cell(driver_laps[lap]) if lap < len(driver_laps) else "" for driver_laps in laps]
+        )
+
+    if total_laps == 0:
+        return rows
+
+    best, avg, dev = ["Best"], ["Avg"], ["Dev"]
+    for driver_laps in laps:
+        values = [t for t, _, _ in driver_laps]
+        mean = sum(values) / len(values)
+        best.append(f"{min(values):.3f}")
+        avg.append(f"{mean:.3f}")
+        dev.append(f"{(sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5:.3f}")
+    return rows + [best, avg, dev]
+
+
+def generate_heat_html(
+    n_drivers: int = 12,
+    n_laps: int = 20,
+    seed: int = 0,
+    track: str = "narvskaya",
+    session_id="1",
+    visible_laps: int = None,
+):
+    """Полная HTML-страница заезда с таблицей table.heat-result."""
+    rows = generate_heat_rows(n_drivers, n_laps, seed, visible_laps=visible_laps)
+    header = "".join(f"<th>{name}</th>" for name in rows[0])
+    body = []
+    for row in rows[1:]:
+        tag = "th" if row[0] in ("Best", "Avg", "Dev") else "td"
+        body.append("<tr>" + "".join(f"<{tag}>{cell}</{tag}>" for cell in row) + "</tr>")
+    return (
+        "<!DOCTYPE html>\n<html lang=\"ru\"><head><meta charset=\"utf-8\">"
+        f"<title>Заезд {session_id} — {track}</title>"
+        "<script>window.timing = {refresh: 5000};</script></head><body>"
+        "<nav><table class=\"menu\"><tr><td>Главная</td><td>Треки</td></tr></table></nav>"
+        f"<h1>Heat {session_id}</h1>"
+        "<table class=\"table table-sm heat-result\"><thead><tr>"
+        f"{header}</tr></thead><tbody>\n" + "\n".join(body) + "\n</tbody></table>"
+        "<footer><p>timing</p></footer></body></html>"
+    )
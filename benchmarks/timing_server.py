@@ -0,0 +1,308 @@
+"""
+Локальный стенд сайта хронометража для нагрузочных и сквозных тестов:
+отдаёт /tracks/{track}/heats/{session_id} как timing.batyrshin.name.
+
+Страницы берутся из каталога сохранённых страниц (heat_{track}_{id}.html)
+или генерируются benchmarks.synthetic. Поддерживаются задержка ответа,
+доля ошибок 503, ETag/Last-Modified с ответом 304 и «живые» заезды,
+у которых круги появляются по мере времени.
+
+    python -m benchmarks.timing_server --port 8765 --latency 0.05 --error-rate 0.02
+    KART_TIMING_BASE_URL=http://127.0.0.1:8765 python main.py
+"""
+import argparse
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.synthetic import generate_heat_html
+
+_PATH_RE = re.compile(r"^/tracks/([a-z]+)/heats/(\d+)/?$")
+
+
+class TimingServer:
+    """
+    HTTP-сервер в фоновом потоке.
+
+    :param drivers, laps: размер синтетических заездов
+    :param pages_dir: каталог сохранённых страниц; они важнее синтетики
+    :param latency, jitter: задержка ответа в секундах и её разброс
+    :param error_rate: доля запросов, на которые отвечается 503
+    :param max_session_id: заезды с большим номером отдают 404
+    :param live_from: заезды с номером >= live_from идут «вживую»: каждые
+        lap_interval секунд с первого запроса появляется новый круг
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        drivers: int = 12,
+        laps: int = 20,
+        pages_dir: str = None,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        max_session_id: int = None,
+        live_from: int = None,
+        lap_interval: float = 30.0,
+        seed: int = 0,
+        clock=time.time,
+    ):
+        self.drivers = drivers
+        self.laps = laps
+        self.pages_dir = pages_dir
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.max_session_id = max_session_id
+        self.live_from = live_from
+        self.lap_interval = lap_interval
+        self.seed = seed
+        self.clock = clock
+
+        self.stats = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # (track, session_id) -> (body, etag, last_modified, видимых кругов или None)
+        self._pages = {}
+        # начало «живого» заезда: время первого запроса
+        self._live_started = {}
+        self._started_at = clock()
+
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "TimingServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def serve_forever(self) -> None:
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    # --- содержимое ---
+
+    def is_live(self, session_id: int) -> bool:
+        return self.live_from is not None and session_id >= self.live_from
+
+    def _heat_seed(self, track: str, session_id: int) -> int:
+        return zlib.crc32(f"{self.seed}:{track}:{session_id}".encode())
+
+    def _visible_laps(self, key):
+        """Число видимых кругов живого заезда и время появления последнего."""
+        now = self.clock()
+        started = self._live_started.setdefault(key, now)
+        visible = min(self.laps, int((now - started) / self.lap_interval))
+        return visible, started + visible * self.lap_interval
+
+    def page(self, track: str, session_id: int):
+        """(body, etag, last_modified) или None, если заезда нет."""
+        if self.max_session_id is not None and session_id > self.max_session_id:
+            return None
+        key = (track, session_id)
+
+        with self._lock:
+            if self.is_live(session_id):
+                visible, changed_at = self._visible_laps(key)
+                cached = self._pages.get(key)
+                if cached is not None and cached[3] == visible:
+                    return cached[:3]
+                html = generate_heat_html(
+                    self.drivers,
+                    self.laps,
+                    seed=self._heat_seed(track, session_id),
+                    track=track,
+                    session_id=session_id,
+                    visible_laps=visible,
+                )
+                page = _page_entry(html, changed_at) + (visible,)
+                self._pages[key] = page
+                return page[:3]
+
+            cached = self._pages.get(key)
+            if cached is not None:
+                return cached[:3]
+
+        html = self._recorded_page(track, session_id)
+        if html is None:
+            html = generate_heat_html(
+                self.drivers,
+                self.laps,
+                seed=self._heat_seed(track, session_id),
+                track=track,
+                session_id=session_id,
+            )
+        page = _page_entry(html, self._started_at) + (None,)
+        with self._lock:
+            page = self._pages.setdefault(key, page)
+        return page[:3]
+
+    def _recorded_page(self, track: str, session_id: int):
+        if not self.pages_dir:
+            return None
+        path = os.path.join(self.pages_dir, f"heat_{track}_{session_id}.html")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def _count(self, key, n: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += n
+
+    def _should_fail(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _delay(self) -> None:
+        if not self.latency and not self.jitter:
+            return
+        with self._lock:
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _page_entry(html: str, modified_at: float):
+    body = html.encode("utf-8")
+    etag = f'"{zlib.crc32(body):08x}-{len(body):x}"'
+    return body, etag, formatdate(modified_at, usegmt=True)
+
+
+def _make_handler(server: TimingServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            server._delay()
+            match = _PATH_RE.match(self.path.split("?", 1)[0])
+            if match is None:
+                return self._send_status(404)
+            if server._should_fail():
+                return self._send_status(503)
+
+            track, session_id = match.group(1), int(match.group(2))
+            page = server.page(track, session_id)
+            if page is None:
+                return self._send_status(404)
+
+            body, etag, last_modified = page
+            if self._not_modified(etag, last_modified):
+                server._count(304)
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            server._count(200)
+            server._count("bytes", len(body))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _not_modified(self, etag: str, last_modified: str) -> bool:
+            if_none_match = self.headers.get("If-None-Match")
+            if if_none_match is not None:
+                return etag in [tag.strip() for tag in if_none_match.split(",")]
+            return self.headers.get("If-Modified-Since") == last_modified
+
+        def _send_status(self, status: int):
+            server._count(status)
+            body = f"{status}".encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--drivers", type=int, default=12)
+    parser.add_argument("--laps", type=int, default=20)
+    parser.add_argument("--pages-dir", help="каталог сохранённых страниц heat_{track}_{id}.html")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="разброс задержки, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 503")
+    parser.add_argument("--max-session-id", type=int, help="номера выше отдают 404")
+    parser.add_argument("--live-from", type=int, help="номера от этого идут вживую")
+    parser.add_argument("--lap-interval", type=float, default=30.0, help="секунд на круг живого заезда")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def server_from_args(args, host: str = "127.0.0.1", port: int = 0) -> TimingServer:
+    return TimingServer(
+        host=host,
+        port=port,
+        drivers=args.drivers,
+        laps=args.laps,
+        pages_dir=args.pages_dir,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        max_session_id=args.max_session_id,
+        live_from=args.live_from,
+        lap_interval=args.lap_interval,
+        seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    server = server_from_args(args, host=args.host, port=args.port)
+    print(f"Стенд хронометража: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Запросы: {dict(server.stats)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Синхронизация архива заездов с сайтом.
+
+Для каждого трека ищется самый новый session_id (экспоненциальный, затем
+бинарный поиск по номерам), после чего скачиваются все ещё не загруженные
+номера — от новых к старым. Загруженные и отсутствующие номера хранятся в
+файле контрольной точки, поэтому прерванный запуск продолжается без
+повторных загрузок. Несколько самых новых номеров в неё не попадают: заезд
+может ещё идти (или таблицы на странице ещё нет), и при следующей
+синхронизации они загружаются заново. Запросы к каждому хосту ограничены token bucket,
+сетевые ошибки повторяются с экспоненциальной задержкой.
+"""
+import json
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+
+from Parse_data import VALID_TRACKS, fetch_race_page, get_page_cache, heat_url, parse_race_page
+from io_heat import heat_filename
+
+DEFAULT_CHECKPOINT = os.path.join("heats_data", "crawler_checkpoint.json")
+
+
+class TokenBucket:
+    """Ограничение частоты: rate запросов в секунду, всплеск до capacity."""
+
+    def __init__(self, rate: float, capacity: float = None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+def _to_ranges(ids):
+    """[1, 2, 3, 7] -> [[1, 3], [7, 7]] для компактной контрольной точки."""
+    ranges = []
+    for value in sorted(ids):
+        if ranges and value == ranges[-1][1] + 1:
+            ranges[-1][1] = value
+        else:
+            ranges.append([value, value])
+    return ranges
+
+
+def _from_ranges(ranges):
+    ids = set()
+    for start, end in ranges:
+        ids.update(range(start, end + 1))
+    return ids
+
+
+class Checkpoint:
+    """Состояние синхронизации по трекам: загруженные и отсутствующие номера."""
+
+    def __init__(self, path: str = DEFAULT_CHECKPOINT) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self.done = {}
+        self.missing = {}
+        self.latest = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for track, state in data.items():
+                self.done[track] = _from_ranges(state.get("done", []))
+                self.missing[track] = _from_ranges(state.get("missing", []))
+                if state.get("latest") is not None:
+                    self.latest[track] = state["latest"]
+
+    def is_known(self, track: str, session_id: int) -> bool:
+        with self._lock:
+            return session_id in self.done.get(track, ()) or session_id in self.missing.get(track, ())
+
+    def mark(self, track: str, session_id: int, found: bool) -> None:
+        with self._lock:
+            target = self.done if found else self.missing
+            target.setdefault(track, set()).add(session_id)
+
+    def set_latest(self, track: str, session_id: int) -> None:
+        with self._lock:
+            self.latest[track] = session_id
+
+    def save(self) -> None:
+        with self._lock:
+            data = {
+                track: {
+                    "done": _to_ranges(self.done.get(track, ())),
+                    "missing": _to_ranges(self.missing.get(track, ())),
+                    "latest": self.latest.get(track),
+                }
+                for track in set(self.done) | set(self.missing) | set(self.latest)
+            }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+
+class Crawler:
+    """
+    :param rate: запросов в секунду на один хост
+    :param max_retries: повторов при сетевых ошибках и ответах 429/5xx
+    :param backoff: базовая задержка повтора, секунды (удваивается)
+    :param extension: формат сохраняемых заездов (.json или .kheat)
+    :param gap_window: сколько номеров подряд должно отсутствовать, чтобы
+        поиск последнего заезда счёл их концом архива
+    :param recheck_latest: сколько самых новых номеров не записывать в
+        контрольную точку и перепроверять при каждой синхронизации (кроме
+        тех, что PageCache уже считает завершёнными)
+    """
+
+    def __init__(
+        self,
+        checkpoint: Checkpoint = None,
+        rate: float = 2.0,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        extension: str = ".json",
+        gap_window: int = 3,
+        recheck_latest: int = 3,
+        session=None,
+        sleep=time.sleep,
+    ) -> None:
+        self.checkpoint = checkpoint if checkpoint is not None else Checkpoint()
+        self.rate = rate
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.extension = extension
+        self.gap_window = max(1, gap_window)
+        self.recheck_latest = max(0, recheck_latest)
+        self.session = session
+        self.sleep = sleep
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        # страницы, загруженные при поиске последнего номера: (трек, номер) -> строки
+        self._probed = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- запросы ---
+
+    def _bucket(self, track: str) -> TokenBucket:
+        host = urlsplit(heat_url("0", track)).netloc
+        with self._buckets_lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.rate, sleep=self.sleep)
+            return bucket
+
+    def fetch_rows(self, track: str, session_id: int):
+        """
+        Строки таблицы заезда или None, если такого заезда нет (404 или нет
+        таблицы). Временные ошибки повторяются, после max_retries — исключение.
+        """
+        bucket = self._bucket(track)
+        for attempt in range(self.max_retries + 1):
+            bucket.acquire()
+            try:
+                html = fetch_race_page(str(session_id), track=track, session=self.session)
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status in (404, 410):
+                    return None
+                if status is not None and status < 500 and status != 429:
+                    raise
+                error = e
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            else:
+                rows = parse_race_page(html)
+                return rows or None
+
+            if attempt == self.max_retries:
+                raise error
+            delay = self.backoff * (2 ** attempt)
+            self.sleep(delay + random.uniform(0, delay / 2))
+
+    def exists(self, track: str, session_id: int) -> bool:
+        if session_id in self.checkpoint.done.get(track, ()):
+            return True
+        key = (track, session_id)
+        if key in self._probed:
+            return self._probed[key] is not None
+        rows = self.fetch_rows(track, session_id)
+        # страница пробы не выбрасывается: download возьмёт её отсюда
+        self._probed[key] = rows
+        return rows is not None
+
+    def _first_existing(self, track: str, first: int, last: int):
+        """Первый существующий номер из first..last или None."""
+        for session_id in range(first, last + 1):
+            if self.exists(track, session_id):
+                return session_id
+        return None
+
+    # --- поиск последнего номера ---
+
+    def find_latest_session_id(self, track: str, start: int = 1) -> int:
+        """
+        Самый новый существующий session_id трека: от известного номера шаг
+        удваивается, пока заезды находятся, затем граница уточняется бинарно.
+        Номер считается концом архива, только если за ним подряд отсутствуют
+        gap_window номеров: одиночные пропуски поиск не останавливают.
+        Возвращает 0, если не найдено ни одного заезда.
+        """
+        self._probed.clear()
+        window = self.gap_window
+        known = self.checkpoint.latest.get(track) or 0
+        low = max(known, start - 1)
+        if low >= start and not self.exists(track, low):
+            low = start - 1
+
+        while True:
+            step = 1
+            high = low + step
+            while self.exists(track, high):
+                low = high
+                step *= 2
+                high = low + step
+
+            # low существует (или low == start - 1), high — нет
+            while high - low > 1:
+                middle = (low + high) // 2
+                if self.exists(track, middle):
+                    low = middle
+                else:
+                    high = middle
+
+            # пропуск на точке пробы — ещё не конец: за low подряд должно
+            # отсутствовать gap_window номеров, иначе поиск продолжается дальше
+            found = self._first_existing(track, low + 1, low + window)
+            if found is None:
+                break
+            low = found
+
+        if low >= start:
+            self.checkpoint.set_latest(track, low)
+            self.checkpoint.save()
+        return max(low, 0)
+
+    # --- загрузка ---
+
+    def is_settled(self, track: str, session_id: int, latest: int) -> bool:
+        """
+        Можно ли запомнить номер в контрольной точке: он старше recheck_latest
+        самых новых или PageCache видит его страницу давно неизменной.
+        """
+        if session_id <= latest - self.recheck_latest:
+            return True
+        cache = get_page_cache()
+        return cache is not None and cache.is_finished(track, session_id)
+
+    def download(self, track: str, session_id: int, directory: str = "heats_data", settled: bool = True):
+        """
+        Загружает и сохраняет один заезд; возвращает путь или None. Если
+        settled=False, результат не записывается в контрольную точку.
+        """
+        from Data_Classes.heat import Heat
+
+        key = (track, session_id)
+        rows = self._probed.pop(key) if key in self._probed else self.fetch_rows(track, session_id)
+        if rows is None:
+            if settled:
+                self.checkpoint.mark(track, session_id, found=False)
+            return None
+        filename = os.path.join(
+            directory, os.path.basename(heat_filename(session_id, track))
+        )
+        filename = os.path.splitext(filename)[0] + self.extension
+        Heat(str(session_id), track=track, raw_data=rows).save(filename)
+        if settled:
+            self.checkpoint.mark(track, session_id, found=True)
+        return filename
+
+    def sync_track(self, track: str, start: int = 1, directory: str = "heats_data", limit: int = None):
+        """
+        Загружает все ещё не известные номера трека от самого нового к старым;
+        recheck_latest самых новых загружаются каждый раз заново. Контрольная
+        точка сохраняется после каждого заезда. Возвращает список сохранённых
+        файлов.
+        """
+        if track not in VALID_TRACKS:
+            raise ValueError(
+                f"Unknown track '{track}'. Must be one of: {', '.join(VALID_TRACKS)}"
+            )
+        latest = self.find_latest_session_id(track, start=start)
+        saved = []
+        for session_id in range(latest, start - 1, -1):
+            if self._stop.is_set() or (limit is not None and len(saved) >= limit):
+                break
+            if self.checkpoint.is_known(track, session_id):
+                continue
+            settled = self.is_settled(track, session_id, latest)
+            path = self.download(track, session_id, directory=directory, settled=settled)
+            self.checkpoint.save()
+            if path:
+                saved.append(path)
+        return saved
+
+    def sync(self, tracks=None, **kwargs):
+        tracks = sorted(VALID_TRACKS) if tracks is None else tracks
+        return {track: self.sync_track(track, **kwargs) for track in tracks}
+
+    # --- фоновый режим ---
+
+    def start_background(self, tracks=None, interval: float = 600.0, **kwargs) -> threading.Thread:
+        """Периодически синхронизирует треки в фоновом потоке, пока не вызван stop()."""
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.sync(tracks, **kwargs)
+                except Exception as e:
+                    print(f"Ошибка синхронизации архива: {e}")
+                self._stop.wait(interval)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=run, name="heat-crawler", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout: float = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Синхронизация архива заездов с сайтом")
+    parser.add_argument("tracks", nargs="*", default=None, help="треки (по умолчанию все)")
+    parser.add_argument("--start", type=int, default=1, help="минимальный session_id")
+    parser.add_argument("--rate", type=float, default=2.0, help="запросов в секунду")
+    parser.add_argument("--limit", type=int, default=None, help="не больше N заездов на трек")
+    parser.add_argument("--format", default=".json", help="расширение: .json или .kheat")
+    parser.add_argument("--recheck", type=int, default=3, help="сколько новейших заездов перепроверять")
+    parser.add_argument("--pack", default=None, help="каталог архива сырых страниц (page_pack)")
+    args = parser.parse_args()
+
+    if args.pack:
+        from Parse_data import set_page_pack
+        from page_pack import PagePack
+
+        set_page_pack(PagePack(args.pack))
+
+    crawler = Crawler(rate=args.rate, extension=args.format, recheck_latest=args.recheck)
+    for track, files in crawler.sync(args.tracks or None, start=args.start, limit=args.limit).items():
+        print(f"{track}: загружено заездов {len(files)}")
@@ -0,0 +1,318 @@
+"""
+Нормализация имён пилотов и нечёткий поиск по архиву.
+
+Имена вводятся на треке вручную, поэтому один человек встречается в разном
+регистре, с опечатками, кириллицей и латиницей. fold_driver_name сводит
+имя к латинскому ключу, DriverNameIndex строит по ключам инвертированный
+индекс триграмм: поиск и объединение написаний в одного пилота идут через
+списки совпадающих триграмм, без попарного сравнения имён.
+"""
+import math
+import re
+from array import array
+from collections import Counter
+from typing import NamedTuple
+
+import numpy as np
+
+_SPACES_RE = re.compile(r"\s+")
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+_TRANSLIT = str.maketrans({
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ж": "zh",
+    "з": "z", "и": "i", "й": "i", "к": "k", "л": "l", "м": "m", "н": "n",
+    "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u", "ф": "f",
+    "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch", "ъ": "", "ы": "i",
+    "ь": "", "э": "e", "ю": "iu", "я": "ia", "і": "i", "ї": "i", "є": "e",
+})
+# разные системы транслитерации одного и того же звука
+_LATIN_FOLDS = (("kh", "h"), ("ph", "f"), ("ck", "k"), ("w", "v"), ("x", "ks"), ("y", "i"), ("j", "i"))
+
+
+def normalize_driver_name(name) -> str:
+    """Нормализует имя пилота для поиска: регистр, ё/е, лишние пробелы."""
+    if name is None:
+        return ""
+    name = str(name).lower().replace("ё", "е")
+    return _SPACES_RE.sub(" ", name).strip()
+
+
+def fold_driver_name(name) -> str:
+    """
+    Ключ для нечёткого сравнения: нормализация, транслитерация в латиницу,
+    сведение вариантов транслитерации (kh/h, y/j/i, w/v) и отброс знаков.
+    """
+    name = normalize_driver_name(name).translate(_TRANSLIT)
+    for src, dst in _LATIN_FOLDS:
+        name = name.replace(src, dst)
+    return _NON_WORD_RE.sub(" ", name).strip()
+
+
+def _index_key(name) -> str:
+    # порядок слов (фамилия первой или второй) ключ не различает
+    return " ".join(sorted(fold_driver_name(name).split()))
+
+
+# мужская и женская форма фамилии — разные люди: petrov/petrova, kovalevskii/kovalevskaia
+_GENDER_ENDINGS = (("", "a"), ("ii", "aia"), ("i", "aia"), ("oi", "aia"))
+
+
+def _gender_pair(a: str, b: str) -> bool:
+    for x, y in ((a, b), (b, a)):
+        for male, female in _GENDER_ENDINGS:
+            if x.endswith(male) and y == x[:len(x) - len(male)] + female:
+                return True
+    return False
+
+
+def _may_be_same_driver(key_a: str, key_b: str) -> bool:
+    """False, если ключи различаются родовой формой слова (Petrov и Petrova)."""
+    a, b = key_a.split(), key_b.split()
+    only_a = [t for t in a if t not in b]
+    only_b = [t for t in b if t not in a]
+    return not any(_gender_pair(x, y) for x in only_a for y in only_b)
+
+
+def name_trigrams(folded: str):
+    """Множество триграмм ключа; каждое слово дополняется пробелами, порядок слов не важен."""
+    grams = set()
+    for token in folded.split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class NameMatch(NamedTuple):
+    """Результат поиска: самое частое написание, сходство (Dice), участий, кластер."""
+
+    name: str
+    similarity: float
+    entries: int
+    cluster: int
+
+
+class DriverNameIndex:
+    """
+    Инкрементальный триграммный индекс имён.
+
+    Узел индекса — ключ fold_driver_name с упорядоченными словами; к нему копятся все исходные
+    написания со счётчиком участий. Списки триграмм хранят номера ключей
+    по возрастанию. Кандидаты ищутся префиксной фильтрацией: при сходстве
+    Dice >= t совпасть должно не меньше t*m/(2-t) из m триграмм запроса,
+    поэтому достаточно просмотреть списки самых редких m-k+1 триграмм.
+
+    Новый ключ присоединяется к кластеру пилота сразу при добавлении, если
+    сходство с каждым ключом кластера не ниже cluster_threshold (полная
+    связь: цепочка похожих имён не сливает разных людей) и ключи не
+    различаются только родовой формой фамилии. Ключ, у которого не осталось
+    участий, выходит из поиска, а его кластер собирается заново без него.
+    """
+
+    def __init__(self, cluster_threshold: float = 0.85) -> None:
+        self.cluster_threshold = cluster_threshold
+        self._ids = {}
+        # исходное написание -> номер ключа, чтобы не сворачивать повторы
+        self._spelling_ids = {}
+        self._keys = []
+        self._spellings = []
+        self._sizes = np.zeros(0, dtype=np.int32)
+        # ключи с участиями; остальные не находятся и не входят в кластеры
+        self._alive = np.zeros(0, dtype=bool)
+        self._postings = {}
+        self._parent = []
+        # корень кластера -> номера ключей кластера
+        self._members = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    # --- наполнение ---
+
+    def add(self, name, count: int = 1):
+        """Добавляет написание имени; возвращает номер ключа или None для пустого имени."""
+        spelling = str(name).strip()
+        idx = self._spelling_ids.get(spelling)
+        if idx is None:
+            key = _index_key(spelling)
+            if not key:
+                return None
+            idx = self._ids.get(key)
+            if idx is None:
+                idx = self._insert(key)
+            self._spelling_ids[spelling] = idx
+        self._spellings[idx][spelling] += count
+        if not self._alive[idx] and self._entries(idx) > 0:
+            self._alive[idx] = True
+            self._assign(idx)
+        return idx
+
+    def discard(self, name, count: int = 1) -> None:
+        """Уменьшает счётчик написания (например, при переиндексации заезда)."""
+        idx = self._ids.get(_index_key(name))
+        if idx is None:
+            return
+        spellings = self._spellings[idx]
+        spelling = str(name).strip()
+        spellings[spelling] -= count
+        if spellings[spelling] <= 0:
+            del spellings[spelling]
+        if self._alive[idx] and self._entries(idx) <= 0:
+            self._retire(idx)
+
+    def add_heat(self, heat) -> None:
+        for driver in heat.drivers:
+            self.add(driver.name)
+
+    def _insert(self, key: str) -> int:
+        grams = name_trigrams(key)
+        idx = len(self._keys)
+        self._ids[key] = idx
+        self._keys.append(key)
+        self._spellings.append(Counter())
+        self._parent.append(idx)
+        self._members[idx] = [idx]
+        if idx >= self._sizes.size:
+            extra = max(idx + 1, self._sizes.size)
+            self._sizes = np.concatenate([self._sizes, np.zeros(extra, dtype=np.int32)])
+            self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+        self._sizes[idx] = len(grams)
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("i")
+            postings.append(idx)
+        # живым ключ становится с первым участием (в add)
+        return idx
+
+    # --- поиск ---
+
+    def _candidates(self, grams, min_similarity: float):
+        """Пары (номер ключа, сходство Dice) не ниже min_similarity."""
+        m = len(grams)
+        if not m or not self._keys:
+            return []
+        lists = sorted(
+            (np.frombuffer(self._postings[g], dtype=np.int32) if g in self._postings else None for g in grams),
+            key=lambda p: 0 if p is None else p.size,
+        )
+        need = max(1, math.ceil(min_similarity * m / (2.0 - min_similarity) - 1e-9))
+        split = m - need + 1
+        prefix = [p for p in lists[:split] if p is not None]
+        if not prefix:
+            return []
+        candidates, overlap = np.unique(np.concatenate(prefix), return_counts=True)
+        alive = self._alive[candidates]
+        candidates, overlap = candidates[alive], overlap[alive]
+        sizes = self._sizes[candidates]
+        # сколько общих триграмм нужно каждому кандидату для сходства min_similarity
+        required = np.ceil(min_similarity * (m + sizes) / 2.0 - 1e-9)
+
+        # остальные списки — самые длинные; кандидатов, которым уже не
+        # набрать нужного числа совпадений, отбрасываем до бинарного поиска
+        rest = lists[split:]
+        for i, postings in enumerate(rest):
+            if i in (0, len(rest) // 2):
+                keep = (overlap + (len(rest) - i) >= required) & (required <= sizes)
+                candidates, overlap, sizes, required = (
+                    candidates[keep], overlap[keep], sizes[keep], required[keep]
+                )
+                if not candidates.size:
+                    return []
+            pos = np.searchsorted(postings, candidates)
+            found = pos < postings.size
+            found[found] = postings[pos[found]] == candidates[found]
+            overlap += found
+
+        similarity = 2.0 * overlap / (m + sizes)
+        keep = similarity >= min_similarity
+        return list(zip(candidates[keep].tolist(), similarity[keep].tolist()))
+
+    def search(self, query, limit: int = 10, min_similarity: float = 0.4):
+        """Похожие имена, по убыванию сходства: список NameMatch."""
+        matches = self._candidates(name_trigrams(_index_key(query)), min_similarity)
+        matches.sort(key=lambda m: (-m[1], -self._entries(m[0])))
+        return [self._match(idx, similarity) for idx, similarity in matches[:limit]]
+
+    def _entries(self, idx: int) -> int:
+        return sum(self._spellings[idx].values())
+
+    def _match(self, idx: int, similarity: float) -> NameMatch:
+        spellings = self._spellings[idx]
+        name = spellings.most_common(1)[0][0] if spellings else self._keys[idx]
+        return NameMatch(name, similarity, self._entries(idx), self._find(idx))
+
+    # --- кластеры ---
+
+    def _find(self, idx: int) -> int:
+        parent = self._parent
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    def _assign(self, idx: int) -> None:
+        """Присоединяет одиночный ключ к самому похожему кластеру, с каждым ключом которого он сходен."""
+        key = self._keys[idx]
+        similar = {
+            other: similarity
+            for other, similarity in self._candidates(name_trigrams(key), self.cluster_threshold)
+            if other != idx
+        }
+        best, best_score = None, 0.0
+        for root in {self._find(other) for other in similar}:
+            members = self._members[root]
+            if not all(m in similar and _may_be_same_driver(key, self._keys[m]) for m in members):
+                continue
+            score = sum(similar[m] for m in members) / len(members)
+            if score > best_score:
+                best, best_score = root, score
+        if best is not None:
+            self._union(idx, best)
+
+    def _retire(self, idx: int) -> None:
+        """Ключ без участий выходит из кластера; оставшиеся ключи распределяются заново."""
+        self._alive[idx] = False
+        members = self._members.pop(self._find(idx))
+        for m in members:
+            self._parent[m] = m
+            self._members[m] = [m]
+        for m in sorted(members):
+            if m != idx:
+                self._assign(m)
+
+    def _union(self, a: int, b: int) -> None:
+        a, b = self._find(a), self._find(b)
+        if a == b:
+            return
+        # корень — меньший номер, чтобы id кластера не зависел от порядка слияний
+        root, child = min(a, b), max(a, b)
+        self._parent[child] = root
+        self._members[root].extend(self._members.pop(child))
+
+    def cluster_id(self, name):
+        """Номер пилота (кластера) для имени или None, если имени нет в индексе."""
+        idx = self._ids.get(_index_key(name))
+        return None if idx is None or not self._alive[idx] else self._find(idx)
+
+    def variants(self, name):
+        """
+        Все написания того же пилота. Для имени вне индекса берётся кластер
+        самого похожего ключа; пустой список, если похожих нет.
+        """
+        root = self.cluster_id(name)
+        if root is None:
+            matches = self.search(name, limit=1, min_similarity=self.cluster_threshold)
+            if not matches:
+                return []
+            root = matches[0].cluster
+        return sorted(spelling for idx in self._members[root] for spelling in self._spellings[idx])
+
+    def clusters(self, min_size: int = 2):
+        """Группы написаний одного пилота (не меньше min_size ключей), крупные первыми."""
+        result = [
+            sorted(spelling for idx in members for spelling in self._spellings[idx])
+            for root, members in self._members.items()
+            if len(members) >= min_size and self._alive[root]
+        ]
+        result.sort(key=len, reverse=True)
+        return result
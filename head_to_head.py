@@ -0,0 +1,262 @@
+"""
+Личные встречи пилотов и картов: кто кого опережал в общих заездах и на
+сколько отличались их лучшие круги.
+
+Хранятся только пары, встречавшиеся хотя бы раз (разреженная матрица):
+строка пары — счётчики побед, число встреч и медиана разницы лучших
+кругов. Разницы по встречам каждой пары хранятся отсортированными, так
+что новый заезд вставляет по одному значению в пары своих участников, а
+запрос пары — поиск в словаре и чтение строки. Пилоты сравниваются по
+нормализованному имени на всех треках, карты — внутри трека.
+"""
+import bisect
+import os
+from array import array
+
+import numpy as np
+
+from driver_names import normalize_driver_name
+from io_heat import iter_heat_files
+
+
+def _grown(values, size: int, fill):
+    if size <= values.size:
+        return values
+    extra = max(size, values.size * 2, 256) - values.size
+    return np.concatenate([values, np.full(extra, fill, dtype=values.dtype)])
+
+
+class _PairTable:
+    """Разреженная таблица пар одного вида (пилоты или карты)."""
+
+    PAIR_FIELDS = (("lo", np.int32, 0), ("hi", np.int32, 0), ("wins_lo", np.int32, 0),
+                   ("wins_hi", np.int32, 0), ("meetings", np.int32, 0), ("median", np.float64, np.nan))
+
+    def __init__(self) -> None:
+        self.index = {}
+        self.names = []
+        self.pairs = {}
+        # номер сущности -> строки её пар (для соперников)
+        self.entity_pairs = []
+        # строка пары -> отсортированные разницы лучших кругов
+        self.deltas = []
+        for field, dtype, _ in self.PAIR_FIELDS:
+            setattr(self, field, np.zeros(0, dtype=dtype))
+
+    def ids_for(self, keys, display_names):
+        ids = np.empty(len(keys), dtype=np.int32)
+        for i, (key, name) in enumerate(zip(keys, display_names)):
+            idx = self.index.get(key)
+            if idx is None:
+                idx = self.index[key] = len(self.names)
+                self.names.append(name)
+                self.entity_pairs.append([])
+            ids[i] = idx
+        return ids
+
+    def rows_for(self, lo, hi):
+        pairs = self.pairs
+        rows = np.empty(len(lo), dtype=np.intp)
+        new = []
+        for i, pair in enumerate(zip(lo.tolist(), hi.tolist())):
+            row = pairs.get(pair)
+            if row is None:
+                row = pairs[pair] = len(pairs)
+                new.append((row, pair))
+            rows[i] = row
+
+        if new:
+            for field, _, fill in self.PAIR_FIELDS:
+                setattr(self, field, _grown(getattr(self, field), len(pairs), fill))
+            for row, (a, b) in new:
+                self.lo[row], self.hi[row] = a, b
+                self.entity_pairs[a].append(row)
+                self.entity_pairs[b].append(row)
+                self.deltas.append(array("d"))
+        return rows
+
+    def update(self, ids, places, bests) -> int:
+        """Учитывает один заезд: ids, места и лучшие круги участников. Возвращает число пар."""
+        # один пилот дважды в заезде (совпавшие имена) учитывается один раз
+        ids, first = np.unique(ids, return_index=True)
+        places, bests = places[first], bests[first]
+        if ids.size < 2:
+            return 0
+
+        # ids отсортированы, поэтому в паре (i, j) при i < j меньший номер — первый
+        i, j = np.triu_indices(ids.size, 1)
+        rows = self.rows_for(ids[i], ids[j])
+        self.meetings[rows] += 1
+        self.wins_lo[rows] += places[i] < places[j]
+        self.wins_hi[rows] += places[j] < places[i]
+
+        deltas = bests[i] - bests[j]
+        timed = np.flatnonzero(~np.isnan(deltas))
+        for row, delta in zip(rows[timed].tolist(), deltas[timed].tolist()):
+            values = self.deltas[row]
+            bisect.insort(values, delta)
+            n = len(values)
+            self.median[row] = (values[(n - 1) // 2] + values[n // 2]) / 2.0
+        return int(rows.size)
+
+    def pair_row(self, key_a, key_b):
+        """(строка, a — меньший номер) или None, если пара не встречалась."""
+        a, b = self.index.get(key_a), self.index.get(key_b)
+        if a is None or b is None or a == b:
+            return None
+        row = self.pairs.get((min(a, b), max(a, b)))
+        return None if row is None else (row, a < b)
+
+    def result(self, row: int, a_is_lo: bool) -> dict:
+        lo, hi = int(self.lo[row]), int(self.hi[row])
+        wins, losses = int(self.wins_lo[row]), int(self.wins_hi[row])
+        median = float(self.median[row])
+        if not a_is_lo:
+            lo, hi, wins, losses, median = hi, lo, losses, wins, -median
+        return {
+            "name": self.names[lo],
+            "rival": self.names[hi],
+            "meetings": int(self.meetings[row]),
+            "wins": wins,
+            "losses": losses,
+            "draws": int(self.meetings[row]) - wins - losses,
+            "median_delta": None if np.isnan(median) else median,
+        }
+
+    # --- снимок ---
+
+    def arrays(self, prefix: str) -> dict:
+        n = len(self.pairs)
+        lengths = np.array([len(values) for values in self.deltas], dtype=np.int64)
+        data = {
+            f"{prefix}.keys": np.array(list(self.index), dtype=str),
+            f"{prefix}.names": np.array(self.names, dtype=str),
+            # разницы всех пар подряд, границы пар — в delta_offsets
+            f"{prefix}.delta_offsets": np.concatenate([[0], np.cumsum(lengths)]),
+            f"{prefix}.delta_values": np.frombuffer(b"".join(v.tobytes() for v in self.deltas), dtype=np.float64),
+        }
+        for field, _, _ in self.PAIR_FIELDS:
+            data[f"{prefix}.{field}"] = getattr(self, field)[:n]
+        return data
+
+    @classmethod
+    def from_arrays(cls, data, prefix: str) -> "_PairTable":
+        table = cls()
+        table.index = {key: i for i, key in enumerate(data[f"{prefix}.keys"].tolist())}
+        table.names = data[f"{prefix}.names"].tolist()
+        for field, _, _ in cls.PAIR_FIELDS:
+            setattr(table, field, data[f"{prefix}.{field}"].copy())
+        offsets = data[f"{prefix}.delta_offsets"]
+        values = data[f"{prefix}.delta_values"]
+        table.deltas = [array("d", values[offsets[r]:offsets[r + 1]].tobytes()) for r in range(offsets.size - 1)]
+        table.entity_pairs = [[] for _ in table.names]
+        for row, pair in enumerate(zip(table.lo.tolist(), table.hi.tolist())):
+            table.pairs[pair] = row
+            table.entity_pairs[pair[0]].append(row)
+            table.entity_pairs[pair[1]].append(row)
+        return table
+
+
+class HeadToHead:
+    """
+    Личные встречи по потоку заездов. Победа в паре — место выше в общем
+    заезде; median_delta — медиана разницы лучших кругов (отрицательная —
+    первый быстрее).
+    """
+
+    def __init__(self) -> None:
+        self.drivers = _PairTable()
+        self.karts = _PairTable()
+        # уже учтённые заезды "track/session_id"
+        self.processed = set()
+
+    def add_heat(self, heat) -> bool:
+        """Учитывает заезд; повторно тот же заезд не учитывается."""
+        key = f"{heat.track}/{heat.session_id}"
+        cols = [col for col, d in enumerate(heat.drivers) if d.place is not None]
+        if key in self.processed or len(cols) < 2:
+            return False
+        self.processed.add(key)
+
+        drivers = [heat.drivers[col] for col in cols]
+        places = np.array([d.place for d in drivers], dtype=np.float64)
+        times = heat.lap_times
+        bests = np.full(len(cols), np.nan)
+        if times.shape[0]:
+            bests = np.fmin.reduce(times[:, cols], axis=0, initial=np.nan)
+
+        ids = self.drivers.ids_for([normalize_driver_name(d.name) for d in drivers], [d.name for d in drivers])
+        self.drivers.update(ids, places, bests)
+
+        karted = [i for i, d in enumerate(drivers) if d.kart_id is not None]
+        kart_keys = [f"{heat.track}/{drivers[i].kart_id}" for i in karted]
+        ids = self.karts.ids_for(kart_keys, kart_keys)
+        self.karts.update(ids, places[karted], bests[karted])
+        return True
+
+    def add_heats(self, heats) -> int:
+        return sum(self.add_heat(heat) for heat in heats)
+
+    # --- запросы ---
+
+    def driver_pair(self, a: str, b: str):
+        """Встречи пилота a с пилотом b (с точки зрения a) или None."""
+        found = self.drivers.pair_row(normalize_driver_name(a), normalize_driver_name(b))
+        return None if found is None else self.drivers.result(*found)
+
+    def kart_pair(self, track: str, a, b):
+        """Встречи карта a с картом b на треке (с точки зрения a) или None."""
+        found = self.karts.pair_row(f"{track}/{a}", f"{track}/{b}")
+        return None if found is None else self.karts.result(*found)
+
+    def _rivals(self, table, key, n: int, min_meetings: int):
+        idx = table.index.get(key)
+        if idx is None:
+            return []
+        rows = [row for row in table.entity_pairs[idx] if table.meetings[row] >= min_meetings]
+        # сначала частые соперники, при равенстве — с более равным счётом
+        rows.sort(key=lambda r: (-int(table.meetings[r]), abs(int(table.wins_lo[r]) - int(table.wins_hi[r]))))
+        return [table.result(row, int(table.lo[row]) == idx) for row in rows[:n]]
+
+    def driver_rivals(self, name: str, n: int = 10, min_meetings: int = 1):
+        """Главные соперники пилота: по числу встреч, затем по равенству счёта."""
+        return self._rivals(self.drivers, normalize_driver_name(name), n, min_meetings)
+
+    def kart_rivals(self, track: str, kart_id, n: int = 10, min_meetings: int = 1):
+        return self._rivals(self.karts, f"{track}/{kart_id}", n, min_meetings)
+
+    # --- снимок состояния ---
+
+    def save(self, path: str) -> None:
+        """Сохраняет состояние в компактный .npz (без pickle)."""
+        arrays = {"processed": np.array(sorted(self.processed), dtype=str)}
+        arrays.update(self.drivers.arrays("drivers"))
+        arrays.update(self.karts.arrays("karts"))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "HeadToHead":
+        store = cls()
+        with np.load(path, allow_pickle=False) as data:
+            store.processed = set(data["processed"].tolist())
+            store.drivers = _PairTable.from_arrays(data, "drivers")
+            store.karts = _PairTable.from_arrays(data, "karts")
+        return store
+
+    # --- пересборка ---
+
+    @classmethod
+    def replay_directory(cls, directory: str = "heats_data") -> "HeadToHead":
+        """Строит таблицу встреч по всем heat_*.json / heat_*.kheat каталога."""
+        from Data_Classes.heat import Heat
+
+        store = cls()
+        for _, _, path in iter_heat_files(directory):
+            store.add_heat(Heat.load(path))
+        return store
@@ -0,0 +1,413 @@
+"""
+Локальный HTTP-сервис заездов для экранов у трека и ботов: вместо того
+чтобы каждый клиент сам загружал и разбирал страницу, сервис держит
+разобранные Heat в ограниченном LRU и отдаёт их как JSON или PNG.
+
+    python heat_service.py --port 8080 --max-heats 256 --cache-dir heats_cache
+
+Маршруты:
+    GET /heats/{track}/{session_id}        результаты заезда (JSON)
+    GET /heats/{track}/{session_id}/laps   таблица кругов (JSON)
+    GET /heats/{track}/{session_id}.png    картинка результатов
+    GET /stats                             кэш и задержки по маршрутам
+
+Одновременные запросы одного заезда ждут одну общую загрузку. Записи
+старше max_age перезагружаются — с PageCache это дешёвый условный GET.
+Только стандартная библиотека: asyncio и потоки для загрузки и отрисовки.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from instrumentation import HistogramSink
+from Parse_data import POOL_SIZE, validate_track
+
+_ROUTE_RE = re.compile(r"^/heats/([a-z]+)/([^/.]+)(/laps|\.png)?/?$")
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+}
+
+
+def _nan_to_none(values):
+    values = np.asarray(values, dtype=np.float64)
+    result = values.astype(object)
+    result[np.isnan(values)] = None
+    return result.tolist()
+
+
+def heat_to_json(heat):
+    """Результаты заезда для ответа сервиса."""
+    times = heat.lap_times
+    drivers = []
+    for col, driver in enumerate(heat.drivers):
+        column = times[:, col] if col < times.shape[1] else np.zeros(0)
+        done = column[~np.isnan(column)]
+        drivers.append({
+            "place": driver.place,
+            "name": driver.name,
+            "kart_id": driver.kart_id,
+            "laps": int(done.size),
+            "best": float(done.min()) if done.size else None,
+        })
+    return {
+        "track": heat.track,
+        "session_id": str(heat.session_id),
+        "fetched_at": heat.fetched_at,
+        "lap_count": heat.lap_count,
+        "drivers": drivers,
+        "side_info": heat.side_info,
+    }
+
+
+def laps_to_json(heat):
+    """Таблица кругов: строки — круги, столбцы — пилоты, null — нет круга."""
+    n = len(heat.drivers)
+    return {
+        "track": heat.track,
+        "session_id": str(heat.session_id),
+        "drivers": [d.name for d in heat.drivers],
+        "laps": [str(label) for label in heat.laps.lap_labels],
+        "times": _nan_to_none(heat.lap_times[:, :n]),
+        "positions": heat.lap_positions[:, :n].tolist(),
+        "gaps": _nan_to_none(heat.lap_gaps[:, :n]),
+    }
+
+
+class _Entry:
+    __slots__ = ("heat", "loaded_at", "bodies", "png")
+
+    def __init__(self, heat, loaded_at: float) -> None:
+        self.heat = heat
+        self.loaded_at = loaded_at
+        # готовые тела ответов: вид -> bytes
+        self.bodies = {}
+        self.png = None
+
+
+def _default_loader(track: str, session_id: str):
+    from Data_Classes.heat_fetch import fetch_heat
+
+    return fetch_heat(track, session_id)
+
+
+class HeatService:
+    """
+    :param max_heats: сколько разобранных заездов держать в памяти
+    :param max_age: через сколько секунд запись перезагружается (None — никогда)
+    :param loader: функция (track, session_id) -> Heat, по умолчанию загрузка с сайта
+    :param render_backend: бэкенд картинок, см. render.RENDER_BACKENDS
+    """
+
+    def __init__(
+        self,
+        max_heats: int = 256,
+        max_age: float = 30.0,
+        loader=None,
+        render_backend: str = "pillow",
+        workers: int = POOL_SIZE,
+        clock=time.monotonic,
+    ) -> None:
+        self.max_heats = max_heats
+        self.max_age = max_age
+        self.loader = loader or _default_loader
+        self.render_backend = render_backend
+        self.clock = clock
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "refreshes": 0,
+            "evictions": 0,
+            "loads": 0,
+            "errors": 0,
+        }
+        self.latency = HistogramSink()
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="heat-service")
+        self._server = None
+
+    # --- кэш ---
+
+    def _is_fresh(self, entry: _Entry) -> bool:
+        return self.max_age is None or self.clock() - entry.loaded_at < self.max_age
+
+    async def get_heat(self, track: str, session_id: str):
+        """Heat из кэша или одна общая загрузка на все одновременные запросы."""
+        validate_track(track)
+        key = (track, str(session_id))
+        entry = self._entries.get(key)
+        if entry is not None and self._is_fresh(entry):
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        self.stats["refreshes" if entry is not None else "misses"] += 1
+        loop = asyncio.get_running_loop()
+        pending = loop.create_future()
+        self._inflight[key] = pending
+        # загрузка не принадлежит запросу, который её начал: его отмена не
+        # оставит ожидающих без ответа, а заезд всё равно попадёт в кэш
+        load = loop.run_in_executor(self._executor, self.loader, track, str(session_id))
+        load.add_done_callback(lambda done: self._loaded(key, done, pending))
+        return await asyncio.shield(pending)
+
+    def _loaded(self, key, done, pending) -> None:
+        del self._inflight[key]
+        if done.cancelled():
+            pending.cancel()
+            return
+        error = done.exception()
+        if error is not None:
+            self.stats["errors"] += 1
+            pending.set_exception(error)
+            # ожидающих может не остаться (запросы отменены): не ругаемся в лог
+            pending.exception()
+            return
+
+        self.stats["loads"] += 1
+        entry = _Entry(done.result(), self.clock())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_heats:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        pending.set_result(entry)
+
+    async def _png(self, entry: _Entry) -> bytes:
+        if entry.png is None:
+            entry.png = asyncio.get_running_loop().run_in_executor(
+                self._executor, self._render, entry.heat
+            )
+            entry.png.add_done_callback(lambda done: self._rendered(entry, done))
+        return await asyncio.shield(entry.png)
+
+    @staticmethod
+    def _rendered(entry: _Entry, done) -> None:
+        # неудачную отрисовку не кэшируем: следующий запрос попробует снова
+        if (done.cancelled() or done.exception() is not None) and entry.png is done:
+            entry.png = None
+
+    def _render(self, heat) -> bytes:
+        from render import render_results_image
+
+        full_data = heat.get_full_results()
+        if not full_data:
+            raise ValueError("Нет данных кругов для генерации изображения")
+        buffer = io.BytesIO()
+        render_results_image(full_data, buffer, backend=self.render_backend)
+        return buffer.getvalue()
+
+    def cache_stats(self):
+        # объединённый запрос тоже не стоил отдельной загрузки
+        served = self.stats["hits"] + self.stats["coalesced"]
+        lookups = served + self.stats["misses"] + self.stats["refreshes"]
+        return dict(
+            self.stats,
+            size=len(self._entries),
+            max_heats=self.max_heats,
+            inflight=len(self._inflight),
+            hit_ratio=served / lookups if lookups else 0.0,
+        )
+
+    # --- HTTP ---
+
+    async def handle(self, method: str, target: str):
+        """Обрабатывает запрос; возвращает (status, content_type, body)."""
+        if method not in ("GET", "HEAD"):
+            return 405, "application/json", _json_body({"error": "method not allowed"})
+
+        path = urlsplit(target).path
+        if path == "/stats":
+            return 200, "application/json", _json_body(
+                {"cache": self.cache_stats(), "requests": self.latency.summary()}
+            )
+
+        match = _ROUTE_RE.match(path)
+        if match is None:
+            return 404, "application/json", _json_body({"error": "not found"})
+        track, session_id, kind = match.group(1), match.group(2), match.group(3)
+        try:
+            validate_track(track)
+        except ValueError as e:
+            return 400, "application/json", _json_body({"error": str(e)})
+
+        try:
+            entry = await self.get_heat(track, session_id)
+        except ValueError as e:
+            # fetch_heat: на странице нет таблицы результатов
+            return 404, "application/json", _json_body({"error": str(e)})
+        except Exception as e:
+            return 502, "application/json", _json_body({"error": f"{type(e).__name__}: {e}"})
+
+        if kind == ".png":
+            try:
+                return 200, "image/png", await self._png(entry)
+            except ValueError as e:
+                return 404, "application/json", _json_body({"error": str(e)})
+            except Exception as e:
+                return 500, "application/json", _json_body({"error": f"{type(e).__name__}: {e}"})
+
+        name = "laps" if kind == "/laps" else "heat"
+        body = entry.bodies.get(name)
+        if body is None:
+            data = laps_to_json(entry.heat) if name == "laps" else heat_to_json(entry.heat)
+            body = entry.bodies[name] = _json_body(data)
+        return 200, "application/json", body
+
+    async def _handle_connection(self, reader, writer) -> None:
+        try:
+            while True:
+                try:
+                    request_line, headers = await _read_request(reader)
+                except (asyncio.LimitOverrunError, ValueError):
+                    # строка длиннее лимита StreamReader: отвечаем 400 и закрываем соединение
+                    request_line, headers = None, {"connection": "close"}
+                if request_line is not None and not request_line.strip():
+                    break
+
+                start = time.perf_counter()
+                parts = request_line.decode("latin-1").split() if request_line else []
+                if len(parts) != 3:
+                    status, content_type, body = 400, "application/json", _json_body({"error": "bad request"})
+                    method, route = "", "invalid"
+                else:
+                    method, target, _ = parts
+                    route = _route_name(target)
+                    try:
+                        status, content_type, body = await self.handle(method, target)
+                    except Exception as e:
+                        status, content_type = 500, "application/json"
+                        body = _json_body({"error": f"{type(e).__name__}: {e}"})
+
+                keep_alive = headers.get("connection", "").lower() != "close" and parts[-1:] == ["HTTP/1.1"]
+                head = (
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                )
+                writer.write(head.encode("latin-1"))
+                if method != "HEAD":
+                    writer.write(body)
+                await writer.drain()
+                self.latency.record(
+                    "service.request",
+                    time.perf_counter() - start,
+                    bytes=len(body),
+                    count=1,
+                    labels={"route": route},
+                    error=status >= 500,
+                )
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self._executor.shutdown(wait=False)
+
+
+async def _read_request(reader):
+    """Строка запроса и заголовки (имена в нижнем регистре)."""
+    request_line = await reader.readline()
+    headers = {}
+    if not request_line.strip():
+        return request_line, headers
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return request_line, headers
+
+
+def _route_name(target: str) -> str:
+    path = urlsplit(target).path
+    if path == "/stats":
+        return "stats"
+    match = _ROUTE_RE.match(path)
+    if match is None:
+        return "other"
+    return {None: "heat", "/laps": "laps", ".png": "png"}[match.group(3)]
+
+
+def _json_body(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+        if isinstance(value, float) and math.isnan(value):
+            return None
+        return value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-heats", type=int, default=256)
+    parser.add_argument("--max-age", type=float, default=30.0, help="секунд до перезагрузки заезда")
+    parser.add_argument("--cache-dir", help="каталог PageCache для условных запросов к сайту")
+    parser.add_argument("--backend", default="pillow", help="бэкенд картинок: pillow или matplotlib")
+    args = parser.parse_args()
+
+    if args.cache_dir:
+        from page_cache import PageCache
+        from Parse_data import set_page_cache
+
+        set_page_cache(PageCache(args.cache_dir))
+
+    service = HeatService(max_heats=args.max_heats, max_age=args.max_age, render_backend=args.backend)
+    print(f"Сервис заездов: http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""
+Замеры стадий обработки заезда: загрузка, разбор, сборка Heat, сохранение,
+чтение и отрисовка.
+
+    from instrumentation import HistogramSink, set_sink
+    sink = HistogramSink()
+    set_sink(sink)
+    ...
+    print(sink.summary())
+
+Пока приёмник не задан, stage() возвращает общий пустой контекст, и
+замеры почти ничего не стоят.
+"""
+import bisect
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+_sink = None
+
+
+def set_sink(sink) -> None:
+    """Включает замеры (любой объект с методом record) или отключает их (None)."""
+    global _sink
+    _sink = sink
+
+
+def get_sink():
+    return _sink
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add(self, bytes: int = 0, count: int = 0) -> None:
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("sink", "name", "labels", "bytes", "count", "_start")
+
+    def __init__(self, sink, name: str, labels: dict) -> None:
+        self.sink = sink
+        self.name = name
+        self.labels = labels
+        self.bytes = 0
+        self.count = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        try:
+            self.sink.record(
+                self.name,
+                duration,
+                bytes=self.bytes,
+                count=self.count,
+                labels=self.labels,
+                error=exc_type is not None,
+            )
+        except Exception as e:
+            # сбой приёмника (диск, права) не должен ронять саму загрузку или разбор
+            print(f"Ошибка записи замера {self.name}: {e}", file=sys.stderr)
+        return False
+
+    def add(self, bytes: int = 0, count: int = 0) -> None:
+        self.bytes += bytes
+        self.count += count
+
+
+def stage(name: str, **labels):
+    """Контекст замера стадии; внутри можно вызвать .add(bytes=..., count=...)."""
+    sink = _sink
+    if sink is None:
+        return _NULL_STAGE
+    return _Stage(sink, name, labels)
+
+
+# границы корзин гистограмм длительности, секунды
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "count", "total", "bytes", "items", "errors")
+
+    def __init__(self, buckets) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.bytes = 0
+        self.items = 0
+        self.errors = 0
+
+    def observe(self, duration: float, bytes: int, count: int, error: bool) -> None:
+        self.counts[bisect.bisect_left(self.buckets, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.bytes += bytes
+        self.items += count
+        self.errors += int(error)
+
+    def quantile(self, q: float) -> float:
+        """Оценка квантиля по корзинам (верхняя граница корзины)."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for i, n in enumerate(self.counts):
+            running += n
+            if running >= target:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class HistogramSink:
+    """Гистограммы длительностей в памяти, по стадии и набору меток."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, duration, bytes=0, count=0, labels=None, error=False) -> None:
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(duration, bytes, count, error)
+
+    def histograms(self):
+        with self._lock:
+            return dict(self._histograms)
+
+    def summary(self):
+        """Список словарей по стадиям: count, total, mean, p50, p95, bytes, items, errors."""
+        rows = []
+        for (name, labels), h in sorted(self.histograms().items()):
+            rows.append({
+                "stage": name,
+                "labels": dict(labels),
+                "count": h.count,
+                "total": h.total,
+                "mean": h.total / h.count if h.count else 0.0,
+                "p50": h.quantile(0.5),
+                "p95": h.quantile(0.95),
+                "bytes": h.bytes,
+                "items": h.items,
+                "errors": h.errors,
+            })
+        return rows
+
+
+class JsonLinesSink:
+    """Пишет каждый замер строкой JSON в файл."""
+
+    def __init__(self, path: str) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, name, duration, bytes=0, count=0, labels=None, error=False) -> None:
+        line = json.dumps({
+            "ts": time.time(),
+            "stage": name,
+            "duration": duration,
+            "bytes": bytes,
+            "count": count,
+            "labels": labels or {},
+            "error": error,
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusTextfileSink(HistogramSink):
+    """
+    Гистограммы в формате textfile-коллектора Prometheus (node_exporter).
+    Файл перезаписывается атомарно вызовом write() или не чаще, чем раз
+    в interval секунд при записи замеров; одновременно пишет один поток.
+    """
+
+    def __init__(self, path: str, prefix: str = "kart_stage", interval: float = 10.0, buckets=DEFAULT_BUCKETS):
+        super().__init__(buckets)
+        self.path = path
+        self.prefix = prefix
+        self.interval = interval
+        self._written = 0.0
+        self._write_lock = threading.Lock()
+
+    def record(self, name, duration, bytes=0, count=0, labels=None, error=False) -> None:
+        super().record(name, duration, bytes=bytes, count=count, labels=labels, error=error)
+        if time.monotonic() - self._written < self.interval:
+            return
+        # файл уже пишет другой поток — этот замер попадёт в следующую запись
+        if not self._write_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._written >= self.interval:
+                self._write()
+        finally:
+            self._write_lock.release()
+
+    @staticmethod
+    def _escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    @classmethod
+    def _labels(cls, stage_name, labels, extra=None):
+        items = [("stage", stage_name)] + list(labels) + list((extra or {}).items())
+        return "{" + ",".join(f'{k}="{cls._escape(v)}"' for k, v in items) + "}"
+
+    def render(self) -> str:
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_duration_seconds Длительность стадии обработки заезда.",
+            f"# TYPE {p}_duration_seconds histogram",
+        ]
+        totals = []
+        for (name, labels), h in sorted(self.histograms().items()):
+            running = 0
+            for bound, n in zip(self.buckets, h.counts):
+                running += n
+                lines.append(f"{p}_duration_seconds_bucket{self._labels(name, labels, {'le': bound})} {running}")
+            lines.append(f"{p}_duration_seconds_bucket{self._labels(name, labels, {'le': '+Inf'})} {h.count}")
+            lines.append(f"{p}_duration_seconds_sum{self._labels(name, labels)} {h.total}")
+            lines.append(f"{p}_duration_seconds_count{self._labels(name, labels)} {h.count}")
+            totals.append((name, labels, h))
+
+        for metric, attr, help_text in (
+            ("bytes_total", "bytes", "Обработано байт."),
+            ("items_total", "items", "Обработано элементов (строк, ячеек)."),
+            ("errors_total", "errors", "Стадии, завершившиеся исключением."),
+        ):
+            lines.append(f"# HELP {p}_{metric} {help_text}")
+            lines.append(f"# TYPE {p}_{metric} counter")
+            for name, labels, h in totals:
+                lines.append(f"{p}_{metric}{self._labels(name, labels)} {getattr(h, attr)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self) -> None:
+        with self._write_lock:
+            self._write()
+
+    def _write(self) -> None:
+        text = self.render()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory or ".", prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        try:
+            with open(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        self._written = time.monotonic()
+
+
+class MultiSink:
+    """Передаёт замеры нескольким приёмникам."""
+
+    def __init__(self, *sinks) -> None:
+        self.sinks = sinks
+
+    def record(self, name, duration, bytes=0, count=0, labels=None, error=False) -> None:
+        for sink in self.sinks:
+            sink.record(name, duration, bytes=bytes, count=count, labels=labels, error=error)
@@ -1,12 +1,120 @@
 import os
-from Data_Classes.heat import Heat
+import re
+
+# heat_{track}_{session_id}.json / .kheat
+HEAT_FILE_RE = re.compile(r"^heat_([a-z]+)_(.+)\.(json|kheat)$")
+
+
+def session_order(session_id):
+    """Ключ сортировки номеров заездов: числовые по значению, остальные после них."""
+    session_id = str(session_id)
+    return (0, int(session_id), "") if session_id.isdigit() else (1, 0, session_id)
+
+
+def select_heat_files(paths):
+    """
+    Файлы заездов из путей: {(track, session_id): путь}. Если есть обе копии
+    заезда, берётся .kheat (читается быстрее), но не старше своего .json —
+    такой .kheat ещё не переконвертирован. Прочие имена пропускаются.
+    """
+    files = {}
+    for path in paths:
+        match = HEAT_FILE_RE.match(os.path.basename(path))
+        if match is None:
+            continue
+        key = (match.group(1), match.group(2))
+        current = files.get(key)
+        if current is None or _preferred(path, current):
+            files[key] = path
+    return files
+
+
+def _preferred(path: str, current: str) -> bool:
+    if path.endswith(".kheat") == current.endswith(".kheat"):
+        return path < current
+    kheat, json_path = (path, current) if path.endswith(".kheat") else (current, path)
+    chosen = kheat if os.stat(kheat).st_mtime_ns >= os.stat(json_path).st_mtime_ns else json_path
+    return chosen == path
+
+
+def iter_heat_files(directory: str = "heats_data", tracks=None):
+    """
+    (track, session_id, путь) для файлов заездов каталога в порядке трека и
+    номера, по одному файлу на заезд (см. select_heat_files). tracks
+    ограничивает треки без открытия файлов.
+    """
+    files = select_heat_files(os.path.join(directory, name) for name in os.listdir(directory))
+    for track, session_id in sorted(files, key=lambda key: (key[0], session_order(key[1]))):
+        if tracks is None or track in tracks:
+            yield track, session_id, files[(track, session_id)]
+
+
+def heat_filename(session_id: str, track: str = "narvskaya") -> str:
+    return f"heats_data/heat_{track}_{session_id}.json"
 
 
 def import_heat_data(session_id: str, track: str = "narvskaya"):
+    from Data_Classes.heat import Heat
+
     os.makedirs("heats_data", exist_ok=True)
-    filename = f"heats_data/heat_{track}_{session_id}.json"
+    filename = heat_filename(session_id, track)
 
     heat = Heat(session_id, track=track)
     heat.save(filename)
 
     return filename
+
+
+def import_heats_data(heats, max_workers: int = 8):
+    """
+    Пакетная загрузка заездов [(track, session_id), ...].
+    Отдаёт (track, session_id, filename, error) по мере готовности.
+    """
+    from Data_Classes.heat import Heat
+
+    os.makedirs("heats_data", exist_ok=True)
+
+    for result in Heat.fetch_many(heats, max_workers=max_workers):
+        if not result.ok:
+            yield result.track, result.session_id, None, result.error
+            continue
+        filename = heat_filename(result.session_id, result.track)
+        result.heat.save(filename)
+        yield result.track, result.session_id, filename, None
+
+
+def convert_archive(src_dir: str = "heats_data", dst_dir: str = None, extension: str = ".kheat"):
+    """
+    Конвертирует все heat_*.json из src_dir в формат с расширением extension.
+    Уже сконвертированные файлы, которые новее исходника, пропускаются.
+    Возвращает список путей к новым файлам.
+    """
+    from Data_Classes.heat import Heat
+
+    dst_dir = dst_dir or src_dir
+    os.makedirs(dst_dir, exist_ok=True)
+
+    converted = []
+    for name in sorted(os.listdir(src_dir)):
+        if not (name.startswith("heat_") and name.endswith(".json")):
+            continue
+        src = os.path.join(src_dir, name)
+        dst = os.path.join(dst_dir, name[: -len(".json")] + extension)
+        if os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            continue
+        Heat.load(src).save(dst)
+        converted.append(dst)
+    return converted
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Конвертация архива заездов")
+    parser.add_argument("src", nargs="?", default="heats_data")
+    parser.add_argument("--dst", default=None)
+    parser.add_argument("--format", default=".kheat", help="расширение: .kheat или .json")
+    args = parser.parse_args()
+
+    files = convert_archive(args.src, args.dst, args.format)
+    print(f"Сконвертировано файлов: {len(files)}")
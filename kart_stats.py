@@ -0,0 +1,237 @@
+"""
+Рейтинг картов по трекам на основе кругов из архива заездов.
+
+Для каждого трека и карта хранятся гистограммы времени круга и «поправки
+на пилота» (круг минус обычный темп этого пилота на треке) с шагом
+bin_width. Обычный темп — экспоненциальное среднее медиан пилота по его
+прошлым заездам (а не медиана его кругов в том же заезде: она вычла бы и
+вклад карта). У пилота без прошлых заездов на треке вместо темпа берётся
+медиана всего заезда, то есть его круги идут без поправки на пилота.
+
+Новые заезды добавляются в гистограммы без пересчёта архива; старые
+данные затухают с периодом полураспада. Время заезда на странице не
+указано, а heat.fetched_at — момент загрузки страницы: у архива, скачанного
+разом краулером, он почти одинаков для всех заездов, и затухание по нему не
+работает. Поэтому затухать можно по порядку заездов (half_life_heats, шкала —
+session_id трека) или по времени, переданному в add_heat(when=...).
+Затухают гистограммы и число заездов карта; лучший круг — рекорд карта за
+всё время. Перцентили считаются по гистограммам сразу для всех картов.
+"""
+import math
+import time
+
+import numpy as np
+
+from driver_names import normalize_driver_name
+
+DAY = 24 * 60 * 60
+
+
+class _TrackStats:
+    """Накопленные гистограммы одного трека: строка на карт."""
+
+    def __init__(self, n_time_bins: int, n_residual_bins: int) -> None:
+        self.kart_rows = {}
+        self.kart_ids = []
+        self.time_hist = np.zeros((0, n_time_bins))
+        self.residual_hist = np.zeros((0, n_residual_bins))
+        self.best = np.zeros(0)
+        # взвешенное число заездов, затухает вместе с гистограммами
+        self.heats = np.zeros(0)
+        self.ref_time = None
+        # нормализованное имя -> обычный темп пилота, секунды
+        self.driver_pace = {}
+
+    def rows_for(self, kart_ids):
+        rows = np.empty(len(kart_ids), dtype=np.intp)
+        for i, kart in enumerate(kart_ids):
+            row = self.kart_rows.get(kart)
+            if row is None:
+                row = self.kart_rows[kart] = len(self.kart_ids)
+                self.kart_ids.append(kart)
+            rows[i] = row
+
+        missing = len(self.kart_ids) - self.best.size
+        if missing > 0:
+            self.time_hist = np.vstack([self.time_hist, np.zeros((missing, self.time_hist.shape[1]))])
+            self.residual_hist = np.vstack(
+                [self.residual_hist, np.zeros((missing, self.residual_hist.shape[1]))]
+            )
+            self.best = np.concatenate([self.best, np.full(missing, np.inf)])
+            self.heats = np.concatenate([self.heats, np.zeros(missing)])
+        return rows
+
+    def decay_to(self, when: float, half_life: float) -> float:
+        """Сдвигает опорное время на when; возвращает вес данных с моментом when."""
+        if self.ref_time is None:
+            self.ref_time = when
+            return 1.0
+        if when > self.ref_time:
+            factor = 0.5 ** ((when - self.ref_time) / half_life)
+            self.time_hist *= factor
+            self.residual_hist *= factor
+            self.heats *= factor
+            self.ref_time = when
+            return 1.0
+        return 0.5 ** ((self.ref_time - when) / half_life)
+
+
+class KartRanking:
+    """
+    Инкрементальная статистика картов по трекам.
+
+    :param half_life_days: период полураспада веса круга по времени заезда
+        (None — без затухания); время берётся из add_heat(when=...), иначе
+        heat.fetched_at, то есть момент загрузки страницы
+    :param half_life_heats: период полураспада в номерах заездов трека; если
+        задан, затухание идёт по session_id, а half_life_days не используется
+    :param bin_width: шаг гистограмм в секундах
+    :param lap_range: допустимый диапазон времени круга, секунды
+    :param residual_range: диапазон поправки на пилота, секунды
+    :param outlier_factor: круг медленнее медианы пилота в столько раз
+        считается трафиком/разворотом и отбрасывается
+    :param pace_alpha: вес нового заезда в обычном темпе пилота
+    """
+
+    def __init__(
+        self,
+        half_life_days: float = 14.0,
+        bin_width: float = 0.01,
+        lap_range=(15.0, 120.0),
+        residual_range=(-5.0, 10.0),
+        outlier_factor: float = 1.15,
+        pace_alpha: float = 0.3,
+        half_life_heats: float = None,
+    ) -> None:
+        self.by_session = half_life_heats is not None
+        if self.by_session:
+            self.half_life = half_life_heats
+        else:
+            self.half_life = half_life_days * DAY if half_life_days else math.inf
+        self.bin_width = bin_width
+        self.lap_range = lap_range
+        self.residual_range = residual_range
+        self.outlier_factor = outlier_factor
+        self.pace_alpha = pace_alpha
+        self._n_time_bins = int(round((lap_range[1] - lap_range[0]) / bin_width)) + 1
+        self._n_residual_bins = int(round((residual_range[1] - residual_range[0]) / bin_width)) + 1
+        self._tracks = {}
+        # уже учтённые заезды "track/session_id"
+        self.processed = set()
+
+    @property
+    def tracks(self):
+        return sorted(self._tracks)
+
+    def _bins(self, values, low: float, n_bins: int):
+        idx = np.floor((values - low) / self.bin_width).astype(np.intp)
+        return np.clip(idx, 0, n_bins - 1)
+
+    def add_heat(self, heat, when: float = None) -> int:
+        """
+        Добавляет круги заезда. when — момент заезда: номер заезда при
+        half_life_heats (по умолчанию session_id), иначе unix time (по
+        умолчанию heat.fetched_at — время загрузки, а не заезда — или текущее
+        время). Возвращает число учтённых кругов; повторно тот же заезд не
+        учитывается.
+        """
+        key = f"{heat.track}/{heat.session_id}"
+        if key in self.processed or not heat.drivers or not heat.lap_count:
+            return 0
+        if when is None and self.by_session:
+            session_id = str(heat.session_id)
+            if not session_id.isdigit():
+                raise ValueError(f"Нечисловой session_id '{session_id}': передайте when явно")
+            when = int(session_id)
+        elif when is None:
+            when = heat.fetched_at if heat.fetched_at is not None else time.time()
+
+        n = len(heat.drivers)
+        times = np.asarray(heat.lap_times[:, :n], dtype=np.float64)
+        valid = ~np.isnan(times)
+        valid &= (times >= self.lap_range[0]) & (times <= self.lap_range[1])
+        masked = np.where(valid, times, np.nan)
+        with np.errstate(all="ignore"):
+            median = np.nanmedian(masked, axis=0) if valid.any() else np.full(n, np.nan)
+        valid &= masked <= median * self.outlier_factor
+        if not valid.any():
+            return 0
+        self.processed.add(key)
+
+        stats = self._tracks.get(heat.track)
+        if stats is None:
+            stats = self._tracks[heat.track] = _TrackStats(self._n_time_bins, self._n_residual_bins)
+
+        weight = stats.decay_to(when, self.half_life)
+        driver_rows = stats.rows_for([d.kart_id for d in heat.drivers])
+
+        # обычный темп пилотов до этого заезда; новичкам — медиана заезда
+        names = [normalize_driver_name(d.name) for d in heat.drivers]
+        field = float(np.nanmedian(median))
+        pace = np.array([stats.driver_pace.get(name, field) for name in names])
+        for name, heat_median in zip(names, median):
+            if np.isnan(heat_median):
+                continue
+            previous = stats.driver_pace.get(name)
+            stats.driver_pace[name] = (
+                heat_median if previous is None
+                else previous + self.pace_alpha * (heat_median - previous)
+            )
+
+        lap_idx, col_idx = np.nonzero(valid)
+        lap_values = times[lap_idx, col_idx]
+        residuals = lap_values - pace[col_idx]
+        rows = driver_rows[col_idx]
+
+        np.add.at(
+            stats.time_hist,
+            (rows, self._bins(lap_values, self.lap_range[0], self._n_time_bins)),
+            weight,
+        )
+        np.add.at(
+            stats.residual_hist,
+            (rows, self._bins(residuals, self.residual_range[0], self._n_residual_bins)),
+            weight,
+        )
+        np.minimum.at(stats.best, rows, lap_values)
+        stats.heats[np.unique(rows)] += weight
+        return int(lap_values.size)
+
+    def add_heats(self, heats) -> int:
+        return sum(self.add_heat(heat) for heat in heats)
+
+    def _percentiles(self, hist, low: float, qs):
+        totals = hist.sum(axis=1)
+        cumulative = np.cumsum(hist, axis=1)
+        result = np.empty((hist.shape[0], len(qs)))
+        for j, q in enumerate(qs):
+            idx = np.argmax(cumulative >= totals[:, None] * (q / 100.0), axis=1)
+            result[:, j] = low + (idx + 0.5) * self.bin_width
+        result[totals == 0] = np.nan
+        return result
+
+    def ranking(self, track: str, percentiles=(10, 50, 90), min_laps: float = 10.0):
+        """
+        Таблица картов трека, отсортированная по медианной поправке на пилота
+        (отрицательная — карт быстрее, чем обычно едут его пилоты).
+        Колонки: kart_id, heats и laps (взвешенные, с затуханием), best (за
+        всё время), p<q>..., median_delta.
+        """
+        import pandas as pd
+
+        stats = self._tracks.get(track)
+        columns = ["kart_id", "heats", "laps", "best"] + [f"p{q}" for q in percentiles] + ["median_delta"]
+        if stats is None or not stats.kart_ids:
+            return pd.DataFrame(columns=columns)
+
+        laps = stats.time_hist.sum(axis=1)
+        time_pct = self._percentiles(stats.time_hist, self.lap_range[0], percentiles)
+        median_delta = self._percentiles(stats.residual_hist, self.residual_range[0], (50,))[:, 0]
+
+        frame = pd.DataFrame({"kart_id": stats.kart_ids, "heats": stats.heats, "laps": laps, "best": stats.best})
+        for j, q in enumerate(percentiles):
+            frame[f"p{q}"] = time_pct[:, j]
+        frame["median_delta"] = median_delta
+
+        frame = frame[frame["laps"] >= min_laps]
+        return frame.sort_values(["median_delta", "best"]).reset_index(drop=True)
@@ -0,0 +1,233 @@
+"""
+Векторная аналитика кругов заезда: перцентили, разброс без выбросов,
+лучший отрезок из N кругов подряд, отставание от лидера по кругам и
+потери относительно теоретического лучшего.
+
+Функции работают с массивом времён формы (..., круги, пилоты): у одного
+заезда это heat.lap_times (L, D), у пачки — (H, L, D) из stack_lap_times,
+дополненный NaN. race_timeline восстанавливает по суммарному времени
+позиции и отставания на каждом круге для диаграммы хода гонки. Циклов
+по ячейкам нет, поэтому день на треке считается одним вызовом
+heat_summary(heats).
+
+Выбросы (трафик, развороты) определяются как в kart_stats: круг вне
+lap_range или медленнее медианы пилота в outlier_factor раз.
+"""
+import warnings
+
+import numpy as np
+
+LAP_RANGE = (15.0, 120.0)
+OUTLIER_FACTOR = 1.15
+PERCENTILES = (10, 50, 90)
+
+
+def stack_lap_times(heats):
+    """
+    Времена кругов пачки заездов одним массивом (H, L, D), где L и D —
+    максимум по пачке; отсутствующие круги и пилоты — NaN.
+    Возвращает (times, lap_counts, driver_counts).
+    """
+    heats = list(heats)
+    lap_counts = np.array([heat.lap_count for heat in heats], dtype=np.intp)
+    driver_counts = np.array([len(heat.drivers) for heat in heats], dtype=np.intp)
+    n_laps = int(lap_counts.max()) if heats else 0
+    n_drivers = int(driver_counts.max()) if heats else 0
+
+    times = np.full((len(heats), n_laps, n_drivers), np.nan)
+    for i, heat in enumerate(heats):
+        times[i, : lap_counts[i], : driver_counts[i]] = heat.lap_times[:, : driver_counts[i]]
+    return times, lap_counts, driver_counts
+
+
+def _nan_reduce(func, values, *args, **kwargs):
+    # nan-редукции по пустым срезам (дополнение пачки) дают NaN и предупреждение
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return func(values, *args, **kwargs)
+
+
+def nan_percentiles(values, percentiles):
+    """
+    Перцентили по оси кругов с пропуском NaN (линейная интерполяция, как у
+    np.nanpercentile): форма (..., D, len(percentiles)). np.nanpercentile
+    обходит каждый срез в Python-цикле, здесь — одна сортировка всего массива.
+    """
+    ordered = np.sort(np.asarray(values, dtype=np.float64), axis=-2)  # NaN уходят в конец
+    counts = np.sum(~np.isnan(ordered), axis=-2)
+    positions = (np.maximum(counts, 1) - 1)[..., None] * (np.asarray(percentiles, dtype=np.float64) / 100.0)
+    lower = np.floor(positions).astype(np.intp)
+    upper = np.minimum(lower + 1, np.maximum(counts, 1)[..., None] - 1)
+    weight = positions - lower
+
+    by_driver = np.swapaxes(ordered, -1, -2)  # (..., D, L)
+    low_values = np.take_along_axis(by_driver, lower, axis=-1)
+    high_values = np.take_along_axis(by_driver, upper, axis=-1)
+    result = low_values + (high_values - low_values) * weight
+    result[counts == 0] = np.nan
+    return result
+
+
+def clean_lap_mask(times, lap_range=LAP_RANGE, outlier_factor: float = OUTLIER_FACTOR):
+    """Маска «чистых» кругов той же формы, что times."""
+    times = np.asarray(times, dtype=np.float64)
+    valid = ~np.isnan(times)
+    valid &= (times >= lap_range[0]) & (times <= lap_range[1])
+    masked = np.where(valid, times, np.nan)
+    median = nan_percentiles(masked, (50,))[..., 0][..., None, :]
+    with np.errstate(invalid="ignore"):
+        return valid & (masked <= median * outlier_factor)
+
+
+def _clean(times, clean: bool, **mask_kw):
+    times = np.asarray(times, dtype=np.float64)
+    if not clean:
+        return times
+    return np.where(clean_lap_mask(times, **mask_kw), times, np.nan)
+
+
+def lap_percentiles(times, percentiles=PERCENTILES, clean: bool = True, **mask_kw):
+    """Перцентили времени круга по пилотам: форма (..., D, len(percentiles))."""
+    return nan_percentiles(_clean(times, clean, **mask_kw), percentiles)
+
+
+def clean_stdev(times, **mask_kw):
+    """Стандартное отклонение круга по пилотам без выбросов: (..., D)."""
+    values = _clean(times, True, **mask_kw)
+    return _nan_reduce(np.nanstd, values, axis=-2)
+
+
+def rolling_best(times, n: int = 5):
+    """
+    Лучшее среднее время N кругов подряд для каждого пилота: (..., D).
+    Окна с пропущенными кругами не учитываются; выбросы учитываются —
+    отрезок должен быть проехан целиком.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if n < 1:
+        raise ValueError("n должно быть >= 1")
+    if times.shape[-2] < n:
+        return np.full(times.shape[:-2] + times.shape[-1:], np.nan)
+    windows = np.lib.stride_tricks.sliding_window_view(times, n, axis=-2)
+    return np.fmin.reduce(windows.mean(axis=-1), axis=-2, initial=np.nan)
+
+
+def cumulative_times(times):
+    """Суммарное время к концу каждого круга; после пропуска — NaN."""
+    return np.cumsum(np.asarray(times, dtype=np.float64), axis=-2)
+
+
+def gap_to_leader(times):
+    """
+    Отставание от лидера по суммарному времени после каждого круга:
+    (..., L, D). Пилоты сравниваются на одинаковом числе кругов.
+    """
+    cumulative = cumulative_times(times)
+    leader = np.fmin.reduce(cumulative, axis=-1, keepdims=True, initial=np.nan)
+    return cumulative - leader
+
+
+def race_positions(times):
+    """
+    Позиции в гонке после каждого круга, восстановленные по суммарному
+    времени: (..., L, D), int16, 0 — круг не проехан. На круге l ранжируются
+    только пилоты, проехавшие l кругов, поэтому круговые и сошедшие пилоты
+    оказываются позади без отдельной обработки.
+    """
+    cumulative = cumulative_times(times)
+    order = np.argsort(cumulative, axis=-1, kind="stable")  # NaN уходят в конец
+    ranks = np.empty(order.shape, dtype=np.int16)
+    np.put_along_axis(ranks, order, np.arange(1, order.shape[-1] + 1, dtype=np.int16), axis=-1)
+    ranks[np.isnan(cumulative)] = 0
+    return ranks
+
+
+def race_timeline(times):
+    """
+    Ход гонки одним проходом: (positions, gaps) формы (..., L, D) —
+    позиция и отставание от лидера после каждого круга. Подходит и для
+    пачки заездов из stack_lap_times.
+    """
+    return race_positions(times), gap_to_leader(times)
+
+
+def theoretical_best(times):
+    """
+    Теоретически лучшее время пилота: его лучший круг, повторённый на каждом
+    проеханном круге (секторов на сайте нет). Возвращает (best, theoretical,
+    lost) формы (..., D): lost — потери фактического времени относительно
+    теоретического.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    laps = np.sum(~np.isnan(times), axis=-2)
+    best = np.fmin.reduce(times, axis=-2, initial=np.nan)
+    theoretical = best * laps
+    total = np.where(laps > 0, np.nansum(times, axis=-2), np.nan)
+    return best, theoretical, total - theoretical
+
+
+def last_values(values, lap_counts_per_driver):
+    """Значение на последнем проеханном круге каждого пилота: (..., D)."""
+    idx = np.maximum(lap_counts_per_driver - 1, 0)[..., None, :]
+    picked = np.take_along_axis(values, idx, axis=-2)[..., 0, :]
+    return np.where(lap_counts_per_driver > 0, picked, np.nan)
+
+
+def heat_summary(heats, percentiles=PERCENTILES, best_of: int = 5, **mask_kw):
+    """
+    Сводка по пилотам для одного заезда или пачки заездов — DataFrame
+    с колонками track, session_id, place, driver, kart_id, laps, best, mean,
+    p<q>..., stdev, outliers, best_<N>, theoretical, lost, gap.
+    mean, p<q> и stdev считаются по чистым кругам; заезды без кругов пропускаются.
+    """
+    import pandas as pd
+
+    if hasattr(heats, "lap_times"):
+        heats = [heats]
+    heats = list(heats)
+
+    columns = (
+        ["track", "session_id", "place", "driver", "kart_id", "laps", "best", "mean"]
+        + [f"p{q}" for q in percentiles]
+        + ["stdev", "outliers", f"best_{best_of}", "theoretical", "lost", "gap"]
+    )
+    heats = [heat for heat in heats if heat.drivers and heat.lap_count]
+    if not heats:
+        return pd.DataFrame(columns=columns)
+
+    times, _, driver_counts = stack_lap_times(heats)
+    present = ~np.isnan(times)
+    clean = clean_lap_mask(times, **mask_kw)
+    clean_times = np.where(clean, times, np.nan)
+
+    laps = present.sum(axis=-2)
+    mean = _nan_reduce(np.nanmean, clean_times, axis=-2)
+    pct = lap_percentiles(clean_times, percentiles, clean=False)
+    stdev = clean_stdev(times, **mask_kw)
+    outliers = (present & ~clean).sum(axis=-2)
+    stint = rolling_best(times, best_of)
+    best, theoretical, lost = theoretical_best(times)
+    gap = last_values(gap_to_leader(times), laps)
+
+    heat_idx, col_idx = np.nonzero(np.arange(times.shape[-1])[None, :] < driver_counts[:, None])
+    frame = pd.DataFrame(
+        {
+            "track": [heats[h].track for h in heat_idx],
+            "session_id": [heats[h].session_id for h in heat_idx],
+            "place": [heats[h].drivers[c].place for h, c in zip(heat_idx, col_idx)],
+            "driver": [heats[h].drivers[c].name for h, c in zip(heat_idx, col_idx)],
+            "kart_id": [heats[h].drivers[c].kart_id for h, c in zip(heat_idx, col_idx)],
+            "laps": laps[heat_idx, col_idx],
+            "best": best[heat_idx, col_idx],
+            "mean": mean[heat_idx, col_idx],
+        }
+    )
+    for j, q in enumerate(percentiles):
+        frame[f"p{q}"] = pct[heat_idx, col_idx, j]
+    frame["stdev"] = stdev[heat_idx, col_idx]
+    frame["outliers"] = outliers[heat_idx, col_idx]
+    frame[f"best_{best_of}"] = stint[heat_idx, col_idx]
+    frame["theoretical"] = theoretical[heat_idx, col_idx]
+    frame["lost"] = lost[heat_idx, col_idx]
+    frame["gap"] = gap[heat_idx, col_idx]
+    return frame[columns]
@@ -1,6 +1,9 @@
 import os
 
+from archive_index import ArchiveIndex, set_archive_index
 from io_heat import import_heat_data
+from page_cache import PageCache
+from Parse_data import set_page_cache
 from Data_Classes.heat import Heat
 
 
@@ -49,7 +52,7 @@ def analyze_heat(session_id: str, track: str) -> Heat:
         return heat
 
     print(f"Успешно загружены данные заезда.")
-    print(f"Пилотов: {len(heat.drivers)}, кругов: {len(heat.df_laps)}\n")
+    print(f"Пилотов: {len(heat.drivers)}, кругов: {heat.lap_count}\n")
 
     return heat
 
@@ -65,7 +68,7 @@ def save_heat(heat: Heat) -> str:
 
 def maybe_print_results(heat: Heat) -> None:
     """По запросу пользователя выводит полные результаты."""
-    if not heat.drivers and heat.df_laps.empty:
+    if not heat.drivers and not heat.lap_count:
         return
 
     answer = input("\nПоказать полные результаты в консоли? (y/n): ").strip().lower()
@@ -98,6 +101,11 @@ def maybe_generate_image(heat: Heat) -> None:
 
 def interactive_session():
     """Основной цикл CLI."""
+    # повторный анализ завершённых заездов не ходит в сеть
+    set_page_cache(PageCache())
+    # сохранённые заезды попадают в индекс архива heats_data/archive.sqlite
+    set_archive_index(ArchiveIndex())
+
     while True:
         print("KartChrono — анализ заезда\n")
 
@@ -0,0 +1,204 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+DEFAULT_CACHE_DIR = "heats_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# заезд без изменений дольше этого срока считаем завершённым
+DEFAULT_FINISHED_AFTER = 15 * 60
+
+INDEX_FILE = "index.json"
+
+
+def _parse_http_date(value):
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+class PageCache:
+    """
+    Дисковый кэш HTML-страниц заездов, ключ — (track, session_id).
+
+    Завершённые заезды отдаются прямо с диска, «живые» перепроверяются
+    условным GET (ETag / Last-Modified). Размер ограничен max_bytes,
+    при переполнении вытесняются давно не использованные записи (LRU).
+    """
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        finished_after: float = DEFAULT_FINISHED_AFTER,
+    ) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.finished_after = finished_after
+        self.stats = {"hits": 0, "revalidated": 0, "misses": 0, "evictions": 0}
+        self._lock = threading.RLock()
+        # порядок ключей = порядок использования (последний — самый свежий)
+        self._entries = OrderedDict()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    # --- служебное ---
+
+    @staticmethod
+    def _key(track: str, session_id) -> str:
+        return f"{track}/{session_id}"
+
+    def _path(self, key: str) -> str:
+        safe = re.sub(r"[^\w.-]", "_", key)
+        return os.path.join(self.directory, f"{safe}.html")
+
+    def _load_index(self) -> None:
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, entry in items:
+            if os.path.exists(self._path(key)):
+                self._entries[key] = entry
+
+    def _save_index(self) -> None:
+        path = os.path.join(self.directory, INDEX_FILE)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(self._entries.items()), f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def _evict(self) -> None:
+        total = self.total_bytes
+        while total > self.max_bytes and len(self._entries) > 1:
+            key, entry = self._entries.popitem(last=False)
+            total -= entry["size"]
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self.stats["evictions"] += 1
+
+    # --- публичный API ---
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(e["size"] for e in self._entries.values())
+
+    @property
+    def hit_ratio(self) -> float:
+        served = self.stats["hits"] + self.stats["revalidated"]
+        total = served + self.stats["misses"]
+        return served / total if total else 0.0
+
+    def lookup(self, track: str, session_id):
+        """Возвращает метаданные записи или None."""
+        with self._lock:
+            entry = self._entries.get(self._key(track, session_id))
+            return dict(entry) if entry else None
+
+    def is_finished(self, track: str, session_id) -> bool:
+        entry = self.lookup(track, session_id)
+        return bool(entry and entry.get("finished"))
+
+    def conditional_headers(self, track: str, session_id) -> dict:
+        entry = self.lookup(track, session_id)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def read(self, track: str, session_id, count_hit: bool = True):
+        """Читает HTML из кэша (обновляя LRU) или возвращает None."""
+        key = self._key(track, session_id)
+        with self._lock:
+            if key not in self._entries:
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    html = f.read()
+            except OSError:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            if count_hit:
+                self.stats["hits"] += 1
+            return html
+
+    def store(
+        self,
+        track: str,
+        session_id,
+        html: str,
+        etag: str = None,
+        last_modified: str = None,
+    ) -> None:
+        """Сохраняет свежезагруженную страницу (ответ 200)."""
+        key = self._key(track, session_id)
+        now = time.time()
+        data = html.encode("utf-8")
+
+        with self._lock:
+            self.stats["misses"] += 1
+            previous = self._entries.get(key)
+            changed_at = now
+            if previous and previous["size"] == len(data):
+                old = self.read(track, session_id, count_hit=False)
+                if old == html:
+                    changed_at = previous["changed_at"]
+
+            with open(self._path(key), "wb") as f:
+                f.write(data)
+
+            modified_ts = _parse_http_date(last_modified)
+            stable_since = min(changed_at, modified_ts or changed_at)
+            self._entries[key] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "size": len(data),
+                "changed_at": changed_at,
+                "finished": now - stable_since >= self.finished_after,
+            }
+            self._entries.move_to_end(key)
+            self._evict()
+            self._save_index()
+
+    def mark_not_modified(self, track: str, session_id):
+        """Обрабатывает ответ 304: возвращает HTML из кэша."""
+        key = self._key(track, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            html = self.read(track, session_id, count_hit=False)
+            if html is None:
+                return None
+            self.stats["revalidated"] += 1
+            if time.time() - entry["changed_at"] >= self.finished_after:
+                entry["finished"] = True
+            self._save_index()
+            return html
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._save_index()
@@ -0,0 +1,425 @@
+"""
+Архив сырых страниц заездов для повторного разбора без сети.
+
+Каждая загруженная страница с таблицей .heat-result дописывается в конец
+pages.pack отдельным gzip-членом (в заголовке gzip — ключ track/session_id
+и время загрузки), а в pages.idx — запись фиксированного размера со
+смещением. Индекс читается через np.memmap и ищется бинарным поиском по
+отсортированным ключам; страница читается из mmap файла pack. Повторная
+загрузка неизменившейся страницы не пишется, изменившаяся дописывается
+новой версией — в индексе действует последняя.
+
+Включение при загрузке: Parse_data.set_page_pack(PagePack("heats_pack"))
+или crawler.py --pack heats_pack. После обновления парсера:
+
+    python page_pack.py reparse --pack heats_pack --out heats_data --processes 4
+"""
+import argparse
+import gzip
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+DEFAULT_PACK_DIR = "heats_pack"
+PACK_FILE = "pages.pack"
+INDEX_FILE = "pages.idx"
+
+INDEX_MAGIC = b"KPIDX\x00"
+INDEX_VERSION = 1
+_INDEX_PREFIX = struct.Struct("<6sH")
+KEY_SIZE = 32
+INDEX_DTYPE = np.dtype([
+    ("key", f"S{KEY_SIZE}"),
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("size", "<u4"),
+    ("crc", "<u4"),
+    ("fetched_at", "<f8"),
+])
+
+
+def _key(track: str, session_id) -> bytes:
+    key = f"{track}/{session_id}".encode("ascii")
+    if len(key) > KEY_SIZE:
+        raise ValueError(f"Слишком длинный ключ страницы: {key!r}")
+    return key
+
+
+def _split_key(key: bytes):
+    track, session_id = key.decode("ascii").split("/", 1)
+    return track, session_id
+
+
+def _compress(key: bytes, data: bytes, crc: int, fetched_at: float, level: int) -> bytes:
+    # заголовок собирается вручную: GzipFile оставляет в FNAME только basename
+    header = b"\x1f\x8b\x08\x08" + struct.pack("<I", int(fetched_at)) + b"\x00\xff" + key + b"\x00"
+    deflate = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    body = deflate.compress(data) + deflate.flush()
+    return header + body + struct.pack("<II", crc, len(data) & 0xFFFFFFFF)
+
+
+def _read_member(buf, pos: int):
+    """
+    Разбирает gzip-член по смещению pos: (ключ, смещение, длина, размер, crc,
+    mtime) или None, если член недописан или повреждён (не сходится CRC).
+    """
+    end = len(buf)
+    if pos + 10 > end or buf[pos:pos + 3] != b"\x1f\x8b\x08":
+        return None
+    flags = buf[pos + 3]
+    mtime = struct.unpack_from("<I", buf, pos + 4)[0]
+    p = pos + 10
+    if flags & 0x04:
+        if p + 2 > end:
+            return None
+        p += 2 + struct.unpack_from("<H", buf, p)[0]
+    name = b""
+    if flags & 0x08:
+        stop = buf.find(b"\x00", p)
+        if stop < 0:
+            return None
+        name, p = buf[p:stop], stop + 1
+    if flags & 0x10:
+        p = buf.find(b"\x00", p) + 1
+        if p == 0:
+            return None
+    if flags & 0x02:
+        p += 2
+
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS)
+    size, crc = 0, 0
+    try:
+        while not inflater.eof and p < end:
+            chunk = buf[p:p + 65536]
+            data = inflater.decompress(chunk)
+            size += len(data)
+            crc = zlib.crc32(data, crc)
+            p += len(chunk) - len(inflater.unused_data)
+    except zlib.error:
+        return None
+    if not inflater.eof or p + 8 > end:
+        return None
+    stored_crc, stored_size = struct.unpack_from("<II", buf, p)
+    if stored_crc != crc or stored_size != size & 0xFFFFFFFF:
+        return None
+    return name, pos, p + 8 - pos, size, crc, mtime
+
+
+def _scan_members(buf):
+    """
+    Обходит gzip-члены файла pack: (ключ, смещение, длина, размер, crc, mtime).
+    Недописанный или повреждённый член (обрыв записи) пропускается: обход
+    продолжается со следующего заголовка gzip, так что члены, дописанные
+    после обрыва, не теряются.
+    """
+    pos = 0
+    while pos < len(buf):
+        member = _read_member(buf, pos)
+        if member is None:
+            pos = buf.find(b"\x1f\x8b\x08", pos + 1)
+            if pos < 0:
+                return
+            continue
+        yield member
+        pos += member[2]
+
+
+class PagePack:
+    """
+    Дописываемый архив страниц: pages.pack (gzip-члены) + pages.idx (смещения).
+
+    Пишет один процесс (потокобезопасно), читать могут сколько угодно
+    процессов, в том числе во время записи.
+    """
+
+    def __init__(self, directory: str = DEFAULT_PACK_DIR, level: int = 6) -> None:
+        self.directory = directory
+        self.level = level
+        self.pack_path = os.path.join(directory, PACK_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.stats = {"stored": 0, "unchanged": 0}
+        self._lock = threading.RLock()
+        self._map = None
+
+        os.makedirs(directory, exist_ok=True)
+        if not os.path.exists(self.index_path):
+            with open(self.index_path, "wb") as f:
+                f.write(_INDEX_PREFIX.pack(INDEX_MAGIC, INDEX_VERSION))
+        open(self.pack_path, "ab").close()
+        self._load_index()
+
+    # --- индекс ---
+
+    def _load_index(self) -> None:
+        with open(self.index_path, "rb") as f:
+            magic, version = _INDEX_PREFIX.unpack(f.read(_INDEX_PREFIX.size))
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"Файл {self.index_path} не является индексом pack")
+        if version > INDEX_VERSION:
+            raise ValueError(f"Версия индекса {version} не поддерживается")
+
+        # хвост от оборванной записи не учитывается; отрезает его append
+        count = (os.path.getsize(self.index_path) - _INDEX_PREFIX.size) // INDEX_DTYPE.itemsize
+        if count:
+            records = np.memmap(self.index_path, dtype=INDEX_DTYPE, mode="r", offset=_INDEX_PREFIX.size, shape=(count,))
+        else:
+            records = np.zeros(0, dtype=INDEX_DTYPE)
+
+        # последняя версия каждого ключа: сортировка по (ключ, номер записи)
+        order = np.lexsort((np.arange(count), records["key"]))
+        keys = records["key"][order]
+        last = np.ones(count, dtype=bool)
+        last[:-1] = keys[1:] != keys[:-1]
+        self._records = records
+        self._keys = keys[last]
+        self._rows = order[last]
+        # записи, дописанные после открытия индекса
+        self._recent = {}
+
+    def _record(self, key: bytes):
+        record = self._recent.get(key)
+        if record is not None:
+            return record
+        i = np.searchsorted(self._keys, key)
+        if i < self._keys.size and self._keys[i] == key:
+            return self._records[self._rows[i]]
+        return None
+
+    def __len__(self) -> int:
+        return self._keys.size + sum(1 for key in self._recent if not self._in_loaded(key))
+
+    def _in_loaded(self, key: bytes) -> bool:
+        i = np.searchsorted(self._keys, key)
+        return bool(i < self._keys.size and self._keys[i] == key)
+
+    def __contains__(self, item) -> bool:
+        return self._record(_key(*item)) is not None
+
+    def keys(self):
+        """Все (track, session_id) архива в порядке ключей."""
+        with self._lock:
+            keys = set(self._keys.tolist()) | set(self._recent)
+        return [_split_key(key) for key in sorted(keys)]
+
+    def lookup(self, track: str, session_id):
+        """Метаданные последней версии страницы или None."""
+        with self._lock:
+            record = self._record(_key(track, session_id))
+        if record is None:
+            return None
+        return {
+            "offset": int(record["offset"]),
+            "length": int(record["length"]),
+            "size": int(record["size"]),
+            "crc": int(record["crc"]),
+            "fetched_at": float(record["fetched_at"]),
+        }
+
+    # --- чтение ---
+
+    def _view(self, end: int):
+        with self._lock:
+            if self._map is None or len(self._map) < end:
+                # прежнее отображение не закрывается: его может читать другой поток
+                with open(self.pack_path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return self._map
+
+    def read(self, track: str, session_id):
+        """HTML последней версии страницы или None."""
+        entry = self.lookup(track, session_id)
+        if entry is None:
+            return None
+        view = self._view(entry["offset"] + entry["length"])
+        data = gzip.decompress(view[entry["offset"]:entry["offset"] + entry["length"]])
+        return data.decode("utf-8")
+
+    # --- запись ---
+
+    def append(self, track: str, session_id, html: str, fetched_at: float = None) -> bool:
+        """
+        Дописывает страницу. Возвращает False, если последняя сохранённая
+        версия совпадает (размер и CRC32).
+        """
+        key = _key(track, session_id)
+        data = html.encode("utf-8")
+        crc = zlib.crc32(data)
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        compressed = _compress(key, data, crc, fetched_at, self.level)
+
+        with self._lock:
+            previous = self._record(key)
+            if previous is not None and int(previous["size"]) == len(data) and int(previous["crc"]) == crc:
+                self.stats["unchanged"] += 1
+                return False
+
+            # сначала данные, потом индекс: при обрыве запись восстановит rebuild_index
+            with open(self.pack_path, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(compressed)
+            record = np.array([(key, offset, len(compressed), len(data), crc, fetched_at)], dtype=INDEX_DTYPE)
+            with open(self.index_path, "ab") as f:
+                # хвост от оборванной записи отрезается, иначе новая запись
+                # и все следующие сдвинутся относительно сетки записей
+                size = f.seek(0, os.SEEK_END)
+                torn = (size - _INDEX_PREFIX.size) % INDEX_DTYPE.itemsize
+                if torn:
+                    f.truncate(size - torn)
+                f.write(record.tobytes())
+            self._recent[key] = record[0]
+            self.stats["stored"] += 1
+            return True
+
+    def rebuild_index(self) -> int:
+        """Пересобирает pages.idx по заголовкам gzip в pack; возвращает число записей."""
+        with self._lock:
+            self._close_map()
+            with open(self.pack_path, "rb") as f:
+                data = f.read()
+            records = np.array(list(_scan_members(data)), dtype=INDEX_DTYPE)
+            tmp = self.index_path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(_INDEX_PREFIX.pack(INDEX_MAGIC, INDEX_VERSION))
+                f.write(records.tobytes())
+            self._records = np.zeros(0, dtype=INDEX_DTYPE)
+            os.replace(tmp, self.index_path)
+            self._load_index()
+            return len(records)
+
+    def _close_map(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_map()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def total_bytes(self) -> int:
+        return os.path.getsize(self.pack_path)
+
+
+# --- повторный разбор ---
+
+_worker_packs = {}
+
+
+def _reparse_chunk(job):
+    """Разбирает пачку страниц из pack и сохраняет заезды (в пуле процессов)."""
+    directory, keys, out_dir, extension, backend = job
+    from Data_Classes.heat import Heat
+    from Parse_data import parse_race_page
+
+    # индекс загружается один раз на процесс, пока файл индекса не вырос
+    cache_key = (directory, os.path.getsize(os.path.join(directory, INDEX_FILE)))
+    pack = _worker_packs.get(cache_key)
+    if pack is None:
+        pack = _worker_packs[cache_key] = PagePack(directory)
+
+    written, errors = [], []
+    for track, session_id in keys:
+        try:
+            entry = pack.lookup(track, session_id)
+            rows = parse_race_page(pack.read(track, session_id), backend=backend)
+            if not rows:
+                raise ValueError("нет таблицы .heat-result")
+            heat = Heat(session_id, track=track, raw_data=rows, fetched_at=entry["fetched_at"])
+            path = os.path.join(out_dir, f"heat_{track}_{session_id}{extension}")
+            heat.save(path)
+            written.append(path)
+        except Exception as e:
+            errors.append((track, session_id, f"{type(e).__name__}: {e}"))
+    return written, errors
+
+
+def reparse_all(
+    directory: str = DEFAULT_PACK_DIR,
+    out_dir: str = "heats_data",
+    extension: str = ".kheat",
+    processes=None,
+    backend: str = None,
+    tracks=None,
+    chunk_size: int = 64,
+):
+    """
+    Пересобирает все заезды архива страниц текущим парсером, без сети.
+    Страницы делятся на пачки по chunk_size и разбираются в пуле процессов
+    (processes=1 — в текущем процессе). Возвращает (пути, ошибки).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with PagePack(directory) as pack:
+        keys = [k for k in pack.keys() if tracks is None or k[0] in tracks]
+    jobs = [
+        (directory, keys[i:i + chunk_size], out_dir, extension, backend)
+        for i in range(0, len(keys), chunk_size)
+    ]
+
+    if processes == 1 or len(jobs) <= 1:
+        results = [_reparse_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(_reparse_chunk, jobs))
+
+    written, errors = [], []
+    for paths, errs in results:
+        written.extend(paths)
+        errors.extend(errs)
+    return written, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Архив сырых страниц заездов")
+    parser.add_argument("command", choices=("reparse", "stats", "reindex"))
+    parser.add_argument("--pack", default=DEFAULT_PACK_DIR, help="каталог архива страниц")
+    parser.add_argument("--out", default="heats_data", help="куда сохранять заезды (reparse)")
+    parser.add_argument("--format", default=".kheat", help="расширение: .kheat или .json")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--backend", default=None, help="бэкенд разбора: auto, lxml, stream, bs4")
+    parser.add_argument("--tracks", default=None, help="треки через запятую")
+    parser.add_argument("--index", default=None, help="обновить SQLite-индекс архива по этому пути")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        with PagePack(args.pack) as pack:
+            print(f"Страниц: {len(pack)}, размер pack: {pack.total_bytes / 1e6:.1f} MB")
+        return
+    if args.command == "reindex":
+        with PagePack(args.pack) as pack:
+            print(f"Записей в индексе: {pack.rebuild_index()}")
+        return
+
+    started = time.perf_counter()
+    tracks = set(args.tracks.split(",")) if args.tracks else None
+    written, errors = reparse_all(
+        args.pack, args.out, args.format, processes=args.processes, backend=args.backend, tracks=tracks
+    )
+    print(f"Пересобрано заездов: {len(written)} за {time.perf_counter() - started:.1f} s")
+    for track, session_id, error in errors:
+        print(f"Ошибка {track}/{session_id}: {error}")
+
+    if args.index:
+        from archive_index import ArchiveIndex
+        from Data_Classes.heat import Heat
+
+        index = ArchiveIndex(args.index)
+        for path in written:
+            index.ingest(Heat.load(path), path, replace=True)
+        index.close()
+        print(f"Индекс {args.index} обновлён")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Рейтинг пилотов (Эло для многопользовательских заездов) по потоку заездов.
+
+Каждый заезд обновляет только своих участников: ожидаемый результат
+пилота считается против среднего рейтинга остальных, фактический — по
+занятому месту, поэтому обновление занимает O(пилотов в заезде).
+Рейтинги ведутся отдельно по каждому треку; таблица лидеров трека
+сортируется при запросе, если рейтинги изменились с прошлого запроса.
+"""
+import os
+
+import numpy as np
+
+from driver_names import normalize_driver_name
+from io_heat import iter_heat_files, session_order
+
+
+class _TrackRatings:
+    """Колоночное состояние трека: индекс пилота -> рейтинг и статистика."""
+
+    FIELDS = ("ratings", "heats", "wins", "podiums", "best_laps")
+
+    def __init__(self, initial: float) -> None:
+        self.initial = initial
+        self.index = {}
+        self.names = []
+        self.ratings = np.zeros(0)
+        self.heats = np.zeros(0, dtype=np.int32)
+        self.wins = np.zeros(0, dtype=np.int32)
+        self.podiums = np.zeros(0, dtype=np.int32)
+        self.best_laps = np.zeros(0)
+        # индексы пилотов от лучшего рейтинга к худшему; None — пересортировать
+        self._leaderboard = None
+
+    def _grow(self, size: int) -> None:
+        capacity = self.ratings.size
+        if size <= capacity:
+            return
+        extra = max(size, capacity * 2, 64) - capacity
+        self.ratings = np.concatenate([self.ratings, np.full(extra, self.initial)])
+        self.heats = np.concatenate([self.heats, np.zeros(extra, dtype=np.int32)])
+        self.wins = np.concatenate([self.wins, np.zeros(extra, dtype=np.int32)])
+        self.podiums = np.concatenate([self.podiums, np.zeros(extra, dtype=np.int32)])
+        self.best_laps = np.concatenate([self.best_laps, np.full(extra, np.nan)])
+
+    def ids_for(self, keys, display_names):
+        ids = np.empty(len(keys), dtype=np.intp)
+        for i, (key, name) in enumerate(zip(keys, display_names)):
+            idx = self.index.get(key)
+            if idx is None:
+                idx = self.index[key] = len(self.names)
+                self.names.append(name)
+                self._grow(idx + 1)
+                self.ratings[idx] = self.initial
+                self._leaderboard = None
+            ids[i] = idx
+        return ids
+
+    def set_ratings(self, ids, values) -> None:
+        self.ratings[ids] = values
+        self._leaderboard = None
+
+    def leaderboard(self):
+        """Индексы пилотов по убыванию рейтинга (при равенстве — по порядку появления)."""
+        if self._leaderboard is None:
+            n = len(self.names)
+            self._leaderboard = np.lexsort((np.arange(n), -self.ratings[:n])).tolist()
+        return self._leaderboard
+
+
+class RatingEngine:
+    """
+    :param k_factor: максимальное изменение рейтинга за заезд
+    :param initial: стартовый рейтинг нового пилота
+    """
+
+    def __init__(self, k_factor: float = 32.0, initial: float = 1500.0) -> None:
+        self.k_factor = k_factor
+        self.initial = initial
+        self._tracks = {}
+        # уже учтённые заезды "track/session_id"
+        self.processed = set()
+
+    @property
+    def tracks(self):
+        return sorted(self._tracks)
+
+    def _track(self, track: str) -> _TrackRatings:
+        state = self._tracks.get(track)
+        if state is None:
+            state = self._tracks[track] = _TrackRatings(self.initial)
+        return state
+
+    def add_heat(self, heat) -> bool:
+        """Учитывает заезд; повторно тот же заезд не учитывается."""
+        key = f"{heat.track}/{heat.session_id}"
+        # один пилот дважды в заезде (совпавшие имена) учитывается один раз
+        cols = {}
+        for col, d in enumerate(heat.drivers):
+            if d.place is not None:
+                cols.setdefault(normalize_driver_name(d.name), col)
+        if key in self.processed or len(cols) < 2:
+            return False
+        self.processed.add(key)
+
+        state = self._track(heat.track)
+        drivers = [heat.drivers[col] for col in cols.values()]
+        ids = state.ids_for(list(cols), [d.name for d in drivers])
+        places = np.array([d.place for d in drivers], dtype=np.float64)
+        n = len(drivers)
+
+        ratings = state.ratings[ids]
+        others = (ratings.sum() - ratings) / (n - 1)
+        expected = 1.0 / (1.0 + 10.0 ** ((others - ratings) / 400.0))
+        # место 1 -> 1.0, последнее -> 0.0
+        order = places.argsort(kind="stable")
+        actual = np.empty(n)
+        actual[order] = (n - 1 - np.arange(n)) / (n - 1)
+        updated = ratings + self.k_factor * (actual - expected)
+
+        state.set_ratings(ids, updated)
+
+        state.heats[ids] += 1
+        rank = np.empty(n, dtype=np.intp)
+        rank[order] = np.arange(n)
+        state.wins[ids[rank == 0]] += 1
+        state.podiums[ids[rank < 3]] += 1
+
+        columns = [heat.lap_times[:, col] for col in cols.values()]
+        with np.errstate(all="ignore"):
+            best = np.array([np.nanmin(c) if c.size and not np.isnan(c).all() else np.nan for c in columns])
+        state.best_laps[ids] = np.fmin(state.best_laps[ids], best)
+        return True
+
+    def add_heats(self, heats) -> int:
+        return sum(self.add_heat(heat) for heat in heats)
+
+    # --- запросы ---
+
+    def rating(self, track: str, name: str):
+        state = self._tracks.get(track)
+        if state is None:
+            return None
+        idx = state.index.get(normalize_driver_name(name))
+        return None if idx is None else float(state.ratings[idx])
+
+    def stats(self, track: str, name: str):
+        """Карьерная статистика пилота на треке или None."""
+        state = self._tracks.get(track)
+        idx = None if state is None else state.index.get(normalize_driver_name(name))
+        if idx is None:
+            return None
+        return self._row(state, idx)
+
+    @staticmethod
+    def _row(state, idx: int) -> dict:
+        best = state.best_laps[idx]
+        return {
+            "name": state.names[idx],
+            "rating": float(state.ratings[idx]),
+            "heats": int(state.heats[idx]),
+            "wins": int(state.wins[idx]),
+            "podiums": int(state.podiums[idx]),
+            "best_lap": None if np.isnan(best) else float(best),
+        }
+
+    def top(self, track: str, n: int = 10, min_heats: int = 1):
+        """Лучшие n пилотов трека по рейтингу."""
+        state = self._tracks.get(track)
+        if state is None:
+            return []
+        result = []
+        for idx in state.leaderboard():
+            if state.heats[idx] < min_heats:
+                continue
+            result.append(self._row(state, idx))
+            if len(result) >= n:
+                break
+        return result
+
+    # --- снимок состояния ---
+
+    def save(self, path: str) -> None:
+        """Сохраняет состояние в компактный .npz (без pickle)."""
+        arrays = {
+            "meta": np.array([self.k_factor, self.initial]),
+            "processed": np.array(sorted(self.processed), dtype=str),
+            "tracks": np.array(self.tracks, dtype=str),
+        }
+        for track, state in self._tracks.items():
+            n = len(state.names)
+            arrays[f"{track}.keys"] = np.array(list(state.index), dtype=str)
+            arrays[f"{track}.names"] = np.array(state.names, dtype=str)
+            for field in _TrackRatings.FIELDS:
+                arrays[f"{track}.{field}"] = getattr(state, field)[:n]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "RatingEngine":
+        with np.load(path, allow_pickle=False) as data:
+            k_factor, initial = data["meta"].tolist()
+            engine = cls(k_factor=k_factor, initial=initial)
+            engine.processed = set(data["processed"].tolist())
+            for track in data["tracks"].tolist():
+                state = engine._track(track)
+                keys = data[f"{track}.keys"].tolist()
+                state.names = data[f"{track}.names"].tolist()
+                state.index = {key: i for i, key in enumerate(keys)}
+                for field in _TrackRatings.FIELDS:
+                    setattr(state, field, data[f"{track}.{field}"].copy())
+        return engine
+
+    # --- пересборка ---
+
+    @classmethod
+    def replay(cls, heats, **kwargs) -> "RatingEngine":
+        """Строит рейтинг заново, упорядочив заезды по треку и session_id."""
+        engine = cls(**kwargs)
+        ordered = sorted(heats, key=lambda h: (h.track, session_order(h.session_id)))
+        engine.add_heats(ordered)
+        return engine
+
+    @classmethod
+    def replay_directory(cls, directory: str = "heats_data", **kwargs) -> "RatingEngine":
+        """Пересобирает рейтинг по всем heat_*.json / heat_*.kheat каталога."""
+        from Data_Classes.heat import Heat
+
+        engine = cls(**kwargs)
+        for _, _, path in iter_heat_files(directory):
+            engine.add_heat(Heat.load(path))
+        return engine
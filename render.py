@@ -0,0 +1,312 @@
+"""
+Отрисовка таблицы результатов заезда в PNG.
+
+Бэкенды с одинаковой раскладкой и подсветкой:
+- matplotlib — исходный вариант через ax.table;
+- pillow — прямая растеризация, в разы быстрее.
+render_lap_chart рисует диаграмму хода гонки (позиции по кругам) теми же
+бэкендами. render_many раскладывает пакет заездов по пулу процессов.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+
+import numpy as np
+
+RENDER_BACKENDS = ("matplotlib", "pillow")
+
+HEADER_COLOR = "#f1f1f1"
+LAP_COLUMN_COLOR = "#e8e8e8"
+DARK_CELL_COLOR = "#333333"
+GRID_COLOR = "#000000"
+
+# параметры растеризации pillow: соответствуют dpi=200 у matplotlib
+PILLOW_FONT_SIZE = 20
+PILLOW_CELL_PADDING = 12
+PILLOW_ROW_HEIGHT = 36
+PILLOW_MARGIN = 10
+
+
+def _cell_style(full_data, i: int, j: int):
+    """Возвращает (цвет фона, цвет текста, жирный ли) для ячейки (i, j)."""
+    if i < 2:
+        return HEADER_COLOR, "black", True
+    if j == 0:
+        return LAP_COLUMN_COLOR, "black", True
+    cell = full_data[i][j]
+    cell_text = "" if cell is None else str(cell)
+    if cell_text and " " in cell_text:
+        return DARK_CELL_COLOR, "white", False
+    return "white", "black", False
+
+
+def render_results_matplotlib(full_data, filename: str) -> str:
+    # Figure без pyplot: не трогает глобальное состояние и выбранный backend
+    from matplotlib.figure import Figure
+
+    num_cols = len(full_data[0])
+    fig = Figure(figsize=(num_cols * 1.2, len(full_data) * 0.4))
+    ax = fig.subplots()
+    ax.axis("off")
+
+    cell_text = [["" if c is None else str(c) for c in row] for row in full_data]
+    styles = [[_cell_style(full_data, i, j) for j in range(num_cols)] for i in range(len(full_data))]
+
+    table = ax.table(
+        cellText=cell_text,
+        cellColours=[[style[0] for style in row] for row in styles],
+        loc="center",
+        cellLoc="center",
+    )
+
+    for (i, j), cell in table.get_celld().items():
+        _, color, bold = styles[i][j]
+        if bold or color != "black":
+            cell.set_text_props(color=color, weight="bold" if bold else "normal")
+
+    fig.savefig(filename, format="png", bbox_inches="tight", dpi=200)
+    return filename
+
+
+def _font_paths(bold: bool):
+    name = "DejaVuSans-Bold.ttf" if bold else "DejaVuSans.ttf"
+    env = os.environ.get("KART_RENDER_FONT_BOLD" if bold else "KART_RENDER_FONT")
+    if env:
+        yield env
+    # шрифт из комплекта matplotlib — без импорта самого matplotlib
+    spec = find_spec("matplotlib")
+    if spec is not None and spec.submodule_search_locations:
+        yield os.path.join(spec.submodule_search_locations[0], "mpl-data", "fonts", "ttf", name)
+    yield os.path.join("/usr/share/fonts/truetype/dejavu", name)
+    yield name
+
+
+_fonts = {}
+
+
+def _load_font(bold: bool):
+    from PIL import ImageFont
+
+    if bold not in _fonts:
+        font = None
+        for path in _font_paths(bold):
+            try:
+                font = ImageFont.truetype(path, PILLOW_FONT_SIZE)
+                break
+            except OSError:
+                continue
+        _fonts[bold] = font or ImageFont.load_default()
+    return _fonts[bold]
+
+
+def render_results_pillow(full_data, filename: str) -> str:
+    from PIL import Image, ImageDraw
+
+    regular, bold = _load_font(False), _load_font(True)
+    num_rows, num_cols = len(full_data), len(full_data[0])
+
+    texts = [["" if c is None else str(c) for c in row] for row in full_data]
+    styles = [[_cell_style(full_data, i, j) for j in range(num_cols)] for i in range(num_rows)]
+
+    # как у ax.table: колонки одинаковой ширины, по самой широкой ячейке
+    widest = max(
+        (bold if styles[i][j][2] else regular).getlength(texts[i][j])
+        for i in range(num_rows)
+        for j in range(num_cols)
+    )
+    col_width = int(widest) + 2 * PILLOW_CELL_PADDING
+    width = col_width * num_cols + 2 * PILLOW_MARGIN + 1
+    height = PILLOW_ROW_HEIGHT * num_rows + 2 * PILLOW_MARGIN + 1
+
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+
+    for i in range(num_rows):
+        top = PILLOW_MARGIN + i * PILLOW_ROW_HEIGHT
+        for j in range(num_cols):
+            left = PILLOW_MARGIN + j * col_width
+            fill, color, is_bold = styles[i][j]
+            draw.rectangle(
+                (left, top, left + col_width, top + PILLOW_ROW_HEIGHT),
+                fill=fill,
+                outline=GRID_COLOR,
+            )
+            if texts[i][j]:
+                draw.text(
+                    (left + col_width / 2, top + PILLOW_ROW_HEIGHT / 2),
+                    texts[i][j],
+                    fill=color,
+                    font=bold if is_bold else regular,
+                    anchor="mm",
+                )
+
+    image.save(filename, format="PNG", optimize=False)
+    return filename
+
+
+_RENDERERS = {
+    "matplotlib": render_results_matplotlib,
+    "pillow": render_results_pillow,
+}
+
+
+def render_results_image(full_data, filename: str, backend: str = "matplotlib") -> str:
+    """
+    Рисует полную таблицу результатов (см. Heat.get_full_results) в PNG.
+    filename — путь или открытый двоичный файл (например, io.BytesIO).
+    """
+    if backend not in _RENDERERS:
+        raise ValueError(
+            f"Unknown backend '{backend}'. Must be one of: {', '.join(RENDER_BACKENDS)}"
+        )
+    return _RENDERERS[backend](full_data, filename)
+
+
+# --- диаграмма хода гонки ---
+
+# палитра tab20: соседние пилоты различимы и при 40 линиях
+LAP_CHART_COLORS = (
+    "#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd", "#8c564b", "#e377c2",
+    "#7f7f7f", "#bcbd22", "#17becf", "#aec7e8", "#ffbb78", "#98df8a", "#ff9896",
+    "#c5b0d5", "#c49c94", "#f7b6d2", "#c7c7c7", "#dbdb8d", "#9edae5",
+)
+LAP_CHART_GRID_COLOR = "#dddddd"
+LAP_CHART_ROW_HEIGHT = 28
+LAP_CHART_WIDTH = 1200
+LAP_CHART_LINE_WIDTH = 3
+
+
+def _lap_runs(column):
+    """Отрезки подряд проеханных кругов: [(первый круг, позиции), ...]."""
+    present = column > 0
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], present.astype(np.int8), [0]))))
+    return [(start, column[start:stop]) for start, stop in zip(edges[::2], edges[1::2])]
+
+
+def render_lap_chart_pillow(positions, names, filename) -> str:
+    from PIL import Image, ImageDraw
+
+    font = _load_font(False)
+    n_laps, n_drivers = positions.shape
+    step = max(2, min(40, LAP_CHART_WIDTH // max(n_laps, 1)))
+    left = int(font.getlength(str(n_drivers))) + 2 * PILLOW_CELL_PADDING
+    label_width = max((font.getlength(str(n)) for n in names), default=0)
+    plot_width = step * max(n_laps - 1, 1)
+    width = left + plot_width + 2 * PILLOW_CELL_PADDING + int(label_width) + PILLOW_MARGIN
+    top = PILLOW_MARGIN + LAP_CHART_ROW_HEIGHT // 2
+    height = top + LAP_CHART_ROW_HEIGHT * n_drivers + LAP_CHART_ROW_HEIGHT + PILLOW_MARGIN
+
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+
+    def y(position):
+        return top + (position - 1) * LAP_CHART_ROW_HEIGHT
+
+    for position in range(1, n_drivers + 1):
+        draw.line((left, y(position), left + plot_width, y(position)), fill=LAP_CHART_GRID_COLOR)
+        draw.text((left - PILLOW_CELL_PADDING, y(position)), str(position), fill="black", font=font, anchor="rm")
+    # подписи кругов не чаще, чем раз в 60 пикселей
+    every = max(1, -(-60 // step))
+    axis = y(n_drivers) + LAP_CHART_ROW_HEIGHT // 2
+    for lap in range(0, n_laps, every):
+        draw.text((left + lap * step, axis), str(lap + 1), fill="black", font=font, anchor="mt")
+
+    for d in range(n_drivers):
+        color = LAP_CHART_COLORS[d % len(LAP_CHART_COLORS)]
+        last = None
+        for start, run in _lap_runs(positions[:, d]):
+            points = [(left + (start + i) * step, y(int(p))) for i, p in enumerate(run)]
+            if len(points) > 1:
+                draw.line(points, fill=color, width=LAP_CHART_LINE_WIDTH, joint="curve")
+            else:
+                (px, py), r = points[0], LAP_CHART_LINE_WIDTH
+                draw.ellipse((px - r, py - r, px + r, py + r), fill=color)
+            last = points[-1]
+        if last is not None:
+            draw.text((last[0] + PILLOW_CELL_PADDING, last[1]), str(names[d]), fill=color, font=font, anchor="lm")
+
+    image.save(filename, format="PNG", optimize=False)
+    return filename
+
+
+def render_lap_chart_matplotlib(positions, names, filename) -> str:
+    from matplotlib.figure import Figure
+
+    n_laps, n_drivers = positions.shape
+    fig = Figure(figsize=(max(6.0, min(24.0, n_laps * 0.25)), max(3.0, n_drivers * 0.35)))
+    ax = fig.subplots()
+    laps = np.arange(1, n_laps + 1)
+    for d in range(n_drivers):
+        column = positions[:, d].astype(float)
+        column[column == 0] = np.nan
+        color = LAP_CHART_COLORS[d % len(LAP_CHART_COLORS)]
+        ax.plot(laps, column, color=color, linewidth=1.5)
+        done = np.flatnonzero(~np.isnan(column))
+        if done.size:
+            ax.annotate(str(names[d]), (laps[done[-1]], column[done[-1]]), xytext=(6, 0),
+                        textcoords="offset points", va="center", color=color, fontsize=8)
+    ax.set_ylim(n_drivers + 0.5, 0.5)
+    ax.set_yticks(range(1, n_drivers + 1))
+    ax.set_xlabel("Круг")
+    ax.set_ylabel("Позиция")
+    ax.grid(axis="y", color=LAP_CHART_GRID_COLOR)
+    fig.savefig(filename, format="png", bbox_inches="tight", dpi=150)
+    return filename
+
+
+_LAP_CHART_RENDERERS = {
+    "matplotlib": render_lap_chart_matplotlib,
+    "pillow": render_lap_chart_pillow,
+}
+
+
+def render_lap_chart(positions, names, filename, backend: str = "pillow") -> str:
+    """
+    Рисует диаграмму хода гонки: линия позиций каждого пилота по кругам.
+    positions — массив (круги, пилоты), 0 — круг не проехан (см. Heat.race_timeline).
+    """
+    if backend not in _LAP_CHART_RENDERERS:
+        raise ValueError(
+            f"Unknown backend '{backend}'. Must be one of: {', '.join(RENDER_BACKENDS)}"
+        )
+    return _LAP_CHART_RENDERERS[backend](np.asarray(positions), list(names), filename)
+
+
+# --- пакетная отрисовка ---
+
+CHART_KINDS = ("results", "laps")
+
+
+def _render_one(job):
+    source, out_dir, backend, chart = job
+    from Data_Classes.heat import Heat
+
+    heat = Heat.load(source) if isinstance(source, str) else source
+    # заезд без кругов рисовать нечего; прочие ошибки не глотаются
+    if not heat.lap_count or (chart == "laps" and not heat.drivers):
+        return None
+    if chart == "laps":
+        filename = os.path.join(out_dir, f"heat_{heat.track}_{heat.session_id}_laps.png")
+        return heat.generate_lap_chart(filename=filename, backend=backend)
+    filename = os.path.join(out_dir, f"heat_{heat.track}_{heat.session_id}.png")
+    return heat.generate_results_image(filename=filename, backend=backend)
+
+
+def render_many(sources, out_dir: str = "heats_result", backend: str = "pillow", processes=None, chart: str = "results"):
+    """
+    Рисует PNG для пакета заездов (объекты Heat или пути к файлам заездов)
+    в пуле из processes процессов: таблицу результатов (chart='results')
+    или диаграмму хода гонки (chart='laps'). Возвращает список путей в
+    порядке sources; для заездов без кругов — None.
+    """
+    if chart not in CHART_KINDS:
+        raise ValueError(f"Unknown chart '{chart}'. Must be one of: {', '.join(CHART_KINDS)}")
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Must be one of: {', '.join(RENDER_BACKENDS)}")
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = [(source, out_dir, backend, chart) for source in sources]
+    if processes == 1 or len(jobs) <= 1:
+        return [_render_one(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_render_one, jobs, chunksize=max(1, len(jobs) // 32)))
@@ -0,0 +1,416 @@
+"""
+Статический отчёт по архиву заездов: для каждого заезда из heats_data/
+HTML-страница с таблицами и PNG результатов, плюс индексные страницы по
+трекам и пилотам.
+
+    python report_builder.py heats_data --out heats_report --processes 4
+
+Повторный запуск перерисовывает только новые и изменившиеся заезды:
+в out/manifest.json хранится хэш содержимого каждого файла заезда (файл
+перечитывается, только если изменились размер или mtime) и сводка для
+индексных страниц. Заезды рисуются в пуле процессов; индексные страницы
+собираются из сводок манифеста и переписываются, только если изменились.
+Список индексных страниц тоже хранится в манифесте: страницы треков и
+пилотов, которых больше нет, удаляются.
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from driver_names import DriverNameIndex, fold_driver_name
+from io_heat import iter_heat_files, session_order
+
+# меняется вместе с раскладкой страниц: старые страницы перерисуются
+REPORT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+_STYLE = """
+body { font-family: sans-serif; margin: 2em; color: #222; }
+table { border-collapse: collapse; margin: 1em 0; }
+th, td { border: 1px solid #ccc; padding: 2px 8px; text-align: center; }
+th { background: #eee; }
+td.name { text-align: left; }
+img { max-width: 100%; }
+"""
+
+
+def _page(title: str, body: str, root: str = "..") -> str:
+    return (
+        "<!DOCTYPE html>\n<html lang=\"ru\"><head><meta charset=\"utf-8\">"
+        f"<title>{html.escape(title)}</title><style>{_STYLE}</style></head><body>"
+        f"<p><a href=\"{root}/index.html\">Все треки</a> · "
+        f"<a href=\"{root}/drivers/index.html\">Пилоты</a></p>"
+        f"<h1>{html.escape(title)}</h1>\n{body}\n</body></html>\n"
+    )
+
+
+def _table(header, rows, name_col=None) -> str:
+    head = "".join(f"<th>{html.escape(str(h))}</th>" for h in header)
+    lines = []
+    for row in rows:
+        cells = []
+        for j, value in enumerate(row):
+            cls = ' class="name"' if j == name_col else ""
+            cells.append(f"<td{cls}>{value}</td>")
+        lines.append("<tr>" + "".join(cells) + "</tr>")
+    return f"<table><tr>{head}</tr>\n" + "\n".join(lines) + "\n</table>"
+
+
+def _fmt_time(value) -> str:
+    return "" if value is None else f"{value:.3f}"
+
+
+def _fmt_date(ts) -> str:
+    return "" if ts is None else time.strftime("%Y-%m-%d %H:%M", time.localtime(ts))
+
+
+def heat_page_name(track: str, session_id) -> str:
+    return f"heat_{track}_{session_id}"
+
+
+def summarize_heat(heat):
+    """Сводка заезда для манифеста и индексных страниц."""
+    times = heat.lap_times
+    drivers = []
+    for col, driver in enumerate(heat.drivers):
+        column = times[:, col] if col < times.shape[1] else np.zeros(0)
+        done = column[~np.isnan(column)]
+        drivers.append({
+            "place": driver.place,
+            "name": driver.name,
+            "kart_id": None if driver.kart_id is None else str(driver.kart_id),
+            "laps": int(done.size),
+            "best": float(done.min()) if done.size else None,
+        })
+    return {
+        "track": heat.track,
+        "session_id": str(heat.session_id),
+        "fetched_at": heat.fetched_at,
+        "lap_count": heat.lap_count,
+        "drivers": drivers,
+    }
+
+
+def render_heat_page(heat, summary, image_name) -> str:
+    results = _table(
+        ["Место", "Пилот", "Карт", "Лучший круг", "Кругов"],
+        [
+            [d["place"], html.escape(str(d["name"])), html.escape(str(d["kart_id"] or "")),
+             _fmt_time(d["best"]), d["laps"]]
+            for d in summary["drivers"]
+        ],
+        name_col=1,
+    )
+    time_list = heat.get_time_list()
+    laps = ""
+    if time_list:
+        laps = "<h2>Круги</h2>" + _table(
+            [str(h) for h in time_list[0]],
+            [[html.escape(str(c)) for c in row] for row in time_list[1:]],
+        )
+    image = f'<p><img src="{image_name}" alt="Результаты"></p>' if image_name else ""
+    title = f"Заезд {summary['session_id']} — {summary['track']}"
+    date = _fmt_date(summary["fetched_at"])
+    meta = f"<p>Загружен: {date}</p>" if date else ""
+    return _page(title, meta + results + laps + image)
+
+
+def _build_heat(job):
+    """Собирает страницу и PNG одного заезда (выполняется в пуле процессов)."""
+    source, heats_dir, backend = job
+    from Data_Classes.heat import Heat
+
+    heat = Heat.load(source)
+    summary = summarize_heat(heat)
+    name = heat_page_name(heat.track, heat.session_id)
+
+    image_name = None
+    if heat.lap_count and heat.drivers:
+        image_name = name + ".png"
+        heat.generate_results_image(filename=os.path.join(heats_dir, image_name), backend=backend)
+
+    page = render_heat_page(heat, summary, image_name)
+    with open(os.path.join(heats_dir, name + ".html"), "w", encoding="utf-8") as f:
+        f.write(page)
+    return summary
+
+
+def _safe_build(job):
+    try:
+        return _build_heat(job), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _file_hash(path: str) -> str:
+    digest = hashlib.sha1(f"report-v{REPORT_VERSION}".encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_sources(src_dir: str):
+    """"track/session_id" -> путь к файлу заезда (см. io_heat.select_heat_files)."""
+    return {f"{track}/{session_id}": path for track, session_id, path in iter_heat_files(src_dir)}
+
+
+class ReportBuilder:
+    """
+    :param src_dir: каталог архива (heat_{track}_{id}.json / .kheat)
+    :param out_dir: каталог отчёта
+    :param backend: бэкенд картинок, по умолчанию быстрый pillow
+    :param processes: размер пула процессов (None — по числу ядер)
+    """
+
+    def __init__(self, src_dir: str = "heats_data", out_dir: str = "heats_report", backend: str = "pillow", processes=None):
+        self.src_dir = src_dir
+        self.out_dir = out_dir
+        self.backend = backend
+        self.processes = processes
+        self.manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+        self.heats_dir = os.path.join(out_dir, "heats")
+
+    def _read_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != REPORT_VERSION:
+            return {}
+        return manifest
+
+    def load_manifest(self):
+        return self._read_manifest().get("heats", {})
+
+    def _save_manifest(self, heats, pages) -> None:
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": REPORT_VERSION, "heats": heats, "pages": pages}, f, ensure_ascii=False)
+        os.replace(tmp, self.manifest_path)
+
+    def build(self, force: bool = False):
+        """
+        Обновляет отчёт. Возвращает словарь: rendered, skipped, removed,
+        errors (список (заезд, ошибка)), pages (переписанные индексные страницы).
+        """
+        os.makedirs(self.heats_dir, exist_ok=True)
+        # прошлый манифест нужен и при force: по нему удаляются страницы исчезнувших заездов
+        stored = self._read_manifest()
+        previous = stored.get("heats", {})
+        sources = scan_sources(self.src_dir)
+
+        manifest, jobs, keys = {}, [], []
+        for key, path in sorted(sources.items()):
+            stat = os.stat(path)
+            old = previous.get(key)
+            if old and old["source"] == path and old["size"] == stat.st_size and old["mtime_ns"] == stat.st_mtime_ns:
+                digest = old["hash"]
+            else:
+                digest = _file_hash(path)
+            entry = {"source": path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}
+            if not force and old and old["hash"] == digest and self._outputs_exist(old["summary"]):
+                entry["summary"] = old["summary"]
+                manifest[key] = entry
+                continue
+            manifest[key] = entry
+            jobs.append((path, self.heats_dir, self.backend))
+            keys.append(key)
+
+        errors = []
+        for key, (summary, error) in zip(keys, self._run(jobs)):
+            if error is not None:
+                errors.append((key, error))
+                del manifest[key]
+            else:
+                manifest[key]["summary"] = summary
+
+        removed = 0
+        for key in set(previous) - set(manifest):
+            if key in sources:
+                continue  # ошибка сборки: страницы прошлой версии остаются
+            summary = previous[key].get("summary") or {}
+            removed += self._remove_outputs(summary)
+
+        index_pages = self._index_pages([entry["summary"] for _, entry in sorted(manifest.items())])
+        pages = sum(self._write(relpath, content) for relpath, content in index_pages.items())
+        for relpath in set(stored.get("pages", [])) - set(index_pages):
+            path = os.path.join(self.out_dir, relpath)
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        self._save_manifest(manifest, sorted(index_pages))
+        return {
+            "rendered": len(jobs) - len(errors),
+            "skipped": len(sources) - len(jobs),
+            "removed": removed,
+            "errors": errors,
+            "pages": pages,
+        }
+
+    def _run(self, jobs):
+        if self.processes == 1 or len(jobs) <= 1:
+            return [_safe_build(job) for job in jobs]
+        with ProcessPoolExecutor(max_workers=self.processes) as pool:
+            return list(pool.map(_safe_build, jobs, chunksize=max(1, len(jobs) // 32)))
+
+    def _outputs(self, summary):
+        name = heat_page_name(summary["track"], summary["session_id"])
+        paths = [os.path.join(self.heats_dir, name + ".html")]
+        if summary["lap_count"] and summary["drivers"]:
+            paths.append(os.path.join(self.heats_dir, name + ".png"))
+        return paths
+
+    def _outputs_exist(self, summary) -> bool:
+        return all(os.path.exists(p) for p in self._outputs(summary))
+
+    def _remove_outputs(self, summary) -> int:
+        if not summary:
+            return 0
+        removed = 0
+        for path in self._outputs(summary):
+            if os.path.exists(path):
+                os.remove(path)
+                removed += 1
+        return removed
+
+    # --- индексные страницы ---
+
+    def _write(self, relpath: str, content: str) -> bool:
+        path = os.path.join(self.out_dir, relpath)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if f.read() == content:
+                    return False
+        except OSError:
+            pass
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(content)
+        return True
+
+    def _index_pages(self, summaries):
+        """Индексные страницы отчёта: путь относительно out_dir -> HTML."""
+        by_track = {}
+        for summary in summaries:
+            by_track.setdefault(summary["track"], []).append(summary)
+
+        pages = {}
+        rows = [
+            [f'<a href="tracks/{track}.html">{html.escape(track)}</a>', len(heats)]
+            for track, heats in sorted(by_track.items())
+        ]
+        index = _page("Архив заездов", _table(["Трек", "Заездов"], rows, name_col=0), root=".")
+        pages["index.html"] = index
+
+        for track, heats in by_track.items():
+            heats.sort(key=lambda s: session_order(s["session_id"]), reverse=True)
+            rows = []
+            for s in heats:
+                winner = next((d for d in s["drivers"] if d["place"] == 1), None)
+                bests = [d["best"] for d in s["drivers"] if d["best"] is not None]
+                link = heat_page_name(s["track"], s["session_id"])
+                rows.append([
+                    f'<a href="../heats/{link}.html">{html.escape(s["session_id"])}</a>',
+                    _fmt_date(s["fetched_at"]),
+                    html.escape(winner["name"]) if winner else "",
+                    len(s["drivers"]),
+                    _fmt_time(min(bests)) if bests else "",
+                ])
+            body = _table(["Заезд", "Дата", "Победитель", "Пилотов", "Лучший круг"], rows, name_col=2)
+            pages[f"tracks/{track}.html"] = _page(f"Трек {track}", body)
+
+        pages.update(self._driver_pages(summaries))
+        return pages
+
+    def _driver_pages(self, summaries):
+        # написания одного пилота объединяются нечётким индексом имён
+        names = DriverNameIndex()
+        for summary in summaries:
+            for d in summary["drivers"]:
+                names.add(d["name"])
+
+        drivers = {}
+        for summary in summaries:
+            for d in summary["drivers"]:
+                cluster = names.cluster_id(d["name"])
+                if cluster is None:
+                    continue
+                drivers.setdefault(cluster, []).append((summary, d))
+
+        spellings = {
+            cluster: max(sorted({d["name"] for _, d in entries}), key=lambda n: sum(e[1]["name"] == n for e in entries))
+            for cluster, entries in drivers.items()
+        }
+        slugs, used = {}, set()
+        # порядок выдачи номеров (base-2) не зависит от порядка словаря
+        for cluster in sorted(drivers, key=lambda c: (spellings[c], c)):
+            spelling = spellings[cluster]
+            base = fold_driver_name(spelling).replace(" ", "-") or "driver"
+            slug, n = base, 1
+            while slug in used:
+                n += 1
+                slug = f"{base}-{n}"
+            used.add(slug)
+            slugs[cluster] = (slug, spelling)
+
+        pages = {}
+        index_rows = []
+        for cluster, entries in sorted(drivers.items(), key=lambda item: slugs[item[0]][1].lower()):
+            slug, spelling = slugs[cluster]
+            bests = [d["best"] for _, d in entries if d["best"] is not None]
+            index_rows.append([
+                f'<a href="{slug}.html">{html.escape(spelling)}</a>',
+                len(entries),
+                sum(d["place"] == 1 for _, d in entries),
+                _fmt_time(min(bests)) if bests else "",
+            ])
+            rows = []
+            for s, d in sorted(entries, key=lambda e: (e[0]["track"], session_order(e[0]["session_id"]))):
+                link = heat_page_name(s["track"], s["session_id"])
+                rows.append([
+                    html.escape(s["track"]),
+                    f'<a href="../heats/{link}.html">{html.escape(s["session_id"])}</a>',
+                    _fmt_date(s["fetched_at"]),
+                    d["place"],
+                    html.escape(d["name"]),
+                    html.escape(d["kart_id"] or ""),
+                    _fmt_time(d["best"]),
+                ])
+            body = _table(["Трек", "Заезд", "Дата", "Место", "Имя в заезде", "Карт", "Лучший круг"], rows, name_col=4)
+            pages[f"drivers/{slug}.html"] = _page(spelling, body)
+
+        body = _table(["Пилот", "Заездов", "Побед", "Лучший круг"], index_rows, name_col=0)
+        pages["drivers/index.html"] = _page("Пилоты", body)
+        return pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Статический отчёт по архиву заездов")
+    parser.add_argument("src", nargs="?", default="heats_data")
+    parser.add_argument("--out", default="heats_report")
+    parser.add_argument("--backend", default="pillow", help="бэкенд картинок: pillow или matplotlib")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="перерисовать все заезды")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = ReportBuilder(args.src, args.out, backend=args.backend, processes=args.processes).build(force=args.force)
+    print(
+        f"Перерисовано: {result['rendered']}, без изменений: {result['skipped']}, "
+        f"удалено файлов: {result['removed']}, индексных страниц: {result['pages']} "
+        f"за {time.perf_counter() - started:.1f} s"
+    )
+    for key, error in result["errors"]:
+        print(f"Ошибка {key}: {error}")
+
+
+if __name__ == "__main__":
+    main()